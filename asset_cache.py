@@ -0,0 +1,72 @@
+import json
+import os
+import pygame
+
+ATLAS_VERSION = 2
+ATLAS_MIN_WIDTH = 1024
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tag_arena', 'assets')
+
+
+class AssetAtlas:
+    # Aset yang sudah di-crop dan di-scale disimpan sebagai satu atlas RGBA mentah (tanpa kompresi,
+    # jadi baca/tulis hampir hanya I/O) plus indeks JSON. Atlas dianggap basi bila versi,
+    # parameter pemrosesan, atau mtime/ukuran file sumber berubah.
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.image_path = os.path.join(directory, 'atlas.rgba')
+        self.index_path = os.path.join(directory, 'atlas.json')
+
+    def _fingerprint(self, sources, params):
+        entries = {}
+        for name, path in sources.items():
+            stat = os.stat(path)
+            entries[name] = [os.path.basename(path), stat.st_mtime_ns, stat.st_size]
+        return {'version': ATLAS_VERSION, 'params': list(params), 'sources': entries}
+
+    def load(self, sources, params):
+        try:
+            fingerprint = self._fingerprint(sources, params)
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get('fingerprint') != fingerprint:
+                return None
+            with open(self.image_path, 'rb') as f:
+                pixels = f.read()
+            atlas = pygame.image.frombytes(pixels, tuple(index['size']), 'RGBA').convert_alpha()
+            return {name: atlas.subsurface(pygame.Rect(rect)) for name, rect in index['rects'].items()}
+        except (OSError, ValueError, KeyError, pygame.error):
+            return None
+
+    def save(self, surfaces, sources, params):
+        # Penataan rak sederhana: aset diurutkan dari yang tertinggi lalu diisi per baris.
+        try:
+            fingerprint = self._fingerprint(sources, params)
+        except OSError:
+            return False
+        width = max([ATLAS_MIN_WIDTH] + [surface.get_width() for surface in surfaces.values()])
+        rects = {}
+        x = y = shelf_height = 0
+        for name, surface in sorted(surfaces.items(), key=lambda item: -item[1].get_height()):
+            w, h = surface.get_size()
+            if x + w > width:
+                x, y, shelf_height = 0, y + shelf_height, 0
+            rects[name] = [x, y, w, h]
+            x += w
+            shelf_height = max(shelf_height, h)
+        atlas = pygame.Surface((width, max(1, y + shelf_height)), pygame.SRCALPHA)
+        atlas.fill((0, 0, 0, 0))
+        for name, surface in surfaces.items():
+            # BLEND_RGBA_MAX di atas atlas kosong menyalin piksel apa adanya, termasuk alpha.
+            atlas.blit(surface, rects[name][:2], special_flags=pygame.BLEND_RGBA_MAX)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.image_path + '.tmp', 'wb') as f:
+                f.write(pygame.image.tobytes(atlas, 'RGBA'))
+            os.replace(self.image_path + '.tmp', self.image_path)
+            with open(self.index_path + '.tmp', 'w') as f:
+                json.dump({'fingerprint': fingerprint, 'size': atlas.get_size(), 'rects': rects}, f)
+            os.replace(self.index_path + '.tmp', self.index_path)
+        except (OSError, pygame.error) as e:
+            print(f"Gagal menyimpan atlas aset: {e}")
+            return False
+        return True
@@ -0,0 +1,107 @@
+import collections
+import hashlib
+import os
+import threading
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tag_arena', 'avatars')
+
+
+def avatar_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    # Penyimpanan avatar di server, dipakai bersama semua room. Blob dibatasi total ukurannya
+    # (LRU), tetapi blob milik pemain yang masih terhubung tidak pernah dibuang.
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.blobs = collections.OrderedDict()
+        self.total_bytes = 0
+        self.refs = collections.Counter()
+        self.waiters = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, blob_hash):
+        return blob_hash in self.blobs
+
+    def get(self, blob_hash):
+        with self.lock:
+            data = self.blobs.get(blob_hash)
+            if data is not None:
+                self.blobs.move_to_end(blob_hash)
+            return data
+
+    def put(self, blob_hash, data):
+        # Mengembalikan daftar penunggu blob ini, atau None bila isi tidak cocok dengan hash.
+        if avatar_hash(data) != blob_hash:
+            return None
+        with self.lock:
+            if blob_hash not in self.blobs:
+                self.blobs[blob_hash] = data
+                self.total_bytes += len(data)
+                self._evict()
+            return self.waiters.pop(blob_hash, [])
+
+    def wait(self, blob_hash, waiter):
+        # Hanya blob milik pemain yang sedang terhubung yang boleh ditunggu.
+        with self.lock:
+            if blob_hash in self.blobs or self.refs[blob_hash] <= 0:
+                return False
+            self.waiters.setdefault(blob_hash, []).append(waiter)
+            return True
+
+    def acquire(self, blob_hash):
+        with self.lock:
+            self.refs[blob_hash] += 1
+
+    def release(self, blob_hash):
+        with self.lock:
+            self.refs[blob_hash] -= 1
+            if self.refs[blob_hash] <= 0:
+                del self.refs[blob_hash]
+                if blob_hash not in self.blobs:
+                    self.waiters.pop(blob_hash, None)
+            self._evict()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for blob_hash in list(self.blobs):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if self.refs[blob_hash] > 0:
+                continue
+            self.total_bytes -= len(self.blobs.pop(blob_hash))
+
+
+class DiskCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            print(f"Gagal membuat folder cache avatar: {e}")
+
+    def _path(self, blob_hash):
+        return os.path.join(self.directory, blob_hash + '.png')
+
+    def get(self, blob_hash):
+        try:
+            with open(self._path(blob_hash), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        return data if avatar_hash(data) == blob_hash else None
+
+    def put(self, blob_hash, data):
+        if avatar_hash(data) != blob_hash:
+            return False
+        path = self._path(blob_hash)
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Gagal menyimpan avatar ke cache: {e}")
+            return False
+        return True
@@ -0,0 +1,108 @@
+import argparse
+import os
+import socket
+import threading
+import time
+from protocol import HEADER_SIZE, FramedSocket, pack_frame
+
+# Beban kerja: (nama, ukuran payload, jumlah pesan). Ukuran 13 byte kira-kira satu input biner.
+WORKLOADS = (
+    ('input', 13, 50000),
+    ('snapshot', 400, 20000),
+    ('avatar', 256 * 1024, 100),
+)
+
+
+class CountingSocket:
+    # Membungkus socket untuk menghitung syscall baca dan buffer byte baru yang dibuat pembaca.
+    # memoryview yang menunjuk ke buffer FramedSocket tidak dihitung: tidak menyalin data.
+    def __init__(self, sock):
+        self.sock = sock
+        self.recv_calls = 0
+        self.allocations = 0
+
+    def recv(self, size):
+        self.recv_calls += 1
+        self.allocations += 1
+        return self.sock.recv(size)
+
+    def recv_into(self, view):
+        self.recv_calls += 1
+        return self.sock.recv_into(view)
+
+
+def old_receive(conn):
+    # Pembacaan sebelum FramedSocket: header ASCII 10 byte, potongan 4096 byte yang disambung.
+    header_data = b''
+    while len(header_data) < 10:
+        chunk = conn.recv(10 - len(header_data))
+        if not chunk: return None
+        header_data += chunk
+        conn.allocations += 1
+    msglen = int(header_data.decode())
+    full_msg = b''
+    while len(full_msg) < msglen:
+        chunk = conn.recv(min(msglen - len(full_msg), 4096))
+        if not chunk: return None
+        full_msg += chunk
+        conn.allocations += 1
+    return full_msg
+
+
+def old_frame(payload):
+    return f"{len(payload):<10}".encode() + payload
+
+
+def run(reader_name, size, count):
+    left, right = socket.socketpair()
+    payload = os.urandom(size)
+    frame = old_frame(payload) if reader_name == 'lama' else pack_frame(payload)
+
+    def sender():
+        # Frame dikirim berkelompok supaya satu recv bisa berisi banyak pesan kecil, seperti di jaringan.
+        batch = frame * max(1, 64 * 1024 // len(frame))
+        per_batch = len(batch) // len(frame)
+        sent = 0
+        while sent < count:
+            n = min(per_batch, count - sent)
+            right.sendall(batch if n == per_batch else frame * n)
+            sent += n
+
+    thread = threading.Thread(target=sender, daemon=True)
+    counting = CountingSocket(left)
+    framed = FramedSocket(counting) if reader_name == 'baru' else None
+    buffers = {id(framed.buffer)} if framed else set()
+    thread.start()
+    start = time.perf_counter()
+    for _ in range(count):
+        if framed is None:
+            data = old_receive(counting)
+        else:
+            data = framed.read_frame()
+            buffers.add(id(framed.buffer))
+        if data is None or len(data) != size:
+            raise RuntimeError("Frame rusak atau koneksi tertutup.")
+    elapsed = time.perf_counter() - start
+    thread.join()
+    left.close()
+    right.close()
+    allocations = counting.allocations + len(buffers)
+    return elapsed / count * 1e6, counting.recv_calls / count, allocations / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pembacaan frame TCP: cara lama vs FramedSocket.")
+    parser.add_argument('--scale', type=float, default=1.0, help="Pengali jumlah pesan per beban kerja.")
+    args = parser.parse_args()
+
+    print(f"header frame baru {HEADER_SIZE} byte (lama 10 byte ASCII)")
+    print(f"{'beban':<10}{'pembaca':<9}{'us/pesan':>10}{'recv/pesan':>12}{'buffer baru/pesan':>19}")
+    for name, size, count in WORKLOADS:
+        count = max(1, int(count * args.scale))
+        for reader_name in ('lama', 'baru'):
+            us, recvs, allocations = run(reader_name, size, count)
+            print(f"{name:<10}{reader_name:<9}{us:>10.2f}{recvs:>12.3f}{allocations:>19.4f}")
+
+
+if __name__ == "__main__":
+    main()
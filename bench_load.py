@@ -0,0 +1,149 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from bot import BOT_INPUT_RATE, run_bots
+
+STATS_PATTERN = re.compile(r"\[Stats\] tick n=(\d+) rata2=(\d+)us p50<=(\d+)us p99<=(\d+)us maks=(\d+)us "
+                           r"overrun=(\d+) .* cpu=([\d.]+)%")
+IO_PATTERN = re.compile(r"\[Stats\] io n=(\d+) .* cpu=([\d.]+)%")
+PHASE_PATTERN = re.compile(r"\[Stats\]   (\w+) +n=(\d+) rata2=(\d+)us p50<=(\d+)us p99<=(\d+)us maks=(\d+)us")
+OUTPUT_PATTERN = re.compile(r"\[Stats\] keluaran .*: pesan=(\d+) frame=(\d+) byte=(\d+)->(\d+) hemat_byte=-?\d+ "
+                            r"cpu_kemas=([\d.]+)ms cpu_kirim=([\d.]+)ms hemat_cpu=(-?[\d.]+)ms")
+REPORTED_PHASES = ('input', 'input_enqueue', 'lock_wait', 'flush')
+OUTPUT_WAIT = 3
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start_server(port, mode, engine, udp_shim=None, interest_radius=None, compress_level=None, extra_args=()):
+    command = [sys.executable, '-u', 'server.py', '--port', str(port), '--mode', mode,
+               '--engine', engine, '--stats-interval', '1', *extra_args]
+    if compress_level is not None:
+        command += ['--compress-level', str(compress_level)]
+    if interest_radius:
+        command += ['--interest-radius', str(interest_radius)]
+    if udp_shim is not None:
+        loss, latency, jitter = udp_shim
+        command += ['--udp', '--udp-loss', str(loss), '--udp-latency', str(latency), '--udp-jitter', str(jitter)]
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    ready = threading.Event()
+    stats = []
+    io_stats = []
+    phases = []
+    outputs = []
+
+    def read_output():
+        for line in process.stdout:
+            if line.startswith('[Server] Server') and 'berjalan' in line:
+                ready.set()
+            match = STATS_PATTERN.search(line)
+            if match:
+                stats.append(match.groups())
+            match = IO_PATTERN.search(line)
+            if match:
+                io_stats.append(match.groups())
+            match = PHASE_PATTERN.search(line)
+            if match and match.group(1) in REPORTED_PHASES:
+                phases.append((len(stats), match.groups()))
+            match = OUTPUT_PATTERN.search(line)
+            if match:
+                outputs.append(match.groups())
+
+    threading.Thread(target=read_output, daemon=True).start()
+    if not ready.wait(10):
+        process.kill()
+        raise RuntimeError("Server tidak siap dalam 10 detik.")
+    return process, stats, io_stats, phases, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji beban server dengan bot headless.")
+    parser.add_argument('--bots', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--rate', type=float, default=BOT_INPUT_RATE)
+    parser.add_argument('--port', type=int, default=5600)
+    parser.add_argument('--mode', choices=('threaded', 'async'), default='threaded')
+    parser.add_argument('--engine', choices=('dict', 'numpy'), default='dict')
+    parser.add_argument('--udp', action='store_true', help="Snapshot dan input gerak lewat UDP.")
+    parser.add_argument('--loss', type=float, default=0.0, help="Peluang datagram UDP hilang (dua arah).")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latensi tambahan datagram UDP (detik).")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Jitter maksimum datagram UDP (detik).")
+    parser.add_argument('--interest-radius', type=float, help="Radius area minat snapshot per klien.")
+    parser.add_argument('--compress-level', type=int, help="Level zlib maksimum di server (0 = tanpa kompresi).")
+    parser.add_argument('--workers', type=int, default=0, help="Jumlah proses worker simulasi di server.")
+    args = parser.parse_args()
+
+    udp_shim = (args.loss, args.latency, args.jitter) if args.udp else None
+    extra_args = ('--workers', str(args.workers)) if args.workers else ()
+    process, stats, io_stats, phases, outputs = start_server(args.port, args.mode, args.engine, udp_shim,
+                                                             args.interest_radius, args.compress_level, extra_args)
+    try:
+        # Worker mencetak histogram tick-nya sendiri; tunggu laporan pertama semuanya sebelum mulai.
+        deadline = time.monotonic() + OUTPUT_WAIT
+        while len(stats) < args.workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+        warmup = len(stats)
+        io_warmup = len(io_stats)
+        bots = run_bots('127.0.0.1', args.port, args.bots, args.duration, args.rate, udp=args.udp, udp_shim=udp_shim)
+        samples = stats[warmup:]
+        io_samples = io_stats[io_warmup:]
+        phase_samples = [groups for index, groups in phases if index > warmup]
+        # Penghitung keluaran dicetak server saat tiap koneksi ditutup.
+        deadline = time.monotonic() + OUTPUT_WAIT
+        while len(outputs) < len(bots) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"bot={len(bots)}/{args.bots} durasi={args.duration}s mode={args.mode} engine={args.engine} "
+          f"worker={args.workers}")
+    if samples:
+        p50s = [int(s[2]) for s in samples]
+        p99s = [int(s[3]) for s in samples]
+        print(f"tick        p50<={statistics.median_low(p50s)}us p99<={max(p99s)}us maks={max(int(s[4]) for s in samples)}us "
+              f"overrun={sum(int(s[5]) for s in samples)} dari {sum(int(s[0]) for s in samples)} tick")
+        print(f"cpu         rata2={statistics.mean(float(s[6]) for s in samples):.1f}% puncak={max(float(s[6]) for s in samples):.1f}%")
+    if io_samples:
+        print(f"cpu io      rata2={statistics.mean(float(s[1]) for s in io_samples):.1f}% "
+              f"puncak={max(float(s[1]) for s in io_samples):.1f}%")
+    for phase in REPORTED_PHASES:
+        rows = [s for s in phase_samples if s[0] == phase]
+        if rows:
+            count = sum(int(s[1]) for s in rows)
+            mean = sum(int(s[1]) * int(s[2]) for s in rows) / count if count else 0
+            print(f"{phase:<14}n={count} rata2={mean:.0f}us p99<={max(int(s[4]) for s in rows)}us "
+                  f"maks={max(int(s[5]) for s in rows)}us")
+    for kind in ('game_update', 'game_delta'):
+        sizes = [size for bot in bots for size in bot.snapshot_sizes[kind]]
+        if sizes:
+            print(f"{kind:<12}n={len(sizes)} rata2={statistics.mean(sizes):.0f}B p99={percentile(sizes, 0.99)}B")
+    snapshots = sum(len(bot.snapshot_sizes[kind]) for bot in bots for kind in ('game_update', 'game_delta'))
+    print(f"throughput  {snapshots / args.duration:.0f} snapshot/s diterima semua bot")
+    if outputs:
+        messages, frames, raw, sent = (sum(int(o[i]) for o in outputs) for i in range(4))
+        pack_ms, send_ms, saved_ms = (sum(float(o[i]) for o in outputs) for i in range(4, 7))
+        saved = (1 - sent / raw) * 100 if raw else 0
+        print(f"keluaran    pesan={messages} frame={frames} byte={raw}->{sent} (hemat {saved:.1f}%) "
+              f"cpu kemas={pack_ms:.0f}ms kirim={send_ms:.0f}ms hemat~{saved_ms:.0f}ms")
+    if args.udp:
+        print(f"udp         aktif={sum(bot.network.udp_confirmed for bot in bots)} bot "
+              f"snapshot basi dibuang={sum(bot.stale_snapshots for bot in bots)}")
+    latencies = [latency * 1000 for bot in bots for latency in bot.latencies]
+    if latencies:
+        print(f"latensi     n={len(latencies)} p50={percentile(latencies, 0.5):.1f}ms p99={percentile(latencies, 0.99):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
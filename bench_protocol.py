@@ -0,0 +1,98 @@
+import argparse
+import math
+import os
+import random
+import timeit
+import zlib
+from protocol import CODECS_BY_NAME, DEFAULT_COMPRESS_LEVEL
+from server import INTEREST_CELL_SIZE, INTEREST_MARGIN, SCOREBOARD_SIZE
+from snapshot import InterestIndex, diff_snapshots, take_snapshot
+
+
+def make_game_state(num_players, num_items):
+    # Arena membesar bersama jumlah pemain (kepadatan tetap), seperti arena bergulir yang besar.
+    width = max(800, int(math.sqrt(num_players) * 150))
+    height = max(600, int(math.sqrt(num_players) * 150))
+    players = {}
+    for pid in range(num_players):
+        players[pid] = {
+            'pos': [random.uniform(25, width - 25), random.uniform(25, height - 25)], 'username': f"pemain{pid}",
+            'is_it': pid == 0, 'inventory': random.choice([None, 'speed_boost', 'banana_trap']),
+            'speed': 4, 'effect_timer': random.uniform(0, 5), 'stunned': False,
+            'score': random.randint(0, 200), 'immunity_timer': 0
+        }
+    items = [{'type': random.choice(['speed_boost', 'banana_trap']),
+              'pos': [random.randint(15, width - 15), random.randint(15, height - 15)], 'id': i + 1}
+             for i in range(num_items)]
+    return {'players': players, 'items': items, 'game_started': True,
+            'game_time': 123.4, 'winner': None, 'game_over_timer': 0}
+
+
+def make_game_delta(state, interest_radius=None):
+    base = take_snapshot(state)
+    current = take_snapshot(state)
+    # Satu tick biasa: sekitar separuh pemain bergerak, timer berkurang, item tidak berubah.
+    for pid, player in current['players'].items():
+        if pid % 2 == 0:
+            player['pos'] = [player['pos'][0] + 4, player['pos'][1]]
+    current['game_time'] -= 1 / 30
+    if interest_radius:
+        base, visible = interest_view(base, interest_radius)
+        current, _ = interest_view(current, interest_radius, visible)
+    return {'type': 'game_delta', 'seq': 2, 'base': 1, **diff_snapshots(base, current)}
+
+
+def interest_view(snapshot, radius, visible=None):
+    # Snapshot yang dilihat pemain 1 bila server memakai --interest-radius.
+    index = InterestIndex(snapshot, INTEREST_CELL_SIZE, SCOREBOARD_SIZE)
+    if visible is None:
+        return index.view(1, radius, INTEREST_MARGIN)
+    return index.view(1, radius, INTEREST_MARGIN, visible)
+
+
+def bench_codec(codec, message, number, level):
+    payload = codec.encode(message)
+    encode_us = timeit.timeit(lambda: codec.encode(message), number=number) / number * 1e6
+    decode_us = timeit.timeit(lambda: codec.decode(payload), number=number) / number * 1e6
+    zlib_us = timeit.timeit(lambda: zlib.compress(payload, level), number=number) / number * 1e6
+    return len(payload), encode_us, decode_us, len(zlib.compress(payload, level)), zlib_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark codec protokol Tag Arena.")
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--tick-rate', type=int, default=30)
+    parser.add_argument('--number', type=int, default=5000)
+    parser.add_argument('--interest-radius', type=float, help="Tambahkan snapshot terpotong area minat.")
+    parser.add_argument('--compress-level', type=int, default=DEFAULT_COMPRESS_LEVEL, help="Level zlib yang diukur.")
+    args = parser.parse_args()
+
+    random.seed(1)
+    state = make_game_state(args.players, args.items)
+    messages = {
+        'game_update': {'type': 'game_update', 'seq': 1, 'state': state},
+        'game_delta': make_game_delta(state),
+        'input': {'type': 'input', 'move_x': 0.7071, 'move_y': -0.7071, 'use_item': False, 'seq': 1},
+        'all_players_data': {'type': 'all_players_data', 'data': {
+            pid: {'username': f"pemain{pid}", 'avatar_hash': os.urandom(32).hex()} for pid in range(args.players)}},
+    }
+    if args.interest_radius:
+        messages['game_update_aoi'] = {'type': 'game_update', 'seq': 1,
+                                       'state': interest_view(take_snapshot(state), args.interest_radius)[0]}
+        messages['game_delta_aoi'] = make_game_delta(state, args.interest_radius)
+
+    print(f"{'pesan':<18}{'codec':<8}{'byte':>8}{'encode us':>12}{'decode us':>12}{'byte/tick':>12}"
+          f"{'zlib byte':>11}{'zlib us':>10}")
+    for msg_name, message in messages.items():
+        for codec in CODECS_BY_NAME.values():
+            size, encode_us, decode_us, zlib_size, zlib_us = bench_codec(codec, message, args.number,
+                                                                         args.compress_level)
+            # Setiap tick mengirim game_update ke semua pemain dan menerima satu input dari tiap pemain.
+            per_tick = size * args.players if msg_name.startswith(('game_update', 'game_delta', 'input')) else 0
+            print(f"{msg_name:<18}{codec.name:<8}{size:>8}{encode_us:>12.2f}{decode_us:>12.2f}{per_tick:>12}"
+                  f"{zlib_size:>11}{zlib_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from bench_load import start_server
+from bot import BOT_INPUT_RATE, run_bots
+
+
+def start_relay(port, feed_port, rate, delay):
+    command = [sys.executable, '-u', 'relay.py', '--port', str(port), '--feed-port', str(feed_port),
+               '--rate', str(rate), '--delay', str(delay), '--stats-interval', '1']
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    ready = threading.Event()
+    reports = []
+
+    def read_output():
+        for line in process.stdout:
+            # Thread feed dan loop relay mencetak bersamaan; baris bisa tersambung.
+            if '[Relay] Berlangganan feed' in line:
+                ready.set()
+            if line.startswith(('[Relay] penonton=', '[Stats] tick')):
+                reports.append(line.strip())
+
+    threading.Thread(target=read_output, daemon=True).start()
+    if not ready.wait(10):
+        process.kill()
+        raise RuntimeError("Relay tidak tersambung ke feed server dalam 10 detik.")
+    return process, reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji relay penonton: kerja tick server vs jumlah penonton.")
+    parser.add_argument('--players', type=int, default=30)
+    parser.add_argument('--spectators', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--rate', type=float, default=10, help="Snapshot per detik dari relay ke penonton.")
+    parser.add_argument('--delay', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=5700)
+    parser.add_argument('--mode', choices=('threaded', 'async'), default='threaded')
+    args = parser.parse_args()
+
+    feed_port, relay_port = args.port + 1, args.port + 2
+    server, stats, _, _, _ = start_server(args.port, args.mode, 'dict', extra_args=['--spectator-port', str(feed_port)])
+    relay = None
+    try:
+        relay, relay_reports = start_relay(relay_port, feed_port, args.rate, args.delay)
+        results = {}
+        # Pemain mulai dulu supaya room sudah ada ketika penonton bergabung.
+        players = threading.Thread(target=lambda: results.setdefault('players', run_bots(
+            '127.0.0.1', args.port, args.players, args.duration + 2, BOT_INPUT_RATE)), daemon=True)
+        players.start()
+        time.sleep(1)
+        warmup = len(stats)
+        spectators = run_bots('127.0.0.1', relay_port, args.spectators, args.duration, spectate=True,
+                              connect_delay=0.002)
+        players.join()
+        samples = stats[warmup:]
+    finally:
+        for process in (relay, server):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    print(f"pemain={len(results.get('players', []))}/{args.players} penonton={len(spectators)}/{args.spectators} "
+          f"durasi={args.duration}s rate={args.rate}Hz tunda={args.delay}s mode={args.mode}")
+    if samples:
+        print(f"tick server p50<={statistics.median_low(int(s[2]) for s in samples)}us "
+              f"p99<={max(int(s[3]) for s in samples)}us cpu={statistics.mean(float(s[6]) for s in samples):.1f}%")
+    received = [len(bot.snapshot_sizes['game_update']) + len(bot.snapshot_sizes['game_delta']) for bot in spectators]
+    if received:
+        keyframes = sum(len(bot.snapshot_sizes['game_update']) for bot in spectators)
+        print(f"penonton    snapshot/s rata2={statistics.mean(received) / args.duration:.1f} "
+              f"min={min(received) / args.duration:.1f} keyframe={keyframes} basi={sum(b.stale_snapshots for b in spectators)}")
+    for line in relay_reports[-2:]:
+        print(f"relay       {line}")
+
+
+if __name__ == "__main__":
+    main()
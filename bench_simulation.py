@@ -0,0 +1,133 @@
+import argparse
+import concurrent.futures
+import itertools
+import math
+import os
+import random
+import statistics
+import time
+from config import SERVER_TICK_RATE
+from rules import DEFAULT_PARAMS
+from simulation import DictEngine, NumpyEngine, PlayerArrays, TickInputs, add_player, new_state, step
+
+ENGINES = {'dict': DictEngine, 'numpy': NumpyEngine}
+
+
+def choose_move(state, pid, it_pos, rng):
+    # Bot sederhana: 'It' mengejar pemain terdekat, yang lain menjauh dari 'It' dengan sedikit acak.
+    players = state['players']
+    player = players[pid]
+    x, y = player['pos']
+    if player['is_it']:
+        others = [p['pos'] for other, p in players.items() if other != pid and p['immunity_timer'] <= 0]
+        if not others:
+            return rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1))
+        tx, ty = min(others, key=lambda pos: (pos[0] - x) ** 2 + (pos[1] - y) ** 2)
+        dx, dy = tx - x, ty - y
+    else:
+        dx, dy = x - it_pos[0], y - it_pos[1]
+        dx += rng.uniform(-60, 60)
+        dy += rng.uniform(-60, 60)
+    length = math.hypot(dx, dy) or 1
+    return dx / length, dy / length
+
+
+def run_match(params, seed, engine_name):
+    # Satu match headless dari lobi penuh sampai selesai; aturan yang sama dengan server.
+    rng = random.Random(seed)
+    bot_rng = random.Random(seed ^ 0x5EED)
+    engine = ENGINES[engine_name](params)
+    state = new_state(params)
+    inputs = TickInputs({}, set(), {}, {})
+    for pid in range(params.max_players):
+        add_player(state, pid, rng, params)['username'] = f"bot{pid}"
+        inputs.moves[pid] = {}
+    engine.reload(state, inputs.moves)
+
+    dt = 1 / SERVER_TICK_RATE
+    ticks = tags = 0
+    winner = None
+    while winner is None:
+        if state['game_started'] and ticks % 3 == 0:
+            engine.flush(state)
+            it_pos = next((p['pos'] for p in state['players'].values() if p['is_it']), (0, 0))
+            for pid, player in state['players'].items():
+                move_x, move_y = choose_move(state, pid, it_pos, bot_rng)
+                inputs.moves[pid] = {'move_x': move_x, 'move_y': move_y}
+                engine.set_input(pid, inputs.moves[pid])
+                if player['inventory'] and bot_rng.random() < 0.05:
+                    inputs.use_item.add(pid)
+        _, events = step(state, inputs, dt, rng, engine)
+        ticks += 1
+        for event in events:
+            if event[0] == 'tag':
+                tags += 1
+            elif event[0] == 'finish':
+                winner = event[1]
+    engine.flush(state)
+    scores = sorted(p['score'] for p in state['players'].values())
+    return ticks, tags, scores
+
+
+def run_batch(params, seeds, engine_name):
+    return [run_match(params, seed, engine_name) for seed in seeds]
+
+
+def parse_sweep(values):
+    # --set nama=v1,v2 ... menjadi daftar RuleParams (produk kartesius semua nilai).
+    axes = []
+    for spec in values:
+        name, _, raw = spec.partition('=')
+        if name not in DEFAULT_PARAMS._fields or not raw:
+            raise SystemExit(f"Parameter tidak dikenal atau tanpa nilai: {spec}")
+        options = []
+        for value in raw.split(','):
+            number = float(value)
+            options.append(int(number) if number.is_integer() else number)
+        axes.append([(name, value) for value in options])
+    return [DEFAULT_PARAMS._replace(**dict(combo)) for combo in itertools.product(*axes)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulasi batch match tanpa jaringan untuk uji keseimbangan aturan.")
+    parser.add_argument('--matches', type=int, default=200, help="Jumlah match per kombinasi parameter.")
+    parser.add_argument('--set', action='append', default=[], metavar='NAMA=V1,V2',
+                        help="Nilai RuleParams yang dicoba, mis. speed_boost_multiplier=1.5,1.8,2.2.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--engine', choices=sorted(ENGINES), default='dict')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if args.engine == 'numpy' and PlayerArrays is None:
+        raise SystemExit("NumPy tidak terpasang.")
+
+    variants = parse_sweep(args.set)
+    swept = [spec.partition('=')[0] for spec in args.set]
+    chunk = max(1, args.matches // (args.workers * 4))
+    started = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as pool:
+        futures = []
+        for index, params in enumerate(variants):
+            seeds = [args.seed + i for i in range(args.matches)]
+            for i in range(0, len(seeds), chunk):
+                futures.append((index, pool.submit(run_batch, params, seeds[i:i + chunk], args.engine)))
+        results = [[] for _ in variants]
+        for index, future in futures:
+            results[index].extend(future.result())
+    wall = time.perf_counter() - started
+
+    total_ticks = sum(ticks for batch in results for ticks, _, _ in batch)
+    print(f"[Sim] {len(variants) * args.matches} match, {total_ticks} tick dalam {wall:.2f}s "
+          f"({total_ticks / wall:,.0f} tick/s, {args.workers} proses, engine {args.engine}).")
+    header = ''.join(f"{name:>24}" for name in swept)
+    print(f"{header}{'tag/menit':>11}{'skor rata2':>12}{'selisih skor':>14}")
+    for params, batch in zip(variants, results):
+        minutes = sum(ticks for ticks, _, _ in batch) / SERVER_TICK_RATE / 60
+        tag_rate = sum(tags for _, tags, _ in batch) / minutes
+        mean_score = statistics.mean(score for _, _, scores in batch for score in scores)
+        spread = statistics.mean(scores[-1] - scores[0] for _, _, scores in batch)
+        values = ''.join(f"{getattr(params, name)!s:>24}" for name in swept)
+        print(f"{values}{tag_rate:>11.2f}{mean_score:>12.1f}{spread:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
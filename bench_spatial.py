@@ -0,0 +1,89 @@
+import argparse
+import math
+import random
+import time
+import server
+from rules import DEFAULT_PARAMS, distance
+from simulation import new_item_id
+
+
+def make_room(num_players, num_items, room_class=server.Room):
+    # Kepadatan arena dijaga tetap supaya jumlah tetangga per pemain tidak ikut membesar.
+    size = max(800, int(math.sqrt(num_players) * 150))
+    params = DEFAULT_PARAMS._replace(arena_width=size, arena_height=size)
+    room = room_class(0, params=params)
+    for _ in range(num_players):
+        room.register_player(None)
+    room.apply_commands()
+    for pid in room.game_state['players']:
+        room.game_state['players'][pid]['pos'] = [random.uniform(params.player_radius, size - params.player_radius),
+                                                  random.uniform(params.player_radius, size - params.player_radius)]
+    room.game_state['players'][0]['is_it'] = True
+    room.reload_view()
+    for pid in room.game_state['players']:
+        room.store_inputs(pid, {'move_x': random.choice([-1, 0, 1]), 'move_y': random.choice([-1, 0, 1])})
+    room.drain_inputs()
+    state = room.game_state
+    state['items'] = [
+        {'type': random.choice(params.item_types), 'id': new_item_id(state),
+         'pos': [random.randint(params.item_radius, size - params.item_radius),
+                 random.randint(params.item_radius, size - params.item_radius)]}
+        for _ in range(num_items)]
+    state['game_started'] = True
+    state['game_start_time'] = state['last_score_update_time'] = state['last_item_spawn_time'] = state['sim_time']
+    return room
+
+
+def naive_collisions(room):
+    players = room.game_state['players']
+    params = room.params
+    it_pos = players[0]['pos']
+    for pid, pdata in players.items():
+        if pid != 0 and distance(it_pos, pdata['pos']) < params.player_radius * 2:
+            break
+    for item in room.game_state['items']:
+        for pid, pdata in players.items():
+            if distance(pdata['pos'], item['pos']) < params.player_radius + params.item_radius:
+                break
+
+
+def grid_collisions(room):
+    players = room.game_state['players']
+    params = room.params
+    room.players_near(players[0]['pos'], params.player_radius * 2)
+    for item in room.game_state['items']:
+        room.players_near(item['pos'], params.player_radius + params.item_radius)
+
+
+def time_per_call(func, room, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(room)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu tick terhadap jumlah entitas.")
+    parser.add_argument('--counts', type=int, nargs='+', default=[3, 10, 50, 100, 250, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(1)
+    print(f"{'pemain':>8}{'item':>8}{'tick us':>12}{'numpy us':>12}{'grid us':>12}{'naif us':>12}")
+    for count in args.counts:
+        num_items = max(5, count // 2)
+        state = random.getstate()
+        room = make_room(count, num_items)
+        tick_us = time_per_call(lambda r: r.tick(1 / server.SERVER_TICK_RATE), room, args.repeat)
+        grid_us = time_per_call(grid_collisions, room, args.repeat)
+        naive_us = time_per_call(naive_collisions, room, max(1, args.repeat // 5))
+        numpy_us = float('nan')
+        if server.PlayerArrays is not None:
+            random.setstate(state)
+            vector_room = make_room(count, num_items, server.VectorRoom)
+            numpy_us = time_per_call(lambda r: r.tick(1 / server.SERVER_TICK_RATE), vector_room, args.repeat)
+        print(f"{count:>8}{num_items:>8}{tick_us:>12.1f}{numpy_us:>12.1f}{grid_us:>12.1f}{naive_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
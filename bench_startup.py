@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Dijalankan di proses baru supaya modul dan cache OS tidak terbawa antar percobaan.
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+timings = {}
+import client
+from asset_cache import AssetAtlas
+timings['import'] = time.perf_counter() - start
+if sys.argv[1] == 'lama':
+    # Perilaku sebelum atlas: cv2 dan server ikut diimpor, aset selalu diproses ulang.
+    mark = time.perf_counter()
+    import cv2, server
+    timings['import'] += time.perf_counter() - mark
+    client.asset_atlas.load = lambda sources, params: None
+    client.asset_atlas.save = lambda surfaces, sources, params: False
+else:
+    client.asset_atlas = AssetAtlas(sys.argv[2])
+mark = time.perf_counter()
+client.init_display()
+timings['display'] = time.perf_counter() - mark
+mark = time.perf_counter()
+client.load_assets()
+timings['assets'] = time.perf_counter() - mark
+print('TIMINGS ' + json.dumps(timings))
+"""
+
+SCENARIOS = (
+    ('lama', "perilaku lama"),
+    ('dingin', "atlas belum ada"),
+    ('hangat', "atlas sudah ada"),
+)
+
+
+def run_child(scenario, cache_dir, env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, scenario, cache_dir],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    for line in result.stdout.splitlines():
+        if line.startswith('TIMINGS '):
+            timings = json.loads(line[len('TIMINGS '):])
+            timings['total'] = wall
+            return timings
+    raise RuntimeError(f"Proses anak gagal:\n{result.stdout}{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu start klien (import, display, aset).")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--window', action='store_true', help="Buka jendela sungguhan, bukan driver SDL dummy.")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.window:
+        env.setdefault('SDL_VIDEODRIVER', 'dummy')
+        env.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+    cache_root = tempfile.mkdtemp(prefix='tag_arena_bench_')
+    try:
+        results = {}
+        for scenario, _ in SCENARIOS:
+            samples = []
+            for i in range(args.runs):
+                cache_dir = os.path.join(cache_root, f"{scenario}{i}")
+                if scenario == 'hangat':
+                    run_child('dingin', cache_dir, env)
+                samples.append(run_child(scenario, cache_dir, env))
+            results[scenario] = {phase: statistics.median(s[phase] for s in samples)
+                                 for phase in ('import', 'display', 'assets', 'total')}
+    finally:
+        shutil.rmtree(cache_root, ignore_errors=True)
+
+    print(f"{'skenario':<18}{'import ms':>11}{'display ms':>12}{'aset ms':>10}{'total ms':>11}")
+    for scenario, label in SCENARIOS:
+        r = results[scenario]
+        print(f"{label:<18}{r['import'] * 1000:>11.0f}{r['display'] * 1000:>12.0f}"
+              f"{r['assets'] * 1000:>10.0f}{r['total'] * 1000:>11.0f}")
+    baseline = results['lama']['total']
+    for scenario, label in SCENARIOS[1:]:
+        saved = baseline - results[scenario]['total']
+        print(f"{label}: {saved * 1000:.0f} ms lebih cepat dari perilaku lama ({saved / baseline:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import itertools
+import random
+import struct
+import threading
+import time
+import zlib
+from avatar_cache import avatar_hash
+from config import ARENA_HEIGHT, ARENA_WIDTH, PORT, RELAY_PORT, SERVER_TICK_RATE
+from network import Network
+from snapshot import apply_delta
+
+BOT_INPUT_RATE = 30
+BOT_HISTORY = 128
+LATENCY_TIMEOUT = 2
+
+
+def stub_avatar_png(size=8, color=(200, 80, 40)):
+    # PNG RGB polos kecil, cukup untuk dilewatkan server dan didekode klien.
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    row = b'\x00' + bytes(color) * size
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * size))
+            + chunk(b'IEND', b''))
+
+
+def random_script(rng):
+    # Jalan acak: sesekali berhenti, lalu bergerak ke arah acak yang condong ke tengah arena.
+    while True:
+        if rng.random() < 0.3:
+            step = (0, 0, False)
+        else:
+            step = (rng.choice([-1, 0, 1]), rng.choice([-1, 0, 1]), rng.random() < 0.05)
+        for _ in range(rng.randint(10, 40)):
+            yield step
+
+
+class Bot:
+    def __init__(self, server_ip, server_port, username, rate=BOT_INPUT_RATE, script=None, seed=None,
+                 udp=False, udp_shim=None, spectate=False, room=None):
+        self.server_ip = server_ip
+        self.server_port = server_port
+        self.username = username
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.script = itertools.cycle(script) if script else random_script(self.rng)
+        self.network = None
+        self.udp = udp
+        self.udp_shim = udp_shim
+        # Penonton (lewat relay.py) hanya menerima snapshot, tanpa slot pemain dan tanpa input.
+        self.spectate = spectate
+        self.room = room
+        self.input_seq = 0
+        # Seq menghitung langkah tick seperti klien, bukan jumlah pesan, agar server tidak menunggu
+        # atau tertinggal saat --rate berbeda dari tick rate.
+        self.seq_step = max(1, round(SERVER_TICK_RATE / rate))
+        self.player_id = None
+        self.state = {}
+        self.history = {}
+        self.last_seq = None
+        self.keyframe_needed = False
+        self.running = False
+        self.lock = threading.Lock()
+        self.snapshot_sizes = {'game_update': [], 'game_delta': []}
+        self.latencies = []
+        self.stale_snapshots = 0
+        self.pending_move = None
+        self.last_move = (0, 0)
+        self.avatar_data = stub_avatar_png(color=(self.rng.randrange(256), self.rng.randrange(256), self.rng.randrange(256)))
+        self.avatar_hash = avatar_hash(self.avatar_data)
+
+    def connect(self):
+        self.network = Network(self.server_ip, self.server_port, udp_shim=self.udp_shim)
+        if not self.network.is_connected():
+            return False
+        self.running = True
+        threading.Thread(target=self.receive_loop, daemon=True).start()
+        if self.spectate:
+            self.network.send({'type': 'spectate', 'room': self.room})
+        else:
+            self.network.send({'type': 'join', 'username': self.username, 'avatar_hash': self.avatar_hash})
+        return True
+
+    def receive_loop(self):
+        while self.running:
+            message = self.network.receive()
+            if message is None:
+                self.running = False
+                break
+            self.handle_message(message)
+
+    def handle_message(self, message):
+        msg_type = message.get('type')
+        with self.lock:
+            if msg_type in ('game_update', 'game_delta') and self.last_seq is not None and message['seq'] <= self.last_seq:
+                self.stale_snapshots += 1
+                return
+            if msg_type == 'your_id':
+                self.player_id = message['id']
+            elif msg_type == 'avatar_request' and self.avatar_hash in message.get('hashes', ()):
+                self.network.send({'type': 'avatar_blob', 'hash': self.avatar_hash, 'data': self.avatar_data})
+            elif msg_type == 'udp_offer' and self.udp:
+                self.network.start_udp(message['token'], message['port'], self.handle_message)
+            elif msg_type == 'error':
+                print(f"[Bot {self.username}] Ditolak server: {message.get('message')}")
+                self.running = False
+            elif msg_type == 'game_update':
+                self.snapshot_sizes[msg_type].append(self.network.last_message_size)
+                self.store_snapshot(message['seq'], message['state'])
+            elif msg_type == 'game_delta':
+                self.snapshot_sizes[msg_type].append(self.network.last_message_size)
+                base = self.history.get(message['base'])
+                if base is None:
+                    self.keyframe_needed = True
+                else:
+                    self.store_snapshot(message['seq'], apply_delta(base, message))
+
+    def store_snapshot(self, seq, snapshot):
+        self.history[seq] = snapshot
+        while len(self.history) > BOT_HISTORY:
+            del self.history[next(iter(self.history))]
+        self.last_seq = seq
+        self.keyframe_needed = False
+        self.state = snapshot
+        me = snapshot['players'].get(self.player_id)
+        if self.pending_move and me and me.get('pos') != self.pending_move[1]:
+            self.latencies.append(time.perf_counter() - self.pending_move[0])
+            self.pending_move = None
+
+    def next_input(self):
+        move_x, move_y, use_item = next(self.script)
+        with self.lock:
+            me = self.state.get('players', {}).get(self.player_id)
+            started = self.state.get('game_started')
+            if self.pending_move and time.perf_counter() - self.pending_move[0] > LATENCY_TIMEOUT:
+                self.pending_move = None
+            # Latensi ujung ke ujung diukur dari input "diam -> bergerak" sampai posisi
+            # sendiri berubah di snapshot. Arah diarahkan menjauhi dinding agar gerakan terlihat.
+            if started and me and (move_x or move_y) and self.last_move == (0, 0) and not me.get('stunned'):
+                move_x = 1 if me['pos'][0] < ARENA_WIDTH / 2 else -1
+                move_y = 1 if me['pos'][1] < ARENA_HEIGHT / 2 else -1
+                self.pending_move = (time.perf_counter(), list(me['pos']))
+            self.last_move = (move_x, move_y) if started else (0, 0)
+            inputs = {'type': 'input', 'ack': self.last_seq, 'keyframe': self.keyframe_needed}
+        if started:
+            self.input_seq += self.seq_step
+            inputs.update(move_x=move_x, move_y=move_y, use_item=use_item, seq=self.input_seq)
+        return inputs
+
+    def run(self, duration):
+        interval = 1 / self.rate
+        deadline = time.monotonic() + duration
+        next_send = time.monotonic()
+        while self.spectate and self.running and time.monotonic() < deadline:
+            time.sleep(interval)
+        while not self.spectate and self.running and time.monotonic() < deadline:
+            inputs = self.next_input()
+            if inputs.get('use_item'):
+                self.network.send(inputs)
+            else:
+                self.network.send_unreliable(inputs)
+            next_send += interval
+            time.sleep(max(0, next_send - time.monotonic()))
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        if self.network is not None:
+            self.network.disconnect()
+
+
+def run_bots(server_ip, server_port, count, duration, rate=BOT_INPUT_RATE, connect_delay=0.01, udp=False, udp_shim=None,
+             spectate=False, room=None):
+    bots = []
+    for i in range(count):
+        bot = Bot(server_ip, server_port, f"bot{i}", rate, seed=i, udp=udp, udp_shim=udp_shim, spectate=spectate,
+                  room=room)
+        if bot.connect():
+            bots.append(bot)
+        time.sleep(connect_delay)
+    threads = [threading.Thread(target=bot.run, args=(duration,), daemon=True) for bot in bots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return bots
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bot headless untuk Tag Arena.")
+    parser.add_argument('--server', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help=f"Bawaan {PORT}, atau {RELAY_PORT} (relay) untuk --spectate.")
+    parser.add_argument('--count', type=int, default=3)
+    parser.add_argument('--rate', type=float, default=BOT_INPUT_RATE, help="Input per detik per bot.")
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--udp', action='store_true', help="Terima snapshot lewat UDP bila server menawarkannya.")
+    parser.add_argument('--spectate', action='store_true', help="Menonton lewat relay.py, bukan bermain.")
+    parser.add_argument('--room', type=int, help="Room yang ditonton; bawaan room dengan pemain terbanyak.")
+    args = parser.parse_args()
+    port = args.port or (RELAY_PORT if args.spectate else PORT)
+    bots = run_bots(args.server, port, args.count, args.duration, args.rate, udp=args.udp, spectate=args.spectate,
+                    room=args.room)
+    if args.spectate:
+        received = [len(bot.snapshot_sizes['game_update']) + len(bot.snapshot_sizes['game_delta']) for bot in bots]
+        print(f"[Bot] {len(bots)} penonton selesai, snapshot diterima per penonton: "
+              f"min={min(received, default=0)} maks={max(received, default=0)}.")
+    else:
+        print(f"[Bot] {len(bots)} bot selesai.")
@@ -1,19 +1,30 @@
 # client.py (Diperbaiki dengan input IP)
+import argparse
 import pygame
 import threading
 import pickle
 import os
 import io
-import cv2 
 import time
+from concurrent.futures import ThreadPoolExecutor
+from asset_cache import AssetAtlas
+from avatar_cache import DiskCache, avatar_hash
+from config import ITEM_RADIUS, MAX_PLAYERS, PLAYER_RADIUS, PLAYER_SPEED, PORT
 from network import Network
-from server import PLAYER_SPEED, MAX_PLAYERS
+from perf_stats import PerfStats
+from prediction import INTERPOLATION_DELAY, Predictor, SnapshotBuffer
+from render_cache import DirtyRegions, TextCache
+from snapshot import apply_delta, take_snapshot
 
-SERVER_PORT = 5555
+SERVER_PORT = PORT
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
 FPS = 60
-PLAYER_RADIUS = 25
-ITEM_RADIUS = 15
+CLIENT_SNAPSHOT_HISTORY = 128
+INPUT_HEARTBEAT_INTERVAL = 0.2
+AVATAR_DECODE_WORKERS = 2
+DIRTY_RECT_RENDERING = True
+PING_INTERVAL = 1.0
+PERF_OVERLAY_KEY = pygame.K_F3
 WHITE, BLACK, RED, BLUE, YELLOW, GRAY, GREEN = (255, 255, 255), (0, 0, 0), (255, 0, 0), (0, 0, 255), (255, 255, 0), (150, 150, 150), (40, 150, 50)
 TRANSPARENT_GRAY = (50, 50, 50, 180)
 latest_game_state = {}
@@ -21,15 +32,35 @@ running = True
 lock = threading.Lock()
 player_avatars = {}
 my_player_id = -1
+snapshot_history = {}
+last_snapshot_seq = None
+keyframe_needed = False
 network = None
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Tag Arena Multiplayer")
-clock = pygame.time.Clock()
+predictor = Predictor()
+snapshot_buffer = SnapshotBuffer()
+avatar_disk_cache = DiskCache()
+awaited_avatars = {}
+own_avatar = None
+# Avatar didekode di thread pool terpisah; avatar_lock hanya melindungi data avatar
+# sehingga receive thread dan render loop tidak pernah menunggu pekerjaan gambar.
+avatar_pool = ThreadPoolExecutor(max_workers=AVATAR_DECODE_WORKERS, thread_name_prefix='avatar')
+avatar_lock = threading.Lock()
+avatar_versions = {}
+asset_atlas = AssetAtlas()
+screen = None
+clock = None
 assets = {}
+text_cache = TextCache()
+scoreboard_cache = {'key': None, 'surface': None}
 FONT_BOLD = None
 FONT_REGULAR = None
 FONT_LARGE = None
+FONT_SMALL = None
+# Overlay performa (F3) dan CSV statistik per sesi (--perf-csv).
+show_perf_overlay = False
+perf_csv_dir = None
+perf_stats = None
+perf_overlay = {'surface': None}
 
 def crop_surface(surface):
     try:
@@ -45,18 +76,42 @@ def crop_surface(surface):
     return surface
 
 
+def init_display():
+    global screen, clock
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Tag Arena Multiplayer")
+    clock = pygame.time.Clock()
+
+
+def process_asset(name, image):
+    if name != 'background':
+        image = crop_surface(image)
+    if name == 'background':
+        return pygame.transform.scale(image, (SCREEN_WIDTH, SCREEN_HEIGHT))
+    elif name == 'speed_aura':
+        return pygame.transform.scale(image, (PLAYER_RADIUS * 3, PLAYER_RADIUS * 3))
+    elif name in ['stun_stars']:
+        return image
+    else:
+        size = (ITEM_RADIUS * 2, ITEM_RADIUS * 2) if name not in ['avatar_placeholder'] else (PLAYER_RADIUS * 2, PLAYER_RADIUS * 2)
+        return pygame.transform.scale(image, size)
+
+
 def load_assets():
-    global FONT_BOLD, FONT_REGULAR, FONT_LARGE
+    global FONT_BOLD, FONT_REGULAR, FONT_LARGE, FONT_SMALL
     try:
         font_path = os.path.join('assets', 'Poppins-Bold.ttf')
         FONT_BOLD = pygame.font.Font(font_path, 38)
         FONT_REGULAR = pygame.font.Font(font_path, 20)
         FONT_LARGE = pygame.font.Font(font_path, 52)
+        FONT_SMALL = pygame.font.Font(font_path, 13)
     except FileNotFoundError:
         print("Font Poppins-Bold.ttf tidak ditemukan di folder assets. Menggunakan font default.")
         FONT_BOLD = pygame.font.SysFont('Arial', 38, bold=True)
         FONT_REGULAR = pygame.font.SysFont('Arial', 20)
         FONT_LARGE = pygame.font.SysFont('Arial', 52, bold=True)
+        FONT_SMALL = pygame.font.SysFont('Arial', 13)
 
     asset_files = {
         'banana_trap': 'banana.png', 'speed_boost': 'speed_boost.png',
@@ -64,24 +119,24 @@ def load_assets():
         'avatar_placeholder': 'placeholder.png',
         'stun_stars': 'stun_stars.png', 'speed_aura': 'speed_aura.png'
     }
-    for name, filename in asset_files.items():
-        try:
-            path = os.path.join('assets', filename)
-            image = pygame.image.load(path).convert_alpha()
-            if name != 'background':
-                image = crop_surface(image)
-            if name == 'background':
-                assets[name] = pygame.transform.scale(image, (SCREEN_WIDTH, SCREEN_HEIGHT))
-            elif name == 'speed_aura':
-                assets[name] = pygame.transform.scale(image, (PLAYER_RADIUS * 3, PLAYER_RADIUS * 3))
-            elif name in ['stun_stars']:
-                assets[name] = image
-            else:
-                size = (ITEM_RADIUS * 2, ITEM_RADIUS * 2) if name not in ['avatar_placeholder'] else (PLAYER_RADIUS * 2, PLAYER_RADIUS * 2)
-                assets[name] = pygame.transform.scale(image, size)
-        except pygame.error:
-            print(f"Gagal memuat aset: {filename}.")
-            assets[name] = pygame.Surface((30, 30)); assets[name].fill(RED)
+    sources = {name: os.path.join('assets', filename) for name, filename in asset_files.items()}
+    # Hasil crop dan scale diambil dari atlas di disk; pemrosesan penuh hanya saat atlas basi.
+    params = (SCREEN_WIDTH, SCREEN_HEIGHT, PLAYER_RADIUS, ITEM_RADIUS)
+    cached = asset_atlas.load(sources, params)
+    if cached is not None:
+        assets.update(cached)
+    else:
+        processed = {}
+        for name, path in sources.items():
+            try:
+                processed[name] = process_asset(name, pygame.image.load(path).convert_alpha())
+            except pygame.error:
+                print(f"Gagal memuat aset: {asset_files[name]}.")
+                assets[name] = pygame.Surface((30, 30)); assets[name].fill(RED)
+        assets.update(processed)
+        if len(processed) == len(sources):
+            asset_atlas.save(processed, sources, params)
+    assets['avatar_placeholder_circle'] = create_circular_avatar(assets['avatar_placeholder'], PLAYER_RADIUS * 2)
 
 
 def create_circular_avatar(image_surface, size):
@@ -101,71 +156,178 @@ def create_circular_avatar(image_surface, size):
         return assets.get('avatar_placeholder')
 
 
+def publish_avatar(pid, blob_hash, avatar):
+    # Surface yang sudah jadi dipasang dengan satu assignment, dan hanya bila pemain itu
+    # masih memakai avatar yang sama (bisa saja sudah keluar selama decode berjalan).
+    with avatar_lock:
+        if avatar_versions.get(pid) == blob_hash:
+            player_avatars[pid] = avatar
+
+def decode_avatar(pid, blob_hash, avatar_data):
+    try:
+        img_surface = pygame.image.load(io.BytesIO(avatar_data))
+        avatar = create_circular_avatar(img_surface, PLAYER_RADIUS * 2)
+    except Exception as e:
+        print(f"Gagal memuat avatar untuk pemain {pid}: {e}")
+        return
+    publish_avatar(pid, blob_hash, avatar)
+
+def load_avatar(pid, blob_hash):
+    # Berjalan di avatar_pool: cek cache disk dulu, bila tidak ada minta ke server. Baca disk
+    # berjalan di luar avatar_lock; versi avatar diperiksa ulang sesudahnya.
+    with avatar_lock:
+        if avatar_versions.get(pid) != blob_hash:
+            return
+    avatar_data = avatar_disk_cache.get(blob_hash)
+    if avatar_data is not None:
+        decode_avatar(pid, blob_hash, avatar_data)
+        return
+    with avatar_lock:
+        if avatar_versions.get(pid) != blob_hash:
+            return
+        request = blob_hash not in awaited_avatars
+        awaited_avatars.setdefault(blob_hash, set()).add(pid)
+    if request:
+        network.send({'type': 'avatar_request', 'hashes': [blob_hash]})
+
 def process_and_store_avatar(pid, pdata):
-    if pdata and pdata.get('avatar_data'):
-        try:
-            img_bytes = io.BytesIO(pdata['avatar_data'])
-            img_surface = pygame.image.load(img_bytes).convert_alpha()
-            player_avatars[pid] = create_circular_avatar(img_surface, PLAYER_RADIUS * 2)
-        except Exception as e:
-            print(f"Gagal memuat avatar untuk pemain {pid}: {e}")
-            player_avatars[pid] = create_circular_avatar(assets['avatar_placeholder'], PLAYER_RADIUS * 2)
+    # Avatar dirujuk lewat hash; placeholder tampil sampai hasil decode dipasang.
+    blob_hash = pdata.get('avatar_hash') if pdata else None
+    with avatar_lock:
+        if not blob_hash or avatar_versions.get(pid) == blob_hash or (pid == my_player_id and player_avatars.get(pid)):
+            return
+        avatar_versions[pid] = blob_hash
+        player_avatars[pid] = assets['avatar_placeholder_circle']
+    avatar_pool.submit(load_avatar, pid, blob_hash)
+
+def store_avatar_blob(blob_hash, avatar_data):
+    with avatar_lock:
+        if blob_hash not in awaited_avatars:
+            return
+    # Cek hash dan tulis ke disk tanpa memegang avatar_lock.
+    if not avatar_disk_cache.put(blob_hash, avatar_data):
+        return
+    with avatar_lock:
+        pids = awaited_avatars.pop(blob_hash, ())
+    for pid in pids:
+        decode_avatar(pid, blob_hash, avatar_data)
+
+def forget_avatar(pid):
+    with avatar_lock:
+        avatar_versions.pop(pid, None)
+        player_avatars.pop(pid, None)
+
+def store_snapshot(seq, snapshot, input_ack):
+    global latest_game_state, last_snapshot_seq, keyframe_needed
+    snapshot_history[seq] = snapshot
+    while len(snapshot_history) > CLIENT_SNAPSHOT_HISTORY:
+        del snapshot_history[next(iter(snapshot_history))]
+    last_snapshot_seq = seq
+    keyframe_needed = False
+    latest_game_state = take_snapshot(snapshot)
+    snapshot_buffer.add(time.monotonic(), snapshot['players'])
+    predictor.reconcile(snapshot['players'].get(my_player_id) if snapshot.get('game_started') else None, input_ack)
+
+def predicted_players(players):
+    # Pemain sendiri digambar dari prediksi lokal, pemain lain diinterpolasi sedikit di belakang.
+    positions = snapshot_buffer.sample(time.monotonic() - INTERPOLATION_DELAY)
+    own = predictor.player
+    rendered = {}
+    for pid, pdata in players.items():
+        if pid == my_player_id and own is not None:
+            rendered[pid] = {**pdata, 'pos': own['pos'], 'speed': own['speed'], 'stunned': own['stunned'],
+                             'inventory': own['inventory']}
+        elif pid in positions:
+            rendered[pid] = {**pdata, 'pos': positions[pid]}
+        else:
+            rendered[pid] = pdata
+    return rendered
 
 def receive_data_from_server(network_handler):
-    global latest_game_state, running, my_player_id
+    global running
     while running:
         data_packet = network_handler.receive()
         if data_packet is None:
             print("Koneksi ke server terputus.")
             running = False
             break
-
-        msg_type = data_packet.get('type')
-
-        with lock:
-            if msg_type == 'your_id':
-                my_player_id = data_packet['id']
-                print(f"Anda adalah Pemain {my_player_id}.")
-
-            elif msg_type == 'all_players_data':
-                for pid, pdata in data_packet.get('data', {}).items():
-                    process_and_store_avatar(pid, pdata)
-                    if 'players' not in latest_game_state:
-                        latest_game_state['players'] = {}
-                    if pid not in latest_game_state['players']:
-                         latest_game_state['players'][pid] = {}
-                    latest_game_state['players'][pid]['username'] = pdata.get('username', '...')
-
-            elif msg_type == 'game_update':
-                latest_game_state = data_packet['state']
-
-            elif msg_type == 'new_player':
-                pid = data_packet['id']
-                pdata = data_packet['data']
-                print(f"Pemain baru bergabung: {pdata.get('username', '')} ({pid})")
-                process_and_store_avatar(pid, pdata)
-                if pid not in latest_game_state.get('players', {}):
-                    latest_game_state['players'][pid] = {'username': pdata.get('username')}
-
-            elif msg_type == 'player_left':
-                pid = data_packet['id']
-                if pid in latest_game_state.get('players', {}):
-                    print(f"Pemain {latest_game_state['players'][pid].get('username', '')} keluar.")
-                    del latest_game_state['players'][pid]
-                if pid in player_avatars:
-                    del player_avatars[pid]
+        handle_server_message(data_packet)
+
+def handle_server_message(data_packet):
+    global latest_game_state, my_player_id, keyframe_needed
+    msg_type = data_packet.get('type')
+    # Pekerjaan avatar dijalankan setelah lock dilepas, agar snapshot tidak mengantre di belakangnya.
+    avatar_jobs = []
+
+    with lock:
+        if msg_type in ('game_update', 'game_delta') and last_snapshot_seq is not None and data_packet['seq'] <= last_snapshot_seq:
+            # Snapshot UDP yang terlambat atau terduplikasi dibuang.
+            return
+
+        if msg_type == 'your_id':
+            my_player_id = data_packet['id']
+            print(f"Anda adalah Pemain {my_player_id}.")
+
+        elif msg_type == 'udp_offer':
+            network.start_udp(data_packet['token'], data_packet['port'], handle_server_message)
+
+        elif msg_type == 'avatar_request':
+            if own_avatar and own_avatar[0] in data_packet.get('hashes', ()):
+                network.send({'type': 'avatar_blob', 'hash': own_avatar[0], 'data': own_avatar[1]})
+
+        elif msg_type == 'avatar_blob':
+            avatar_pool.submit(store_avatar_blob, data_packet['hash'], data_packet['data'])
+
+        elif msg_type == 'all_players_data':
+            for pid, pdata in data_packet.get('data', {}).items():
+                avatar_jobs.append((process_and_store_avatar, pid, pdata))
+                if 'players' not in latest_game_state:
+                    latest_game_state['players'] = {}
+                if pid not in latest_game_state['players']:
+                     latest_game_state['players'][pid] = {}
+                latest_game_state['players'][pid]['username'] = pdata.get('username', '...')
+
+        elif msg_type == 'game_update':
+            store_snapshot(data_packet.get('seq'), data_packet['state'], data_packet.get('input_ack', 0))
+            perf_stats.snapshot(data_packet.get('overrun'))
+
+        elif msg_type == 'game_delta':
+            base = snapshot_history.get(data_packet['base'])
+            if base is None:
+                keyframe_needed = True
+            else:
+                store_snapshot(data_packet['seq'], apply_delta(base, data_packet), data_packet.get('input_ack', 0))
+                perf_stats.snapshot(data_packet.get('overrun'))
+
+        elif msg_type == 'new_player':
+            pid = data_packet['id']
+            pdata = data_packet['data']
+            print(f"Pemain baru bergabung: {pdata.get('username', '')} ({pid})")
+            avatar_jobs.append((process_and_store_avatar, pid, pdata))
+            if pid not in latest_game_state.get('players', {}):
+                latest_game_state['players'][pid] = {'username': pdata.get('username')}
+
+        elif msg_type == 'player_left':
+            pid = data_packet['id']
+            if pid in latest_game_state.get('players', {}):
+                print(f"Pemain {latest_game_state['players'][pid].get('username', '')} keluar.")
+                del latest_game_state['players'][pid]
+            avatar_jobs.append((forget_avatar, pid))
+
+    for job, *args in avatar_jobs:
+        job(*args)
 
 def draw_text(text, font, color, center_pos):
-    render = font.render(text, True, color)
+    render = text_cache.render(font, text, color)
     rect = render.get_rect(center=center_pos)
-    screen.blit(render, rect)
+    return screen.blit(render, rect)
 
 class InputBox:
     def __init__(self, x, y, w, h, text=''):
         self.rect = pygame.Rect(x, y, w, h)
         self.color = GRAY
         self.text = text
-        self.txt_surface = FONT_REGULAR.render(text, True, self.color)
+        self.txt_surface = text_cache.render(FONT_REGULAR, text, self.color)
         self.active = False
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -175,7 +337,7 @@ class InputBox:
             elif event.key == pygame.K_BACKSPACE: self.text = self.text[:-1]
             else: self.text += event.unicode
     def draw(self, screen):
-        self.txt_surface = FONT_REGULAR.render(self.text, True, BLACK)
+        self.txt_surface = text_cache.render(FONT_REGULAR, self.text, BLACK)
         pygame.draw.rect(screen, WHITE, self.rect)
         screen.blit(self.txt_surface, (self.rect.x + 10, self.rect.y + 10))
         pygame.draw.rect(screen, BLACK, self.rect, 2)
@@ -208,6 +370,12 @@ def main_menu():
 
 def avatar_creation(username, server_ip):
     global running
+    # OpenCV berat untuk diimpor, jadi baru dimuat saat layar kamera benar-benar dibuka.
+    try:
+        import cv2
+    except ImportError:
+        print("OpenCV tidak tersedia, menggunakan avatar default.")
+        return game_loop(username, assets['avatar_placeholder'], server_ip)
     cap = cv2.VideoCapture(0)
     if not cap.isOpened():
         print("Tidak dapat membuka kamera, menggunakan avatar default.")
@@ -254,9 +422,22 @@ def avatar_creation(username, server_ip):
     return "quit", None
 
 def game_loop(username, avatar_surface, server_ip):
-    global running, network, my_player_id, latest_game_state
-
-    player_avatars.clear()
+    global running, network, my_player_id, latest_game_state, last_snapshot_seq, predictor, own_avatar, perf_stats
+    global show_perf_overlay
+
+    with avatar_lock:
+        player_avatars.clear()
+        awaited_avatars.clear()
+        avatar_versions.clear()
+    snapshot_history.clear()
+    snapshot_buffer.clear()
+    last_snapshot_seq = None
+    predictor = Predictor()
+    csv_path = None
+    if perf_csv_dir is not None:
+        csv_path = os.path.join(perf_csv_dir, f"perf-{time.strftime('%Y%m%d-%H%M%S')}.csv")
+    perf_stats = PerfStats(csv_path)
+    perf_overlay['surface'] = None
 
     network = Network(server_ip, SERVER_PORT)
     if not network.is_connected():
@@ -272,24 +453,51 @@ def game_loop(username, avatar_surface, server_ip):
         network.disconnect()
         return "menu"
 
+    # Avatar diperkecil ke ukuran tampilnya sebelum diunggah, lalu dirujuk lewat hash isinya.
+    avatar_size = (PLAYER_RADIUS * 2, PLAYER_RADIUS * 2)
+    try:
+        avatar_surface = pygame.transform.smoothscale(avatar_surface, avatar_size)
+    except ValueError:
+        avatar_surface = pygame.transform.scale(avatar_surface, avatar_size)
     my_avatar = create_circular_avatar(avatar_surface, PLAYER_RADIUS * 2)
     player_avatars[my_player_id] = my_avatar
 
     img_byte_arr = io.BytesIO()
     pygame.image.save(avatar_surface, img_byte_arr, 'PNG')
     img_byte_arr_val = img_byte_arr.getvalue()
+    own_avatar = (avatar_hash(img_byte_arr_val), img_byte_arr_val)
+    avatar_disk_cache.put(*own_avatar)
 
-    network.send({'username': username, 'avatar_data': img_byte_arr_val})
+    network.send({'type': 'join', 'username': username, 'avatar_hash': own_avatar[0]})
 
     stun_frame = 0
+    dirty = DirtyRegions(screen, assets['background'])
+    pending_use_item = False
+    last_sent_move = None
+    last_input_time = 0
+    last_ping_time = 0
+    last_frame_time = time.monotonic()
     while running:
+        now = time.monotonic()
+        frame_time, last_frame_time = now - last_frame_time, now
+        if perf_stats.frame(now, frame_time, network):
+            perf_overlay['surface'] = None
+        if show_perf_overlay and perf_overlay['surface'] is None:
+            perf_overlay['surface'] = build_perf_overlay(perf_stats.lines())
+        # RTT hanya diukur bila ada yang melihatnya, agar sesi biasa tidak menambah lalu lintas.
+        if (show_perf_overlay or perf_stats.csv_writer is not None) and now - last_ping_time >= PING_INTERVAL:
+            network.ping()
+            last_ping_time = now
         with lock:
             current_state = latest_game_state.copy()
+            if current_state.get('game_started') and not current_state.get('winner'):
+                current_state['players'] = predicted_players(current_state.get('players', {}))
 
         use_item_event = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT: running = False; break
             if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE: use_item_event = True
+            if event.type == pygame.KEYDOWN and event.key == PERF_OVERLAY_KEY: show_perf_overlay = not show_perf_overlay
 
         if current_state and current_state.get('game_started', False):
             keys = pygame.key.get_pressed()
@@ -302,11 +510,34 @@ def game_loop(username, avatar_surface, server_ip):
             mag = (move_x**2 + move_y**2)**0.5
             if mag > 0: move_x /= mag; move_y /= mag
 
-            network.send({'move_x': move_x, 'move_y': move_y, 'use_item': use_item_event})
+            # Prediksi berjalan per tick server, tetapi input hanya dikirim saat arah gerak
+            # berubah, item dipakai, atau heartbeat jatuh tempo (membawa ack dan seq terbaru).
+            pending_use_item = pending_use_item or use_item_event
+            messages = []
+            with lock:
+                for _ in range(predictor.due_steps(frame_time)):
+                    seq = predictor.step(move_x, move_y, pending_use_item)
+                    if (pending_use_item or keyframe_needed or (move_x, move_y) != last_sent_move
+                            or now - last_input_time >= INPUT_HEARTBEAT_INTERVAL):
+                        messages.append({'type': 'input', 'move_x': move_x, 'move_y': move_y, 'use_item': pending_use_item,
+                                         'ack': last_snapshot_seq, 'keyframe': keyframe_needed, 'seq': seq})
+                        last_sent_move, last_input_time = (move_x, move_y), now
+                    pending_use_item = False
+            for message in messages:
+                # Pemakaian item harus sampai, jadi tetap lewat TCP; gerak dan heartbeat boleh hilang.
+                if message['use_item']:
+                    network.send(message)
+                else:
+                    network.send_unreliable(message)
         else:
-             network.send({})
+             pending_use_item = False
+             if keyframe_needed or now - last_input_time >= INPUT_HEARTBEAT_INTERVAL:
+                 network.send_unreliable({'type': 'input', 'ack': last_snapshot_seq, 'keyframe': keyframe_needed})
+                 last_input_time = now
 
-        screen.blit(assets['background'], (0,0))
+        # Saat permainan berjalan hanya area yang berubah yang digambar ulang; layar lain tetap penuh.
+        playing = bool(current_state.get('game_started') and not current_state.get('winner'))
+        dirty.begin(DIRTY_RECT_RENDERING and playing)
 
         if not current_state:
             draw_text("Menghubungkan & menunggu data...", FONT_BOLD, WHITE, (SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
@@ -326,49 +557,91 @@ def game_loop(username, avatar_surface, server_ip):
                 if avatar: screen.blit(avatar, (200, y_pos - PLAYER_RADIUS))
                 draw_text(pdata.get('username', '...'), FONT_REGULAR, WHITE, (350, y_pos))
         else:
-            for item in current_state.get('items',[]):
-                icon = assets.get(item['type'])
-                if icon: screen.blit(icon, (item['pos'][0] - ITEM_RADIUS, item['pos'][1] - ITEM_RADIUS))
-            for pid, pdata in current_state.get('players', {}).items():
-                pos = (int(pdata['pos'][0]), int(pdata['pos'][1]))
-                p_avatar = player_avatars.get(pid)
-
-                if pdata['speed'] > PLAYER_SPEED:
-                    aura_rect = assets['speed_aura'].get_rect(center=pos)
-                    screen.blit(assets['speed_aura'], aura_rect.topleft)
-
-                if p_avatar:
-                    avatar_rect = p_avatar.get_rect(center=pos)
-                    screen.blit(p_avatar, avatar_rect.topleft)
-
-                draw_text(pdata.get('username', ''), FONT_REGULAR, WHITE, (pos[0], pos[1] + PLAYER_RADIUS + 10))
-
-                if pdata.get('is_it', False):
-                    pygame.draw.circle(screen, RED, pos, PLAYER_RADIUS + 5, 3)
-                if pdata.get('stunned', False):
-                    stun_w, stun_h = assets['stun_stars'].get_size()
-                    frame_width = stun_w / 3
-                    stun_asset_rect = pygame.Rect(int(stun_frame) * frame_width, 0, frame_width, stun_h)
-
-                    blit_pos_x = pos[0] - frame_width / 2
-                    blit_pos_y = pos[1] - PLAYER_RADIUS - stun_h/2 - 5
-                    screen.blit(assets['stun_stars'], (blit_pos_x, blit_pos_y), stun_asset_rect)
-
+            draw_arena(current_state, stun_frame, dirty)
             stun_frame = (stun_frame + 0.2) % 3
-            draw_hud(current_state)
+            for rect in draw_hud(current_state):
+                dirty.add(rect)
 
-        pygame.display.flip()
+        if show_perf_overlay and perf_overlay['surface'] is not None:
+            overlay = perf_overlay['surface']
+            dirty.add(screen.blit(overlay, (SCREEN_WIDTH - overlay.get_width() - 10,
+                                            SCREEN_HEIGHT - overlay.get_height() - 10)))
+
+        dirty.finish()
         clock.tick(FPS)
 
     if network:
         network.disconnect()
+    perf_stats.close()
     return "menu"
 
+def draw_arena(state, stun_frame, dirty):
+    for item in state.get('items',[]):
+        icon = assets.get(item['type'])
+        if icon: dirty.add(screen.blit(icon, (item['pos'][0] - ITEM_RADIUS, item['pos'][1] - ITEM_RADIUS)))
+    for pid, pdata in state.get('players', {}).items():
+        pos = (int(pdata['pos'][0]), int(pdata['pos'][1]))
+        p_avatar = player_avatars.get(pid)
+
+        if pdata['speed'] > PLAYER_SPEED:
+            aura_rect = assets['speed_aura'].get_rect(center=pos)
+            dirty.add(screen.blit(assets['speed_aura'], aura_rect.topleft))
+
+        if p_avatar:
+            avatar_rect = p_avatar.get_rect(center=pos)
+            dirty.add(screen.blit(p_avatar, avatar_rect.topleft))
+
+        dirty.add(draw_text(pdata.get('username', ''), FONT_REGULAR, WHITE, (pos[0], pos[1] + PLAYER_RADIUS + 10)))
+
+        if pdata.get('is_it', False):
+            dirty.add(pygame.draw.circle(screen, RED, pos, PLAYER_RADIUS + 5, 3))
+        if pdata.get('stunned', False):
+            stun_w, stun_h = assets['stun_stars'].get_size()
+            frame_width = stun_w / 3
+            stun_asset_rect = pygame.Rect(int(stun_frame) * frame_width, 0, frame_width, stun_h)
+
+            blit_pos_x = pos[0] - frame_width / 2
+            blit_pos_y = pos[1] - PLAYER_RADIUS - stun_h/2 - 5
+            dirty.add(screen.blit(assets['stun_stars'], (blit_pos_x, blit_pos_y), stun_asset_rect))
+
+def build_scoreboard(time_text, scores):
+    scoreboard_height = 70 + len(scores) * 25
+    scoreboard_surf = pygame.Surface((200, scoreboard_height), pygame.SRCALPHA)
+    scoreboard_surf.fill(TRANSPARENT_GRAY)
+
+    time_render = text_cache.render(FONT_REGULAR, time_text, WHITE)
+    scoreboard_surf.blit(time_render, (scoreboard_surf.get_width()//2 - time_render.get_width()//2, 5))
+
+    title = text_cache.render(FONT_REGULAR, "Papan Skor", YELLOW)
+    scoreboard_surf.blit(title, (scoreboard_surf.get_width()//2 - title.get_width()//2, 35))
+
+    for i, (username, score) in enumerate(scores):
+        p_render = FONT_REGULAR.render(f"{i+1}. {username}: {score}", True, WHITE)
+        scoreboard_surf.blit(p_render, (10, 65 + i * 25))
+    return scoreboard_surf
+
+def build_perf_overlay(lines):
+    # Dibangun ulang sekali per jendela statistik, bukan tiap frame. Angkanya selalu berubah,
+    # jadi tidak lewat text_cache agar tidak mengusir teks yang sering dipakai.
+    renders = [FONT_SMALL.render(line, True, WHITE) for line in lines]
+    width = max(render.get_width() for render in renders) + 16
+    height = sum(render.get_height() for render in renders) + 12
+    overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+    overlay.fill(TRANSPARENT_GRAY)
+    y = 6
+    for render in renders:
+        overlay.blit(render, (8, y))
+        y += render.get_height()
+    return overlay
+
 def draw_hud(state):
+    # Mengembalikan area layar yang digambar, untuk mode dirty rectangle.
     my_player_data = state.get('players', {}).get(my_player_id)
+    rects = []
 
     if my_player_data:
         inventory_rect = pygame.Rect(10, SCREEN_HEIGHT - 60, 50, 50)
+        rects.append(inventory_rect)
         pygame.draw.rect(screen, TRANSPARENT_GRAY, inventory_rect, border_radius=5)
         if my_player_data.get('inventory'):
             icon = assets.get(my_player_data['inventory'])
@@ -377,29 +650,35 @@ def draw_hud(state):
                 screen.blit(icon, icon_rect.topleft)
         pygame.draw.rect(screen, WHITE, inventory_rect, 2, border_radius=5)
 
-    players_sorted = sorted(state.get('players', {}).values(), key=lambda p: p['score'], reverse=True)
-    scoreboard_height = 70 + len(players_sorted) * 25
-    scoreboard_surf = pygame.Surface((200, scoreboard_height), pygame.SRCALPHA)
-    scoreboard_surf.fill(TRANSPARENT_GRAY)
-
+    if state.get('scoreboard'):
+        # Snapshot area minat hanya memuat pemain di sekitar; papan skor dikirim terpisah.
+        scores = tuple((username, score) for _, score, username in state['scoreboard'])
+    else:
+        players_sorted = sorted(state.get('players', {}).values(), key=lambda p: p['score'], reverse=True)
+        scores = tuple((pdata.get('username', ''), pdata.get('score', 0)) for pdata in players_sorted)
     game_time = state.get('game_time', 0)
     minutes = int(game_time // 60)
     seconds = int(game_time % 60)
     time_text = f"Sisa Waktu: {minutes:02}:{seconds:02}"
-    time_render = FONT_REGULAR.render(time_text, True, WHITE)
-    scoreboard_surf.blit(time_render, (scoreboard_surf.get_width()//2 - time_render.get_width()//2, 5))
-
-    title = FONT_REGULAR.render("Papan Skor", True, YELLOW)
-    scoreboard_surf.blit(title, (scoreboard_surf.get_width()//2 - title.get_width()//2, 35))
-
-    for i, pdata in enumerate(players_sorted):
-        p_text = f"{i+1}. {pdata.get('username', '')}: {pdata.get('score', 0)}"
-        p_render = FONT_REGULAR.render(p_text, True, WHITE)
-        scoreboard_surf.blit(p_render, (10, 65 + i * 25))
 
-    screen.blit(scoreboard_surf, (SCREEN_WIDTH - 210, 10))
+    # Papan skor hanya dibangun ulang bila detik yang tampil, nama, atau skor berubah.
+    key = (time_text, scores)
+    if scoreboard_cache['key'] != key:
+        scoreboard_cache['key'] = key
+        scoreboard_cache['surface'] = build_scoreboard(time_text, scores)
+    rects.append(screen.blit(scoreboard_cache['surface'], (SCREEN_WIDTH - 210, 10)))
+    return rects
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Klien Tag Arena.")
+    parser.add_argument('--perf-overlay', action='store_true',
+                        help="Tampilkan overlay performa sejak awal (F3 untuk menyalakan/mematikan).")
+    parser.add_argument('--perf-csv', metavar='DIR',
+                        help="Tulis statistik performa tiap detik ke file CSV per sesi di folder ini.")
+    args = parser.parse_args()
+    show_perf_overlay = args.perf_overlay
+    perf_csv_dir = args.perf_csv
+    init_display()
     load_assets()
     scene_result = "menu"
     server_ip_from_menu = "127.0.0.1"
@@ -0,0 +1,22 @@
+# Konstanta permainan yang dipakai bersama server, klien, bot, dan prediksi.
+PORT = 5555
+SPECTATOR_FEED_PORT = 5556
+RELAY_PORT = 5557
+MAX_PLAYERS = 3
+SERVER_TICK_RATE = 30
+GAME_DURATION = 180
+ARENA_WIDTH = 800
+ARENA_HEIGHT = 600
+PLAYER_RADIUS = 25
+ITEM_RADIUS = 15
+PLAYER_SPEED = 4
+TAG_IMMUNITY_DURATION = 3
+
+ITEM_TYPES = ['speed_boost', 'banana_trap']
+MAX_ITEMS = 5
+ITEM_SPAWN_INTERVAL = 5
+ITEM_EFFECT_DURATION = {'speed_boost': 5, 'stun': 2}
+BANANA_ARM_TIME = 0.5
+SPEED_BOOST_MULTIPLIER = 1.8
+TAG_SCORE = 5
+GAME_OVER_DURATION = 10
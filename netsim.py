@@ -0,0 +1,56 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+class DelayQueue:
+    def __init__(self):
+        self.queue = []
+        self.order = itertools.count()
+        self.cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def schedule(self, delay, func, *args):
+        with self.cond:
+            heapq.heappush(self.queue, (time.monotonic() + delay, next(self.order), func, args))
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue or self.queue[0][0] > time.monotonic():
+                    self.cond.wait(self.queue[0][0] - time.monotonic() if self.queue else None)
+                _, _, func, args = heapq.heappop(self.queue)
+            try:
+                func(*args)
+            except OSError:
+                pass
+
+
+class LossShim:
+    # Pengganti sendto untuk uji lokal: membuang sebagian datagram dan menunda sisanya
+    # (latensi + jitter, sehingga urutan kedatangan bisa tertukar).
+    def __init__(self, sendto, loss=0.0, latency=0.0, jitter=0.0, schedule=None, seed=None):
+        self.raw_sendto = sendto
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.schedule = schedule
+        if self.schedule is None and (latency > 0 or jitter > 0):
+            self.schedule = DelayQueue().schedule
+        self.sent = 0
+        self.dropped = 0
+
+    def sendto(self, data, addr):
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        self.sent += 1
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            self.schedule(delay, self.raw_sendto, bytes(data), addr)
+        else:
+            self.raw_sendto(data, addr)
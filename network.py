@@ -1,12 +1,42 @@
 import socket
-import pickle
+import threading
+import time
+from netsim import LossShim
+from protocol import (DEFAULT_CODEC_PREFERENCE, DEFAULT_COMPRESS_LEVEL, FramedSocket, ProtocolError, client_handshake,
+                      pack_udp_hello, unpack_udp_hello)
+
+UDP_PROBE_INTERVAL = 0.2
+UDP_PROBE_TIMEOUT = 2
+UDP_SILENCE_TIMEOUT = 1
+UDP_MAX_DATAGRAM = 65535
 
 class Network:
-    def __init__(self, server_ip, server_port):
+    def __init__(self, server_ip, server_port, codecs=DEFAULT_CODEC_PREFERENCE, udp_shim=None,
+                 compress_level=DEFAULT_COMPRESS_LEVEL):
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server = server_ip
         self.port = server_port
         self.addr = (self.server, self.port)
+        self.codec_preference = codecs
+        self.codec = None
+        self.compress_level = compress_level
+        self.framed = None
+        self.last_message_size = 0
+        # Penghitung kumulatif pesan dan byte payload per arah (TCP dan UDP), untuk statistik klien.
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.received_messages = 0
+        self.received_bytes = 0
+        self.rtt = None
+        self.send_lock = threading.Lock()
+        # Penghitung terima ditambah dari thread TCP dan thread UDP.
+        self.receive_lock = threading.Lock()
+        self.udp = None
+        self.udp_addr = None
+        self.udp_sendto = None
+        self.udp_shim = udp_shim
+        self.udp_active = False
+        self.udp_confirmed = False
         self._connected = self.connect()
 
     def is_connected(self):
@@ -15,47 +45,147 @@ class Network:
     def connect(self):
         try:
             self.client.connect(self.addr)
+            self.codec, self.compress_level = client_handshake(self.client, self.codec_preference, self.compress_level)
+            self.framed = FramedSocket(self.client)
             return True
         except socket.error as e:
             print(f"Gagal terhubung ke server: {e}")
             return False
+        except ProtocolError as e:
+            print(f"Negosiasi protokol gagal: {e}")
+            return False
 
     def send(self, data):
         try:
-            payload = pickle.dumps(data)
-            message = f"{len(payload):<10}".encode() + payload
-            self.client.sendall(message)
+            payload = self.codec.encode(data)
+            with self.send_lock:
+                self.framed.send_frame(payload, self.compress_level)
+                self.sent_messages += 1
+                self.sent_bytes += len(payload)
         except socket.error as e:
             print(f"Gagal mengirim data: {e}")
             pass
 
     def receive(self):
         try:
-            header_size = 10
-            header_data = b''
-            while len(header_data) < header_size:
-                chunk = self.client.recv(header_size - len(header_data))
-                if not chunk: return None
-                header_data += chunk
-            
-            msglen = int(header_data.decode().strip())
-
-            full_msg = b''
-            while len(full_msg) < msglen:
-                chunk = self.client.recv(min(msglen - len(full_msg), 4096))
-                if not chunk: return None
-                full_msg += chunk
-            
-            return pickle.loads(full_msg)
-
-        except (EOFError, ConnectionResetError, pickle.UnpicklingError, OSError) as e:
+            while True:
+                payload = self.framed.read_frame()
+                if payload is None: return None
+                self.last_message_size = len(payload)
+                with self.receive_lock:
+                    self.received_messages += 1
+                    self.received_bytes += len(payload)
+                message = self.codec.decode(payload)
+                # Pong dijawab server begitu ping tiba; cukup dicatat di sini, tidak diteruskan ke pemanggil.
+                if message.get('type') != 'pong':
+                    return message
+                self.rtt = time.monotonic() - message['time']
+
+        except ProtocolError as e:
+            print(f"Koneksi terputus atau data korup: {e}")
+            return None
+        except (EOFError, ConnectionResetError, OSError) as e:
             print(f"Koneksi terputus atau data korup: {e}") 
             return None
         except ValueError:
             print("Menerima header yang tidak valid dari server.") 
             return None
 
+    def counters(self):
+        # (pesan masuk, byte masuk, pesan keluar, byte keluar); pasangan tiap arah dibaca bersama
+        # di bawah lock-nya. send_lock tidak diambil agar pembaca tidak menunggu kirim TCP yang lambat.
+        with self.receive_lock:
+            received = (self.received_messages, self.received_bytes)
+        return received + (self.sent_messages, self.sent_bytes)
+
+    def send_unreliable(self, data):
+        # Input gerak lewat UDP bila kanal aktif; kalau tidak, lewat TCP seperti biasa.
+        if not self.udp_active:
+            return self.send(data)
+        try:
+            payload = self.codec.encode(data)
+            self.udp_sendto(payload, self.udp_addr)
+            with self.send_lock:
+                self.sent_messages += 1
+                self.sent_bytes += len(payload)
+        except (OSError, ProtocolError):
+            pass
+
+    def ping(self):
+        # Server menggemakan cap waktu ini; selisihnya saat pong tiba adalah RTT lewat TCP.
+        self.send({'type': 'ping', 'time': time.monotonic()})
+
+    def start_udp(self, token, port, on_message):
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_addr = (socket.gethostbyname(self.server), port)
+        self.udp_sendto = self.udp.sendto
+        if self.udp_shim is not None:
+            self.udp_sendto = LossShim(self.udp.sendto, *self.udp_shim).sendto
+        threading.Thread(target=self._udp_loop, args=(token, on_message), daemon=True).start()
+
+    def _udp_loop(self, token, on_message):
+        hello = pack_udp_hello(token)
+        self.udp.settimeout(UDP_PROBE_INTERVAL)
+        deadline = time.monotonic() + UDP_PROBE_TIMEOUT
+        confirmed = False
+        while not confirmed and time.monotonic() < deadline:
+            try:
+                self.udp_sendto(hello, self.udp_addr)
+                data, _ = self.udp.recvfrom(UDP_MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            confirmed = unpack_udp_hello(data) == token
+        if not confirmed:
+            print("UDP tidak tersedia, memakai TCP saja.")
+            self._close_udp()
+            return
+
+        self.udp_active = self.udp_confirmed = True
+        self.send({'type': 'udp_mode', 'enabled': True})
+        self.udp.settimeout(UDP_SILENCE_TIMEOUT)
+        while self.udp_active:
+            try:
+                data, addr = self.udp.recvfrom(UDP_MAX_DATAGRAM)
+            except socket.timeout:
+                print("Kanal UDP senyap, kembali ke TCP.")
+                self.disable_udp()
+                break
+            except OSError:
+                break
+            if addr[0] != self.udp_addr[0] or unpack_udp_hello(data) is not None:
+                continue
+            try:
+                message = self.codec.decode(data)
+            except ProtocolError:
+                continue
+            self.last_message_size = len(data)
+            with self.receive_lock:
+                self.received_messages += 1
+                self.received_bytes += len(data)
+            on_message(message)
+
+    def disable_udp(self):
+        if self.udp_active:
+            self.udp_active = False
+            self.send({'type': 'udp_mode', 'enabled': False})
+        self._close_udp()
+
+    def _close_udp(self):
+        if self.udp is not None:
+            try:
+                self.udp.close()
+            except socket.error:
+                pass
+
     def disconnect(self):
+        self.udp_active = False
+        self._close_udp()
+        try:
+            self.client.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
         try:
             self.client.close()
         except socket.error:
@@ -0,0 +1,125 @@
+import numpy as np
+
+INVENTORY_NAMES = [None, 'speed_boost', 'banana_trap']
+INVENTORY_CODES = {name: code for code, name in enumerate(INVENTORY_NAMES)}
+
+
+class PlayerArrays:
+    def __init__(self):
+        self.load({}, {})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, players, player_inputs):
+        self.ids = list(players)
+        self.index = {pid: i for i, pid in enumerate(self.ids)}
+        count = len(self.ids)
+        values = list(players.values())
+        self.pos = np.array([p['pos'] for p in values], dtype=np.float64).reshape(count, 2)
+        self.speed = np.array([p['speed'] for p in values], dtype=np.float64)
+        self.effect_timer = np.array([p['effect_timer'] for p in values], dtype=np.float64)
+        self.immunity_timer = np.array([p['immunity_timer'] for p in values], dtype=np.float64)
+        self.score = np.array([p['score'] for p in values], dtype=np.int64)
+        self.stunned = np.array([p['stunned'] for p in values], dtype=bool)
+        self.is_it = np.array([p.get('is_it', False) for p in values], dtype=bool)
+        self.inventory = np.array([INVENTORY_CODES[p['inventory']] for p in values], dtype=np.int8)
+        self.move = np.zeros((count, 2), dtype=np.float64)
+        self.use_item = np.zeros(count, dtype=bool)
+        for pid, inputs in player_inputs.items():
+            self.set_input(pid, inputs)
+
+    def store(self, players):
+        pos = self.pos.tolist()
+        speed = self.speed.tolist()
+        effect_timer = self.effect_timer.tolist()
+        immunity_timer = self.immunity_timer.tolist()
+        score = self.score.tolist()
+        stunned = self.stunned.tolist()
+        is_it = self.is_it.tolist()
+        inventory = self.inventory.tolist()
+        for i, pid in enumerate(self.ids):
+            player = players[pid]
+            player['pos'] = pos[i]
+            player['speed'] = speed[i]
+            player['effect_timer'] = effect_timer[i]
+            player['immunity_timer'] = immunity_timer[i]
+            player['score'] = score[i]
+            player['stunned'] = stunned[i]
+            player['is_it'] = is_it[i]
+            player['inventory'] = INVENTORY_NAMES[inventory[i]]
+
+    def set_input(self, pid, inputs):
+        i = self.index.get(pid)
+        if i is None:
+            return
+        self.move[i, 0] = inputs.get('move_x', 0)
+        self.move[i, 1] = inputs.get('move_y', 0)
+
+    def set_item_requests(self, pids):
+        self.use_item[:] = False
+        for pid in pids:
+            i = self.index.get(pid)
+            if i is not None:
+                self.use_item[i] = True
+
+    def step(self, tick_delta, base_speed, radius, width, height):
+        active = self.effect_timer > 0
+        self.effect_timer[active] -= tick_delta
+        idle = ~active
+        self.speed[idle] = base_speed
+        self.stunned[idle] = False
+
+        immune = self.immunity_timer > 0
+        self.immunity_timer[immune] -= tick_delta
+
+        movable = ~self.stunned
+        moved = self.pos[movable] + self.move[movable] * self.speed[movable, None]
+        np.clip(moved[:, 0], radius, width - radius, out=moved[:, 0])
+        np.clip(moved[:, 1], radius, height - radius, out=moved[:, 1])
+        self.pos[movable] = moved
+        return np.flatnonzero(movable & self.use_item & (self.inventory != 0)).tolist()
+
+    def it_index(self):
+        indices = np.flatnonzero(self.is_it)
+        return int(indices[-1]) if len(indices) else None
+
+    def distance_sq(self, x, y):
+        dx = self.pos[:, 0] - x
+        dy = self.pos[:, 1] - y
+        return dx * dx + dy * dy
+
+    def within(self, pos, radius):
+        return np.flatnonzero(self.distance_sq(pos[0], pos[1]) < radius * radius).tolist()
+
+    def tag_target(self, it_index, reach):
+        x, y = self.pos[it_index]
+        mask = (self.distance_sq(x, y) < reach * reach) & (self.immunity_timer <= 0)
+        mask[it_index] = False
+        hits = np.flatnonzero(mask)
+        return int(hits[0]) if len(hits) else None
+
+    def item_hits(self, item_positions, reach):
+        # Pemain diurutkan menurut x; tiap item hanya memeriksa pita [x - reach, x + reach]
+        # lalu jarak kuadrat. Hasilnya per item, urut indeks pemain.
+        hits = [[] for _ in item_positions]
+        if not item_positions or not self.ids:
+            return hits
+        items = np.asarray(item_positions, dtype=np.float64)
+        order = np.argsort(self.pos[:, 0], kind='stable')
+        xs = self.pos[order, 0]
+        lo = np.searchsorted(xs, items[:, 0] - reach, 'left')
+        hi = np.searchsorted(xs, items[:, 0] + reach, 'right')
+        counts = hi - lo
+        item_index = np.repeat(np.arange(len(items)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = order[np.repeat(lo, counts) + offsets]
+
+        dx = self.pos[candidates, 0] - items[item_index, 0]
+        dy = self.pos[candidates, 1] - items[item_index, 1]
+        inside = dx * dx + dy * dy < reach * reach
+        item_index, candidates = item_index[inside], candidates[inside]
+        ranked = np.lexsort((candidates, item_index))
+        for row, col in zip(item_index[ranked].tolist(), candidates[ranked].tolist()):
+            hits[row].append(col)
+        return hits
@@ -0,0 +1,111 @@
+import csv
+import os
+import threading
+import time
+
+PERF_WINDOW = 1.0
+CSV_FIELDS = ('time', 'fps', 'frame_ms', 'frame_ms_max', 'rtt_ms', 'snapshot_age_ms', 'snapshot_age_ms_max',
+              'snapshots_per_s', 'in_msgs_per_s', 'in_bytes_per_s', 'out_msgs_per_s', 'out_bytes_per_s',
+              'server_overruns')
+
+
+class PerfStats:
+    # Statistik performa klien per jendela (bawaan 1 detik): waktu frame, RTT ping/pong, umur
+    # snapshot, lalu lintas tiap arah, dan tick server yang overrun. Nilai jendela terakhir dipakai
+    # overlay dan, bila ada path CSV, ditulis satu baris per jendela agar sesi bisa dibandingkan.
+    def __init__(self, csv_path=None, window=PERF_WINDOW):
+        self.window = window
+        # snapshot() dipanggil thread TCP dan UDP, sedangkan frame() membaca dan mereset
+        # penghitungnya dari thread render.
+        self.lock = threading.Lock()
+        self.start = time.monotonic()
+        self.window_start = self.start
+        self.frame_times = []
+        self.snapshot_ages = []
+        self.snapshots = 0
+        self.overruns = 0
+        self.last_snapshot_time = None
+        self.last_counters = None
+        self.current = None
+        self.csv_file = None
+        self.csv_writer = None
+        if csv_path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+            self.csv_file = open(csv_path, 'w', newline='')
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(CSV_FIELDS)
+
+    def snapshot(self, overrun):
+        # Dipanggil thread penerima untuk setiap snapshot yang diterapkan.
+        now = time.monotonic()
+        with self.lock:
+            self.last_snapshot_time = now
+            self.snapshots += 1
+            if overrun:
+                self.overruns += 1
+
+    def frame(self, now, frame_time, network):
+        # Dipanggil sekali per frame; mengembalikan True bila jendela baru saja ditutup.
+        self.frame_times.append(frame_time)
+        with self.lock:
+            last_snapshot_time = self.last_snapshot_time
+        if last_snapshot_time is not None:
+            self.snapshot_ages.append(now - last_snapshot_time)
+        counters = network.counters()
+        if self.last_counters is None:
+            self.last_counters = counters
+        elapsed = now - self.window_start
+        if elapsed < self.window:
+            return False
+
+        with self.lock:
+            snapshots, overruns = self.snapshots, self.overruns
+            self.snapshots = 0
+            self.overruns = 0
+        rates = [(new - old) / elapsed for new, old in zip(counters, self.last_counters)]
+        frames = self.frame_times
+        ages = self.snapshot_ages
+        self.current = {
+            'time': round(now - self.start, 2),
+            'fps': round(len(frames) / elapsed, 1),
+            'frame_ms': round(sum(frames) / len(frames) * 1000, 2),
+            'frame_ms_max': round(max(frames) * 1000, 2),
+            'rtt_ms': round(network.rtt * 1000, 1) if network.rtt is not None else '',
+            'snapshot_age_ms': round(sum(ages) / len(ages) * 1000, 1) if ages else '',
+            'snapshot_age_ms_max': round(max(ages) * 1000, 1) if ages else '',
+            'snapshots_per_s': round(snapshots / elapsed, 1),
+            'in_msgs_per_s': round(rates[0], 1),
+            'in_bytes_per_s': round(rates[1]),
+            'out_msgs_per_s': round(rates[2], 1),
+            'out_bytes_per_s': round(rates[3]),
+            'server_overruns': overruns,
+        }
+        if self.csv_writer is not None:
+            self.csv_writer.writerow([self.current[field] for field in CSV_FIELDS])
+            self.csv_file.flush()
+        self.window_start = now
+        self.frame_times = []
+        self.snapshot_ages = []
+        self.last_counters = counters
+        return True
+
+    def lines(self):
+        current = self.current
+        if current is None:
+            return ["Mengukur..."]
+        rtt = f"{current['rtt_ms']}ms" if current['rtt_ms'] != '' else "-"
+        age = "-"
+        if current['snapshot_age_ms'] != '':
+            age = f"{current['snapshot_age_ms']}ms (maks {current['snapshot_age_ms_max']}ms)"
+        return [
+            f"FPS {current['fps']}  frame {current['frame_ms']}ms (maks {current['frame_ms_max']}ms)",
+            f"RTT {rtt}  umur snapshot {age}",
+            f"Masuk {current['in_msgs_per_s']} pesan/s {current['in_bytes_per_s'] / 1024:.1f} KB/s",
+            f"Keluar {current['out_msgs_per_s']} pesan/s {current['out_bytes_per_s'] / 1024:.1f} KB/s",
+            f"Snapshot {current['snapshots_per_s']}/s  overrun server {current['server_overruns']}",
+        ]
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
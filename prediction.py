@@ -0,0 +1,93 @@
+import bisect
+import collections
+from config import SERVER_TICK_RATE
+from rules import advance_player, apply_speed_boost
+
+MAX_PENDING_INPUTS = SERVER_TICK_RATE * 2
+MAX_CATCHUP_STEPS = 5
+INTERPOLATION_DELAY = 0.1
+INTERPOLATION_HISTORY = 1.0
+
+
+class Predictor:
+    def __init__(self, tick_rate=SERVER_TICK_RATE):
+        self.step_time = 1 / tick_rate
+        self.accumulator = 0.0
+        self.seq = 0
+        self.pending = collections.deque(maxlen=MAX_PENDING_INPUTS)
+        self.player = None
+
+    def due_steps(self, frame_time):
+        self.accumulator += frame_time
+        steps = int(self.accumulator // self.step_time)
+        self.accumulator -= steps * self.step_time
+        return min(steps, MAX_CATCHUP_STEPS)
+
+    def step(self, move_x, move_y, use_item):
+        # Satu tick lokal dengan aturan yang sama seperti server; hasilnya disimpan
+        # sampai server mengakui seq-nya.
+        self.seq += 1
+        inputs = (self.seq, move_x, move_y, use_item)
+        self.pending.append(inputs)
+        if self.player is not None:
+            self._apply(self.player, inputs)
+        return self.seq
+
+    def reconcile(self, authoritative, acked):
+        # acked: seq langkah terakhir yang benar-benar disimulasikan server untuk klien ini.
+        if authoritative is None:
+            self.player = None
+            return
+        while self.pending and self.pending[0][0] <= acked:
+            self.pending.popleft()
+        player = {**authoritative, 'pos': list(authoritative['pos'])}
+        for inputs in self.pending:
+            self._apply(player, inputs)
+        self.player = player
+
+    def _apply(self, player, inputs):
+        _, move_x, move_y, use_item = inputs
+        if not advance_player(player, move_x, move_y, self.step_time):
+            return
+        if use_item and player.get('inventory'):
+            if player['inventory'] == 'speed_boost':
+                apply_speed_boost(player)
+            player['inventory'] = None
+
+
+class SnapshotBuffer:
+    def __init__(self):
+        self.times = []
+        self.positions = []
+
+    def add(self, received_at, players):
+        self.times.append(received_at)
+        self.positions.append({pid: pdata['pos'] for pid, pdata in players.items()})
+        while self.times and received_at - self.times[0] > INTERPOLATION_HISTORY:
+            del self.times[0]
+            del self.positions[0]
+
+    def clear(self):
+        self.times.clear()
+        self.positions.clear()
+
+    def sample(self, render_time):
+        # Posisi pemain lain diinterpolasi di antara dua snapshot yang mengapit render_time.
+        if not self.times:
+            return {}
+        index = bisect.bisect_right(self.times, render_time)
+        if index == 0:
+            return self.positions[0]
+        if index == len(self.times):
+            return self.positions[-1]
+        start, end = self.times[index - 1], self.times[index]
+        alpha = (render_time - start) / (end - start) if end > start else 1.0
+        before, after = self.positions[index - 1], self.positions[index]
+        blended = {}
+        for pid, pos in after.items():
+            old = before.get(pid)
+            if old is None:
+                blended[pid] = pos
+            else:
+                blended[pid] = [old[0] + (pos[0] - old[0]) * alpha, old[1] + (pos[1] - old[1]) * alpha]
+        return blended
@@ -0,0 +1,879 @@
+import asyncio
+import collections
+import functools
+import pickle
+import socket
+import struct
+import time
+import zlib
+
+PROTOCOL_VERSION = 9
+HANDSHAKE_MAGIC = b'TAGA'
+UDP_HELLO_MAGIC = b'TAGU'
+HANDSHAKE_TIMEOUT = 5
+HEADER_SIZE = 4
+MAX_FRAME_SIZE = 4 * 1024 * 1024
+READ_BUFFER_SIZE = 64 * 1024
+# Dua bit teratas prefix panjang frame adalah flag; panjang frame tetap jauh di bawah 1 GiB.
+FRAME_COMPRESSED = 1 << 31
+FRAME_BATCH = 1 << 30
+FRAME_LENGTH_MASK = FRAME_BATCH - 1
+COMPRESS_THRESHOLD = 512
+DEFAULT_COMPRESS_LEVEL = 1
+MAX_COMPRESS_LEVEL = 9
+CODEC_REJECTED = 0xFF
+
+# Posisi dikirim sebagai u16 fixed-point (1/4 piksel), timer dalam 1/100 detik.
+POS_SCALE = 4
+TIMER_SCALE = 100
+SPEED_SCALE = 100
+GAME_TIME_SCALE = 10
+MOVE_SCALE = 32767
+
+MSG_YOUR_ID = 1
+MSG_ALL_PLAYERS_DATA = 2
+MSG_NEW_PLAYER = 3
+MSG_PLAYER_LEFT = 4
+MSG_GAME_UPDATE = 5
+MSG_ERROR = 6
+MSG_JOIN = 7
+MSG_INPUT = 8
+MSG_GAME_DELTA = 9
+MSG_UDP_OFFER = 10
+MSG_UDP_MODE = 11
+MSG_AVATAR_REQUEST = 12
+MSG_AVATAR_BLOB = 13
+MSG_SPECTATE = 14
+MSG_ROOM_UPDATE = 15
+MSG_ROOM_DELTA = 16
+MSG_ROOM_CLOSED = 17
+MSG_PING = 18
+MSG_PONG = 19
+NO_ROOM = 0xFFFFFFFF
+AVATAR_HASH_SIZE = 32
+
+ITEM_TYPE_IDS = {'speed_boost': 1, 'banana_trap': 2, 'banana_peel': 3}
+ITEM_TYPE_NAMES = {v: k for k, v in ITEM_TYPE_IDS.items()}
+
+_frame_head = struct.Struct('<I')
+_head = struct.Struct('<BB')
+_u16 = struct.Struct('<H')
+_u32 = struct.Struct('<I')
+_f64 = struct.Struct('<d')
+_state_head = struct.Struct('<BHHHH')
+_player = struct.Struct('<HHHBBHHHH')
+_item = struct.Struct('<IBHH')
+_input = struct.Struct('<hhBII')
+_delta_head = struct.Struct('<IIBHHHH')
+_handshake_head = struct.Struct('<4sBB')
+_handshake_reply = struct.Struct('<4sBBB')
+_udp_offer = struct.Struct('<IH')
+_udp_hello = struct.Struct('<4sI')
+_score_entry = struct.Struct('<HH')
+
+PLAYER_IS_IT = 1
+PLAYER_STUNNED = 2
+STATE_STARTED = 1
+STATE_HAS_WINNER = 2
+STATE_HAS_SCOREBOARD = 4
+INPUT_USE_ITEM = 1
+INPUT_KEYFRAME = 2
+SERVER_OVERRUN = 1
+
+# Urutan bit field pada record pemain di pesan delta.
+DELTA_PLAYER_FIELDS = ('pos', 'is_it', 'stunned', 'inventory', 'speed',
+                       'effect_timer', 'immunity_timer', 'score', 'username')
+DELTA_GLOBAL_FIELDS = ('game_started', 'game_time', 'winner', 'game_over_timer', 'scoreboard')
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def _clamp(value, low, high):
+    return max(low, min(int(round(value)), high))
+
+
+class PickleCodec:
+    codec_id = 0
+    name = 'pickle'
+
+    def encode(self, data):
+        return pickle.dumps(data)
+
+    def with_input_ack(self, payload, ack):
+        # Pickle tidak bisa ditambal di tempat; codec lama ini membayar enkode ulang per penerima.
+        return pickle.dumps({**pickle.loads(payload), 'input_ack': ack})
+
+    def decode(self, payload):
+        try:
+            return pickle.loads(payload)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError) as e:
+            raise ProtocolError(f"Pesan pickle korup: {e}") from e
+
+
+class BinaryCodec:
+    codec_id = 1
+    name = 'binary'
+
+    def with_input_ack(self, payload, ack):
+        # Ack input ada di offset tetap setelah kepala game_update/game_delta, sehingga payload
+        # bersama cukup disalin dengan ack milik penerimanya.
+        return payload[:_head.size] + _u32.pack(ack) + payload[_head.size + _u32.size:]
+
+    def encode(self, data):
+        msg_type = data.get('type')
+        out = bytearray()
+        if msg_type == 'your_id':
+            out += _head.pack(PROTOCOL_VERSION, MSG_YOUR_ID)
+            out += _u16.pack(data['id'])
+        elif msg_type == 'all_players_data':
+            out += _head.pack(PROTOCOL_VERSION, MSG_ALL_PLAYERS_DATA)
+            out += _u16.pack(len(data['data']))
+            for pid, pinfo in data['data'].items():
+                out += _u16.pack(pid)
+                self._pack_player_info(out, pinfo)
+        elif msg_type == 'new_player':
+            out += _head.pack(PROTOCOL_VERSION, MSG_NEW_PLAYER)
+            out += _u16.pack(data['id'])
+            self._pack_player_info(out, data['data'])
+        elif msg_type == 'player_left':
+            out += _head.pack(PROTOCOL_VERSION, MSG_PLAYER_LEFT)
+            out += _u16.pack(data['id'])
+        elif msg_type == 'game_update':
+            out += _head.pack(PROTOCOL_VERSION, MSG_GAME_UPDATE)
+            out += _u32.pack(data.get('input_ack', 0))
+            out += _u32.pack(data.get('seq', 0))
+            out.append(SERVER_OVERRUN if data.get('overrun') else 0)
+            self._pack_state(out, data['state'])
+        elif msg_type == 'game_delta':
+            out += _head.pack(PROTOCOL_VERSION, MSG_GAME_DELTA)
+            out += _u32.pack(data.get('input_ack', 0))
+            out.append(SERVER_OVERRUN if data.get('overrun') else 0)
+            self._pack_delta(out, data)
+        elif msg_type == 'udp_offer':
+            out += _head.pack(PROTOCOL_VERSION, MSG_UDP_OFFER)
+            out += _udp_offer.pack(data['token'], data['port'])
+        elif msg_type == 'udp_mode':
+            out += _head.pack(PROTOCOL_VERSION, MSG_UDP_MODE)
+            out.append(1 if data.get('enabled') else 0)
+        elif msg_type == 'avatar_request':
+            out += _head.pack(PROTOCOL_VERSION, MSG_AVATAR_REQUEST)
+            out += _u16.pack(len(data['hashes']))
+            for blob_hash in data['hashes']:
+                self._pack_hash(out, blob_hash)
+        elif msg_type == 'avatar_blob':
+            out += _head.pack(PROTOCOL_VERSION, MSG_AVATAR_BLOB)
+            self._pack_hash(out, data['hash'])
+            out += _u32.pack(len(data['data']))
+            out += data['data']
+        elif msg_type == 'spectate':
+            out += _head.pack(PROTOCOL_VERSION, MSG_SPECTATE)
+            out += _u32.pack(NO_ROOM if data.get('room') is None else data['room'])
+        elif msg_type == 'room_update':
+            out += _head.pack(PROTOCOL_VERSION, MSG_ROOM_UPDATE)
+            out += _u32.pack(data['room'])
+            out += _u32.pack(data.get('seq', 0))
+            self._pack_state(out, data['state'])
+        elif msg_type == 'room_delta':
+            out += _head.pack(PROTOCOL_VERSION, MSG_ROOM_DELTA)
+            out += _u32.pack(data['room'])
+            self._pack_delta(out, data)
+        elif msg_type == 'room_closed':
+            out += _head.pack(PROTOCOL_VERSION, MSG_ROOM_CLOSED)
+            out += _u32.pack(data['room'])
+        elif msg_type == 'error':
+            out += _head.pack(PROTOCOL_VERSION, MSG_ERROR)
+            self._pack_str(out, data.get('message', ''))
+        elif msg_type == 'join':
+            out += _head.pack(PROTOCOL_VERSION, MSG_JOIN)
+            self._pack_player_info(out, data)
+            out += _u16.pack(_clamp(data.get('interest_radius') or 0, 0, 0xFFFF))
+        elif msg_type == 'input':
+            out += _head.pack(PROTOCOL_VERSION, MSG_INPUT)
+            flags = INPUT_USE_ITEM if data.get('use_item') else 0
+            if data.get('keyframe'):
+                flags |= INPUT_KEYFRAME
+            out += _input.pack(
+                _clamp(data.get('move_x', 0) * MOVE_SCALE, -MOVE_SCALE, MOVE_SCALE),
+                _clamp(data.get('move_y', 0) * MOVE_SCALE, -MOVE_SCALE, MOVE_SCALE),
+                flags, data.get('ack') or 0, data.get('seq') or 0)
+        elif msg_type == 'ping':
+            out += _head.pack(PROTOCOL_VERSION, MSG_PING)
+            out += _f64.pack(data['time'])
+        elif msg_type == 'pong':
+            out += _head.pack(PROTOCOL_VERSION, MSG_PONG)
+            out += _f64.pack(data['time'])
+        else:
+            raise ProtocolError(f"Tipe pesan tidak dikenal: {msg_type!r}")
+        return bytes(out)
+
+    def decode(self, payload):
+        view = memoryview(payload)
+        try:
+            version, msg_id = _head.unpack_from(view, 0)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Versi protokol tidak cocok: {version}")
+            offset = _head.size
+            if msg_id == MSG_YOUR_ID:
+                return {'type': 'your_id', 'id': _u16.unpack_from(view, offset)[0]}
+            if msg_id == MSG_ALL_PLAYERS_DATA:
+                count = _u16.unpack_from(view, offset)[0]
+                offset += _u16.size
+                players = {}
+                for _ in range(count):
+                    pid = _u16.unpack_from(view, offset)[0]
+                    players[pid], offset = self._unpack_player_info(view, offset + _u16.size)
+                return {'type': 'all_players_data', 'data': players}
+            if msg_id == MSG_NEW_PLAYER:
+                pid = _u16.unpack_from(view, offset)[0]
+                pinfo, offset = self._unpack_player_info(view, offset + _u16.size)
+                return {'type': 'new_player', 'id': pid, 'data': pinfo}
+            if msg_id == MSG_PLAYER_LEFT:
+                return {'type': 'player_left', 'id': _u16.unpack_from(view, offset)[0]}
+            if msg_id == MSG_GAME_UPDATE:
+                input_ack, seq = _u32.unpack_from(view, offset)[0], _u32.unpack_from(view, offset + _u32.size)[0]
+                offset += 2 * _u32.size
+                server_flags = view[offset]
+                state, offset = self._unpack_state(view, offset + 1)
+                return {'type': 'game_update', 'seq': seq, 'state': state, 'input_ack': input_ack,
+                        'overrun': bool(server_flags & SERVER_OVERRUN)}
+            if msg_id == MSG_GAME_DELTA:
+                input_ack = _u32.unpack_from(view, offset)[0]
+                offset += _u32.size
+                return {**self._unpack_delta(view, offset + 1), 'input_ack': input_ack,
+                        'overrun': bool(view[offset] & SERVER_OVERRUN)}
+            if msg_id == MSG_UDP_OFFER:
+                token, port = _udp_offer.unpack_from(view, offset)
+                return {'type': 'udp_offer', 'token': token, 'port': port}
+            if msg_id == MSG_UDP_MODE:
+                return {'type': 'udp_mode', 'enabled': bool(view[offset])}
+            if msg_id == MSG_AVATAR_REQUEST:
+                count = _u16.unpack_from(view, offset)[0]
+                offset += _u16.size
+                hashes = []
+                for _ in range(count):
+                    blob_hash, offset = self._unpack_hash(view, offset)
+                    hashes.append(blob_hash)
+                return {'type': 'avatar_request', 'hashes': hashes}
+            if msg_id == MSG_AVATAR_BLOB:
+                blob_hash, offset = self._unpack_hash(view, offset)
+                length = _u32.unpack_from(view, offset)[0]
+                offset += _u32.size
+                data = bytes(view[offset:offset + length])
+                if len(data) != length:
+                    raise ProtocolError("Data avatar terpotong.")
+                return {'type': 'avatar_blob', 'hash': blob_hash, 'data': data}
+            if msg_id == MSG_SPECTATE:
+                room = _u32.unpack_from(view, offset)[0]
+                return {'type': 'spectate', 'room': None if room == NO_ROOM else room}
+            if msg_id == MSG_ROOM_UPDATE:
+                room, seq = _u32.unpack_from(view, offset)[0], _u32.unpack_from(view, offset + _u32.size)[0]
+                state, offset = self._unpack_state(view, offset + 2 * _u32.size)
+                return {'type': 'room_update', 'room': room, 'seq': seq, 'state': state}
+            if msg_id == MSG_ROOM_DELTA:
+                room = _u32.unpack_from(view, offset)[0]
+                return {**self._unpack_delta(view, offset + _u32.size), 'type': 'room_delta', 'room': room}
+            if msg_id == MSG_ROOM_CLOSED:
+                return {'type': 'room_closed', 'room': _u32.unpack_from(view, offset)[0]}
+            if msg_id == MSG_ERROR:
+                message, offset = self._unpack_str(view, offset)
+                return {'type': 'error', 'message': message}
+            if msg_id == MSG_JOIN:
+                pinfo, offset = self._unpack_player_info(view, offset)
+                return {'type': 'join', **pinfo, 'interest_radius': _u16.unpack_from(view, offset)[0] or None}
+            if msg_id == MSG_INPUT:
+                move_x, move_y, flags, ack, seq = _input.unpack_from(view, offset)
+                return {'type': 'input', 'move_x': move_x / MOVE_SCALE, 'move_y': move_y / MOVE_SCALE,
+                        'use_item': bool(flags & INPUT_USE_ITEM), 'keyframe': bool(flags & INPUT_KEYFRAME),
+                        'ack': ack or None, 'seq': seq}
+            if msg_id == MSG_PING:
+                return {'type': 'ping', 'time': _f64.unpack_from(view, offset)[0]}
+            if msg_id == MSG_PONG:
+                return {'type': 'pong', 'time': _f64.unpack_from(view, offset)[0]}
+        except (struct.error, UnicodeDecodeError, KeyError, IndexError) as e:
+            raise ProtocolError(f"Pesan biner korup: {e}") from e
+        raise ProtocolError(f"ID pesan tidak dikenal: {msg_id}")
+
+    def _pack_str(self, out, text):
+        raw = (text or '').encode('utf-8')[:255]
+        out.append(len(raw))
+        out += raw
+
+    def _unpack_str(self, view, offset):
+        length = view[offset]
+        offset += 1
+        return bytes(view[offset:offset + length]).decode('utf-8', 'ignore'), offset + length
+
+    def _pack_hash(self, out, blob_hash):
+        try:
+            raw = bytes.fromhex(blob_hash)
+        except (TypeError, ValueError) as e:
+            raise ProtocolError(f"Hash avatar tidak valid: {e}") from e
+        if len(raw) != AVATAR_HASH_SIZE:
+            raise ProtocolError("Hash avatar tidak valid.")
+        out += raw
+
+    def _unpack_hash(self, view, offset):
+        raw = bytes(view[offset:offset + AVATAR_HASH_SIZE])
+        if len(raw) != AVATAR_HASH_SIZE:
+            raise ProtocolError("Hash avatar terpotong.")
+        return raw.hex(), offset + AVATAR_HASH_SIZE
+
+    def _pack_player_info(self, out, pinfo):
+        # Avatar dirujuk lewat hash isinya; datanya diambil terpisah lewat avatar_request.
+        self._pack_str(out, pinfo.get('username', ''))
+        if pinfo.get('avatar_hash'):
+            out.append(1)
+            self._pack_hash(out, pinfo['avatar_hash'])
+        else:
+            out.append(0)
+
+    def _unpack_player_info(self, view, offset):
+        username, offset = self._unpack_str(view, offset)
+        has_avatar = view[offset]
+        offset += 1
+        avatar_hash = None
+        if has_avatar:
+            avatar_hash, offset = self._unpack_hash(view, offset)
+        return {'username': username, 'avatar_hash': avatar_hash}, offset
+
+    def _pack_state(self, out, state):
+        players = state.get('players', {})
+        items = state.get('items', [])
+        flags = STATE_STARTED if state.get('game_started') else 0
+        if state.get('winner'):
+            flags |= STATE_HAS_WINNER
+        if state.get('scoreboard'):
+            flags |= STATE_HAS_SCOREBOARD
+        out += _state_head.pack(
+            flags,
+            _clamp(state.get('game_time', 0) * GAME_TIME_SCALE, 0, 0xFFFF),
+            _clamp(state.get('game_over_timer', 0) * GAME_TIME_SCALE, 0, 0xFFFF),
+            len(players), len(items))
+        if flags & STATE_HAS_WINNER:
+            self._pack_str(out, state['winner'])
+
+        fields = []
+        for pid, player in players.items():
+            pos = player['pos']
+            effect_timer = player.get('effect_timer', 0)
+            immunity_timer = player.get('immunity_timer', 0)
+            fields += (
+                pid, int(pos[0] * POS_SCALE + 0.5), int(pos[1] * POS_SCALE + 0.5),
+                (PLAYER_IS_IT if player.get('is_it') else 0) | (PLAYER_STUNNED if player.get('stunned') else 0),
+                ITEM_TYPE_IDS.get(player.get('inventory'), 0),
+                int(player.get('speed', 0) * SPEED_SCALE + 0.5),
+                int(effect_timer * TIMER_SCALE + 0.5) if effect_timer > 0 else 0,
+                int(immunity_timer * TIMER_SCALE + 0.5) if immunity_timer > 0 else 0,
+                player.get('score', 0))
+        self._pack_block(out, _player, fields, len(players))
+        for player in players.values():
+            self._pack_str(out, player.get('username', ''))
+
+        fields = []
+        for item in items:
+            pos = item['pos']
+            fields += (item['id'], ITEM_TYPE_IDS[item['type']],
+                       int(pos[0] * POS_SCALE + 0.5), int(pos[1] * POS_SCALE + 0.5))
+        self._pack_block(out, _item, fields, len(items))
+        if flags & STATE_HAS_SCOREBOARD:
+            self._pack_scoreboard(out, state['scoreboard'])
+
+    def _pack_scoreboard(self, out, scoreboard):
+        # Papan skor ringkas (id, skor, nama) untuk snapshot yang dipotong area minat.
+        entries = (scoreboard or ())[:0xFF]
+        out.append(len(entries))
+        for pid, score, username in entries:
+            out += _score_entry.pack(pid, _clamp(score, 0, 0xFFFF))
+            self._pack_str(out, username)
+
+    def _unpack_scoreboard(self, view, offset):
+        count = view[offset]
+        offset += 1
+        entries = []
+        for _ in range(count):
+            pid, score = _score_entry.unpack_from(view, offset)
+            username, offset = self._unpack_str(view, offset + _score_entry.size)
+            entries.append((pid, score, username))
+        return entries or None, offset
+
+    def _pack_block(self, out, record, fields, count):
+        # Semua record dengan panjang tetap dipack dalam satu panggilan; nilai di luar
+        # jangkauan (arena sangat besar, skor ekstrem) baru di-clamp bila pack gagal.
+        block = _block_struct(record.format, count)
+        try:
+            out += block.pack(*fields)
+        except struct.error:
+            limits = _FIELD_LIMITS[record.format]
+            width = len(limits)
+            out += block.pack(*(_clamp(value, *limits[i % width]) for i, value in enumerate(fields)))
+
+    def _unpack_state(self, view, offset):
+        flags, game_time, game_over_timer, n_players, n_items = _state_head.unpack_from(view, offset)
+        offset += _state_head.size
+        winner = None
+        if flags & STATE_HAS_WINNER:
+            winner, offset = self._unpack_str(view, offset)
+
+        block = _block_struct(_player.format, n_players)
+        fields = block.unpack_from(view, offset)
+        offset += block.size
+        players = {}
+        for i in range(0, len(fields), 9):
+            pid, x, y, pflags, inventory, speed, effect_timer, immunity_timer, score = fields[i:i + 9]
+            username, offset = self._unpack_str(view, offset)
+            players[pid] = {
+                'pos': [x / POS_SCALE, y / POS_SCALE], 'username': username,
+                'is_it': bool(pflags & PLAYER_IS_IT), 'inventory': ITEM_TYPE_NAMES.get(inventory),
+                'speed': speed / SPEED_SCALE, 'effect_timer': effect_timer / TIMER_SCALE,
+                'stunned': bool(pflags & PLAYER_STUNNED), 'score': score,
+                'immunity_timer': immunity_timer / TIMER_SCALE
+            }
+
+        block = _block_struct(_item.format, n_items)
+        fields = block.unpack_from(view, offset)
+        offset += block.size
+        items = [{'type': ITEM_TYPE_NAMES[fields[i + 1]], 'pos': [fields[i + 2] / POS_SCALE, fields[i + 3] / POS_SCALE],
+                  'id': fields[i]} for i in range(0, len(fields), 4)]
+        scoreboard = None
+        if flags & STATE_HAS_SCOREBOARD:
+            scoreboard, offset = self._unpack_scoreboard(view, offset)
+
+        state = {
+            'players': players,
+            'items': items,
+            'game_started': bool(flags & STATE_STARTED),
+            'game_time': game_time / GAME_TIME_SCALE,
+            'winner': winner,
+            'game_over_timer': game_over_timer / GAME_TIME_SCALE,
+            'scoreboard': scoreboard
+        }
+        return state, offset
+
+
+    def _pack_delta(self, out, delta):
+        changed_globals = delta['globals']
+        global_mask = 0
+        for bit, key in enumerate(DELTA_GLOBAL_FIELDS):
+            if key in changed_globals:
+                global_mask |= 1 << bit
+        out += _delta_head.pack(
+            delta['seq'], delta['base'], global_mask, len(delta['players']), len(delta['removed_players']),
+            len(delta['items_added']), len(delta['items_removed']))
+        if 'game_started' in changed_globals:
+            out.append(1 if changed_globals['game_started'] else 0)
+        if 'game_time' in changed_globals:
+            out += _u16.pack(_clamp(changed_globals['game_time'] * GAME_TIME_SCALE, 0, 0xFFFF))
+        if 'winner' in changed_globals:
+            self._pack_str(out, changed_globals['winner'])
+        if 'game_over_timer' in changed_globals:
+            out += _u16.pack(_clamp(changed_globals['game_over_timer'] * GAME_TIME_SCALE, 0, 0xFFFF))
+        if 'scoreboard' in changed_globals:
+            self._pack_scoreboard(out, changed_globals['scoreboard'])
+
+        for pid, changed in delta['players'].items():
+            mask = 0
+            for bit, key in enumerate(DELTA_PLAYER_FIELDS):
+                if key in changed:
+                    mask |= 1 << bit
+            out += _u16.pack(pid)
+            out += _u16.pack(mask)
+            if 'pos' in changed:
+                out += _u16.pack(_clamp(changed['pos'][0] * POS_SCALE, 0, 0xFFFF))
+                out += _u16.pack(_clamp(changed['pos'][1] * POS_SCALE, 0, 0xFFFF))
+            if 'is_it' in changed:
+                out.append(1 if changed['is_it'] else 0)
+            if 'stunned' in changed:
+                out.append(1 if changed['stunned'] else 0)
+            if 'inventory' in changed:
+                out.append(ITEM_TYPE_IDS.get(changed['inventory'], 0))
+            if 'speed' in changed:
+                out += _u16.pack(_clamp(changed['speed'] * SPEED_SCALE, 0, 0xFFFF))
+            if 'effect_timer' in changed:
+                out += _u16.pack(_clamp(changed['effect_timer'] * TIMER_SCALE, 0, 0xFFFF))
+            if 'immunity_timer' in changed:
+                out += _u16.pack(_clamp(changed['immunity_timer'] * TIMER_SCALE, 0, 0xFFFF))
+            if 'score' in changed:
+                out += _u16.pack(_clamp(changed['score'], 0, 0xFFFF))
+            if 'username' in changed:
+                self._pack_str(out, changed['username'])
+
+        for pid in delta['removed_players']:
+            out += _u16.pack(pid)
+        fields = []
+        for item in delta['items_added']:
+            pos = item['pos']
+            fields += (item['id'], ITEM_TYPE_IDS[item['type']],
+                       int(pos[0] * POS_SCALE + 0.5), int(pos[1] * POS_SCALE + 0.5))
+        self._pack_block(out, _item, fields, len(delta['items_added']))
+        for item_id in delta['items_removed']:
+            out += _u32.pack(item_id)
+
+    def _unpack_delta(self, view, offset):
+        seq, base, global_mask, n_players, n_removed, n_added, n_items_removed = _delta_head.unpack_from(view, offset)
+        offset += _delta_head.size
+        changed_globals = {}
+        if global_mask & 1:
+            changed_globals['game_started'] = bool(view[offset])
+            offset += 1
+        if global_mask & 2:
+            changed_globals['game_time'] = _u16.unpack_from(view, offset)[0] / GAME_TIME_SCALE
+            offset += _u16.size
+        if global_mask & 4:
+            winner, offset = self._unpack_str(view, offset)
+            changed_globals['winner'] = winner or None
+        if global_mask & 8:
+            changed_globals['game_over_timer'] = _u16.unpack_from(view, offset)[0] / GAME_TIME_SCALE
+            offset += _u16.size
+        if global_mask & 16:
+            changed_globals['scoreboard'], offset = self._unpack_scoreboard(view, offset)
+
+        players = {}
+        for _ in range(n_players):
+            pid, mask = _u16.unpack_from(view, offset)[0], _u16.unpack_from(view, offset + 2)[0]
+            offset += 4
+            changed = {}
+            if mask & 1:
+                changed['pos'] = [_u16.unpack_from(view, offset)[0] / POS_SCALE,
+                                  _u16.unpack_from(view, offset + 2)[0] / POS_SCALE]
+                offset += 4
+            if mask & 2:
+                changed['is_it'] = bool(view[offset])
+                offset += 1
+            if mask & 4:
+                changed['stunned'] = bool(view[offset])
+                offset += 1
+            if mask & 8:
+                changed['inventory'] = ITEM_TYPE_NAMES.get(view[offset])
+                offset += 1
+            if mask & 16:
+                changed['speed'] = _u16.unpack_from(view, offset)[0] / SPEED_SCALE
+                offset += 2
+            if mask & 32:
+                changed['effect_timer'] = _u16.unpack_from(view, offset)[0] / TIMER_SCALE
+                offset += 2
+            if mask & 64:
+                changed['immunity_timer'] = _u16.unpack_from(view, offset)[0] / TIMER_SCALE
+                offset += 2
+            if mask & 128:
+                changed['score'] = _u16.unpack_from(view, offset)[0]
+                offset += 2
+            if mask & 256:
+                changed['username'], offset = self._unpack_str(view, offset)
+            players[pid] = changed
+
+        removed_players = list(_block_struct('H', n_removed).unpack_from(view, offset))
+        offset += 2 * n_removed
+        block = _block_struct(_item.format, n_added)
+        fields = block.unpack_from(view, offset)
+        offset += block.size
+        items_added = [{'type': ITEM_TYPE_NAMES[fields[i + 1]], 'pos': [fields[i + 2] / POS_SCALE, fields[i + 3] / POS_SCALE],
+                        'id': fields[i]} for i in range(0, len(fields), 4)]
+        items_removed = list(_block_struct('I', n_items_removed).unpack_from(view, offset))
+        return {'type': 'game_delta', 'seq': seq, 'base': base, 'globals': changed_globals,
+                'players': players, 'removed_players': removed_players,
+                'items_added': items_added, 'items_removed': items_removed}
+
+
+_FIELD_LIMITS = {
+    _player.format: [(0, 0xFFFF)] * 3 + [(0, 0xFF)] * 2 + [(0, 0xFFFF)] * 4,
+    _item.format: [(0, 0xFFFFFFFF), (0, 0xFF), (0, 0xFFFF), (0, 0xFFFF)],
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _block_struct(record_format, count):
+    return struct.Struct('<' + record_format.lstrip('<') * count)
+
+
+CODECS = {codec.codec_id: codec for codec in (PickleCodec(), BinaryCodec())}
+CODECS_BY_NAME = {codec.name: codec for codec in CODECS.values()}
+DEFAULT_CODEC_PREFERENCE = ('binary', 'pickle')
+
+
+def pack_udp_hello(token):
+    return _udp_hello.pack(UDP_HELLO_MAGIC, token)
+
+
+def unpack_udp_hello(data):
+    # Datagram salam UDP tidak melewati codec; datagram lain dikembalikan None.
+    if len(data) != _udp_hello.size:
+        return None
+    magic, token = _udp_hello.unpack(data)
+    return token if magic == UDP_HELLO_MAGIC else None
+
+
+def pack_frame(payload, flags=0):
+    # Setiap pesan TCP diawali panjang payload sebagai u32 little-endian (plus flag di bit teratas).
+    return _frame_head.pack(len(payload) | flags) + payload
+
+
+def unpack_frame_head(header, max_frame_size=MAX_FRAME_SIZE, offset=0):
+    value = _frame_head.unpack_from(header, offset)[0]
+    length = value & FRAME_LENGTH_MASK
+    if length > max_frame_size:
+        raise ProtocolError(f"Frame {length} byte melebihi batas {max_frame_size} byte.")
+    return length, value & ~FRAME_LENGTH_MASK
+
+
+def build_frame(payloads, level=0, threshold=COMPRESS_THRESHOLD):
+    # Beberapa pesan digabung menjadi satu frame batch berisi sub-frame biasa; badan frame yang
+    # cukup besar dikompres zlib, tetapi hanya dipakai bila memang lebih kecil.
+    if len(payloads) == 1:
+        body, flags = payloads[0], 0
+    else:
+        body, flags = bytearray(), FRAME_BATCH
+        for payload in payloads:
+            body += _frame_head.pack(len(payload))
+            body += payload
+    if level and len(body) >= threshold:
+        packed = zlib.compress(body, level)
+        if len(packed) < len(body):
+            body = packed
+            flags |= FRAME_COMPRESSED
+    return pack_frame(body, flags)
+
+
+def unpack_frame_body(body, flags, max_frame_size=MAX_FRAME_SIZE):
+    # Kebalikan build_frame: mengembalikan daftar payload pesan di dalam satu frame.
+    if flags & FRAME_COMPRESSED:
+        inflater = zlib.decompressobj()
+        try:
+            body = inflater.decompress(body, max_frame_size)
+        except zlib.error as e:
+            raise ProtocolError(f"Frame terkompresi korup: {e}") from e
+        if inflater.unconsumed_tail:
+            raise ProtocolError(f"Frame terkompresi melebihi batas {max_frame_size} byte.")
+        if not inflater.eof:
+            raise ProtocolError("Frame terkompresi terpotong.")
+    if not flags & FRAME_BATCH:
+        return [body]
+    view = memoryview(body)
+    payloads = []
+    offset = 0
+    while offset < len(view):
+        if offset + HEADER_SIZE > len(view):
+            raise ProtocolError("Sub-frame batch terpotong.")
+        length, inner_flags = unpack_frame_head(view, max_frame_size, offset)
+        start = offset + HEADER_SIZE
+        offset = start + length
+        if inner_flags or offset > len(view):
+            raise ProtocolError("Sub-frame batch tidak valid.")
+        payloads.append(view[start:offset])
+    return payloads
+
+
+class FrameBatcher:
+    # Tahap keluaran satu koneksi: pesan yang terkumpul sejak flush terakhir dikirim sebagai satu
+    # frame, dikompres dengan level hasil negosiasi. Penghitungnya melaporkan byte dan waktu CPU
+    # yang dihemat dibanding mengirim tiap pesan sebagai frame mentah sendiri-sendiri.
+    def __init__(self, level=0, threshold=COMPRESS_THRESHOLD):
+        self.level = level
+        self.threshold = threshold
+        self.payloads = []
+        self.droppable = True
+        self.messages = 0
+        self.frames = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.pack_time = 0.0
+        self.send_time = 0.0
+        self.sends = 0
+
+    def add(self, payload, droppable=False):
+        self.payloads.append(payload)
+        self.droppable = self.droppable and droppable
+
+    def take(self, cache=None):
+        # Mengembalikan (frame, droppable) atau (None, False) bila tidak ada pesan. Frame boleh
+        # dibuang saat klien tertinggal hanya bila semua pesannya boleh dibuang (snapshot).
+        # cache dipakai bersama antar koneksi dalam satu flush: snapshot yang sama cukup dikompres sekali.
+        payloads = self.payloads
+        if not payloads:
+            return None, False
+        droppable = self.droppable
+        self.payloads = []
+        self.droppable = True
+        start = time.thread_time()
+        key = (payloads[0], self.level) if cache is not None and len(payloads) == 1 else None
+        frame = cache.get(key) if key is not None else None
+        if frame is None:
+            frame = build_frame(payloads, self.level, self.threshold)
+            if key is not None:
+                cache[key] = frame
+        self.pack_time += time.thread_time() - start
+        self.messages += len(payloads)
+        self.frames += 1
+        self.raw_bytes += sum(len(payload) for payload in payloads) + HEADER_SIZE * len(payloads)
+        self.sent_bytes += len(frame)
+        return frame, droppable
+
+    def record_send(self, seconds):
+        self.sends += 1
+        self.send_time += seconds
+
+    def summary(self):
+        # Kirim yang dihemat dikali rata-rata waktu CPU satu kirim, dikurangi biaya batch dan kompresi.
+        send_cost = self.send_time / self.sends if self.sends else 0.0
+        saved_time = (self.messages - self.frames) * send_cost - self.pack_time
+        return (f"pesan={self.messages} frame={self.frames} byte={self.raw_bytes}->{self.sent_bytes} "
+                f"hemat_byte={self.raw_bytes - self.sent_bytes} cpu_kemas={self.pack_time * 1000:.1f}ms "
+                f"cpu_kirim={self.send_time * 1000:.1f}ms hemat_cpu={saved_time * 1000:.1f}ms level={self.level}")
+
+
+class FramedSocket:
+    # Pembaca frame bersama untuk server dan klien. Data dibaca dengan recv_into ke satu buffer
+    # yang dipakai ulang (hanya membesar bila ada frame yang lebih besar), dan satu recv bisa
+    # menghasilkan beberapa frame. read_frame() mengembalikan memoryview ke dalam buffer itu,
+    # yang hanya sah sampai read_frame() berikutnya; decode sebelum membaca lagi. Frame batch
+    # dibagikan satu pesan per panggilan.
+    def __init__(self, sock, max_frame_size=MAX_FRAME_SIZE, buffer_size=READ_BUFFER_SIZE):
+        self.sock = sock
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.pending = collections.deque()
+
+    def read_frame(self):
+        if self.pending:
+            return self.pending.popleft()
+        while True:
+            available = self.end - self.start
+            if not available:
+                self.start = self.end = 0
+            needed = HEADER_SIZE
+            if available >= HEADER_SIZE:
+                length, flags = unpack_frame_head(self.buffer, self.max_frame_size, self.start)
+                needed += length
+                if available >= needed:
+                    payload = self.view[self.start + HEADER_SIZE:self.start + needed]
+                    self.start += needed
+                    if not flags:
+                        return payload
+                    self.pending.extend(unpack_frame_body(payload, flags, self.max_frame_size))
+                    if self.pending:
+                        return self.pending.popleft()
+                    continue
+            if self.start + needed > len(self.buffer):
+                self._make_room(needed)
+            received = self.sock.recv_into(self.view[self.end:])
+            if not received:
+                return None
+            self.end += received
+
+    def _make_room(self, needed):
+        available = self.end - self.start
+        if needed <= len(self.buffer) and available <= self.start:
+            # Sisa data digeser ke awal buffer; rentang sumber dan tujuan tidak tumpang tindih.
+            self.view[:available] = self.view[self.start:self.end]
+        else:
+            buffer = bytearray(max(needed, len(self.buffer) * 2))
+            buffer[:available] = self.view[self.start:self.end]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        self.start = 0
+        self.end = available
+
+    def send_frame(self, payload, level=0):
+        self.sock.sendall(build_frame([payload], level))
+
+
+class AsyncFramedReader:
+    # Padanan FramedSocket untuk asyncio.StreamReader.
+    def __init__(self, reader, max_frame_size=MAX_FRAME_SIZE):
+        self.reader = reader
+        self.max_frame_size = max_frame_size
+        self.pending = collections.deque()
+
+    async def read_frame(self):
+        while not self.pending:
+            header = await self.reader.readexactly(HEADER_SIZE)
+            length, flags = unpack_frame_head(header, self.max_frame_size)
+            body = await self.reader.readexactly(length)
+            self.pending.extend(unpack_frame_body(body, flags, self.max_frame_size))
+        return self.pending.popleft()
+
+
+def recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk: return None
+        data += chunk
+    return data
+
+
+def client_handshake(sock, preference=DEFAULT_CODEC_PREFERENCE, compress_level=DEFAULT_COMPRESS_LEVEL):
+    # Klien menawarkan codec dan level kompresi maksimum; server membalas codec dan level yang dipakai.
+    codec_ids = [CODECS_BY_NAME[name].codec_id for name in preference]
+    sock.sendall(_handshake_head.pack(HANDSHAKE_MAGIC, PROTOCOL_VERSION, len(codec_ids)) + bytes(codec_ids)
+                 + bytes([_clamp(compress_level, 0, MAX_COMPRESS_LEVEL)]))
+    reply = recv_exact(sock, _handshake_reply.size)
+    if reply is None:
+        raise ProtocolError("Server menutup koneksi saat negosiasi.")
+    magic, version, codec_id, level = _handshake_reply.unpack(reply)
+    if magic != HANDSHAKE_MAGIC or version != PROTOCOL_VERSION:
+        raise ProtocolError("Balasan negosiasi dari server tidak valid.")
+    if codec_id not in CODECS:
+        raise ProtocolError("Server tidak mendukung codec yang diminta.")
+    return CODECS[codec_id], min(level, MAX_COMPRESS_LEVEL)
+
+
+def _select_codec(version, offered, allowed, offered_level, max_level):
+    allowed_ids = {CODECS_BY_NAME[name].codec_id for name in allowed}
+    chosen = None
+    if version == PROTOCOL_VERSION:
+        chosen = next((CODECS[cid] for cid in offered if cid in allowed_ids and cid in CODECS), None)
+    level = min(offered_level, max_level, MAX_COMPRESS_LEVEL)
+    reply = _handshake_reply.pack(HANDSHAKE_MAGIC, PROTOCOL_VERSION, chosen.codec_id if chosen else CODEC_REJECTED,
+                                  level)
+    return chosen, level, reply
+
+
+def server_handshake(conn, allowed=DEFAULT_CODEC_PREFERENCE, max_level=DEFAULT_COMPRESS_LEVEL):
+    previous_timeout = conn.gettimeout()
+    conn.settimeout(HANDSHAKE_TIMEOUT)
+    try:
+        head = recv_exact(conn, _handshake_head.size)
+        if head is None:
+            raise ProtocolError("Klien menutup koneksi saat negosiasi.")
+        magic, version, count = _handshake_head.unpack(head)
+        if magic != HANDSHAKE_MAGIC:
+            raise ProtocolError("Klien tidak mengirim salam protokol.")
+        # Byte level kompresi hanya ada sejak versi ini; klien versi lain langsung ditolak.
+        offered = recv_exact(conn, count + 1 if version == PROTOCOL_VERSION else count)
+        if offered is None:
+            raise ProtocolError("Klien menutup koneksi saat negosiasi.")
+        offered_level = offered[count] if version == PROTOCOL_VERSION else 0
+        chosen, level, reply = _select_codec(version, offered[:count], allowed, offered_level, max_level)
+        conn.sendall(reply)
+        if chosen is None:
+            raise ProtocolError("Tidak ada codec yang cocok dengan klien.")
+        return chosen, level
+    except socket.timeout as e:
+        raise ProtocolError("Negosiasi protokol kehabisan waktu.") from e
+    finally:
+        conn.settimeout(previous_timeout)
+
+
+async def server_handshake_async(reader, writer, allowed=DEFAULT_CODEC_PREFERENCE, max_level=DEFAULT_COMPRESS_LEVEL):
+    try:
+        head = await asyncio.wait_for(reader.readexactly(_handshake_head.size), HANDSHAKE_TIMEOUT)
+        magic, version, count = _handshake_head.unpack(head)
+        if magic != HANDSHAKE_MAGIC:
+            raise ProtocolError("Klien tidak mengirim salam protokol.")
+        size = count + 1 if version == PROTOCOL_VERSION else count
+        offered = await asyncio.wait_for(reader.readexactly(size), HANDSHAKE_TIMEOUT) if size else b''
+    except asyncio.IncompleteReadError as e:
+        raise ProtocolError("Klien menutup koneksi saat negosiasi.") from e
+    except asyncio.TimeoutError as e:
+        raise ProtocolError("Negosiasi protokol kehabisan waktu.") from e
+    offered_level = offered[count] if version == PROTOCOL_VERSION else 0
+    chosen, level, reply = _select_codec(version, offered[:count], allowed, offered_level, max_level)
+    writer.write(reply)
+    if chosen is None:
+        raise ProtocolError("Tidak ada codec yang cocok dengan klien.")
+    return chosen, level
@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import collections
+import threading
+import time
+from config import RELAY_PORT, SERVER_TICK_RATE, SPECTATOR_FEED_PORT
+from network import Network
+from protocol import (DEFAULT_CODEC_PREFERENCE, DEFAULT_COMPRESS_LEVEL, AsyncFramedReader, ProtocolError, build_frame,
+                      pack_frame, server_handshake_async)
+from scheduler import FixedStepScheduler, TickMetrics
+from snapshot import apply_delta, diff_snapshots
+
+HOST = '0.0.0.0'
+RELAY_RATE = 10
+FEED_RETRY_INTERVAL = 1
+OUTBOUND_BUFFER_LIMIT = 64 * 1024
+SLOW_SPECTATOR_TIMEOUT = 5
+# Penonton hanya mengirim permintaan 'spectate'; frame besar dari mereka tidak wajar.
+MAX_FRAME_BYTES = 4096
+STATS_INTERVAL = 10
+
+
+class FeedClient:
+    # Satu langganan ke feed snapshot server game. Pesan dibaca di thread sendiri, diberi cap
+    # waktu tiba, lalu diolah loop relay. Koneksi yang putus disambung ulang (dengan keyframe baru).
+    def __init__(self, server_ip, port):
+        self.server_ip = server_ip
+        self.port = port
+        self.inbox = collections.deque()
+        self.network = None
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        while True:
+            self.network = Network(self.server_ip, self.port)
+            if self.network.is_connected():
+                print(f"[Relay] Berlangganan feed {self.server_ip}:{self.port}.")
+                self.network.send({'type': 'spectate', 'room': None})
+                while True:
+                    message = self.network.receive()
+                    if message is None:
+                        break
+                    self.inbox.append((time.monotonic(), message))
+                self.network.disconnect()
+                self.inbox.append((time.monotonic(), {'type': 'feed_lost'}))
+                print("[Relay] Feed server terputus, mencoba lagi...")
+            time.sleep(FEED_RETRY_INTERVAL)
+
+    def restart(self):
+        if self.network is not None:
+            self.network.disconnect()
+
+
+class RelayRoom:
+    def __init__(self, room_id):
+        self.room_id = room_id
+        self.seq = None
+        self.snapshot = None
+        # (waktu tiba, snapshot) untuk tunda siaran; yang sudah lewat batas tunda dibuang.
+        self.timeline = collections.deque()
+        self.closed_at = None
+        self.sent_seq = None
+        self.sent_snapshot = None
+        self.spectators = set()
+
+    def apply(self, arrival, message):
+        # Mengembalikan False bila delta tidak cocok dengan snapshot yang dimiliki relay.
+        if message['type'] == 'room_update':
+            self.snapshot = message['state']
+        elif self.snapshot is not None and message['base'] == self.seq:
+            self.snapshot = apply_delta(self.snapshot, message)
+        else:
+            return False
+        self.seq = message['seq']
+        self.timeline.append((arrival, self.snapshot))
+        return True
+
+    def visible(self, cutoff):
+        timeline = self.timeline
+        while len(timeline) > 1 and timeline[1][0] <= cutoff:
+            timeline.popleft()
+        if timeline and timeline[0][0] <= cutoff:
+            return timeline[0][1]
+        return None
+
+
+class Spectator:
+    def __init__(self, writer, codec, level, wanted_room):
+        self.writer = writer
+        self.codec = codec
+        self.level = level
+        self.wanted_room = wanted_room
+        self.room = None
+        self.base_seq = None
+        self.backlog_since = None
+        self.sent_bytes = 0
+
+    def send(self, frame):
+        # Penonton yang tertinggal dilewati tick ini dan nanti mendapat keyframe lagi.
+        transport = self.writer.transport
+        if transport.is_closing():
+            return False
+        if transport.get_write_buffer_size() > OUTBOUND_BUFFER_LIMIT:
+            if self.backlog_since is None:
+                self.backlog_since = time.monotonic()
+            elif time.monotonic() - self.backlog_since > SLOW_SPECTATOR_TIMEOUT:
+                print(f"[Relay] Penonton {self.writer.get_extra_info('peername')} terlalu lambat, koneksi diputus.")
+                transport.abort()
+            return False
+        self.backlog_since = None
+        self.writer.write(frame)
+        self.sent_bytes += len(frame)
+        return True
+
+
+class Relay:
+    # Menyalin semua room dari satu feed dan menyiarkannya ke banyak penonton. Setiap tick relay,
+    # snapshot tiap room dienkode sekali per (jenis, codec, level) lalu frame yang sama ditulis ke
+    # semua penontonnya; delta dihitung dari snapshot yang disiarkan tick relay sebelumnya.
+    def __init__(self, feed, delay=0.0):
+        self.feed = feed
+        self.delay = delay
+        self.rooms = {}
+        self.spectators = set()
+        self.out_seq = 0
+        self.sent_bytes = 0
+
+    def add_spectator(self, spectator):
+        self.spectators.add(spectator)
+        self.assign(spectator)
+
+    def remove_spectator(self, spectator):
+        self.spectators.discard(spectator)
+        self.sent_bytes += spectator.sent_bytes
+        if spectator.room is not None:
+            spectator.room.spectators.discard(spectator)
+
+    def assign(self, spectator):
+        # Room yang diminta bila ada; tanpa permintaan, room dengan pemain terbanyak.
+        if spectator.room is not None:
+            spectator.room.spectators.discard(spectator)
+        live = [room for room in self.rooms.values() if room.snapshot is not None and room.closed_at is None]
+        if spectator.wanted_room is not None:
+            room = self.rooms.get(spectator.wanted_room)
+            room = room if room in live else None
+        else:
+            room = max(live, key=lambda r: (len(r.snapshot['players']), -r.room_id), default=None)
+        spectator.room = room
+        spectator.base_seq = None
+        if room is not None:
+            room.spectators.add(spectator)
+
+    def release(self, room):
+        for spectator in room.spectators:
+            spectator.room = None
+        room.spectators.clear()
+
+    def drain_feed(self):
+        inbox = self.feed.inbox
+        while inbox:
+            arrival, message = inbox.popleft()
+            msg_type = message.get('type')
+            if msg_type in ('room_update', 'room_delta'):
+                room = self.rooms.get(message['room'])
+                if room is None or room.closed_at is not None:
+                    # Room baru, atau feed tersambung ulang setelah room lama dianggap tutup.
+                    if room is not None:
+                        self.release(room)
+                    room = self.rooms[message['room']] = RelayRoom(message['room'])
+                if not room.apply(arrival, message):
+                    print(f"[Relay] Delta room {room.room_id} tidak cocok, berlangganan ulang.")
+                    self.feed.restart()
+            elif msg_type == 'room_closed':
+                room = self.rooms.get(message['room'])
+                if room is not None:
+                    room.closed_at = arrival
+            elif msg_type == 'feed_lost':
+                for room in self.rooms.values():
+                    room.closed_at = arrival
+
+    def tick(self):
+        self.drain_feed()
+        cutoff = time.monotonic() - self.delay
+        for room_id, room in list(self.rooms.items()):
+            if room.closed_at is not None and room.closed_at <= cutoff:
+                del self.rooms[room_id]
+                self.release(room)
+        for spectator in self.spectators:
+            if spectator.room is None:
+                self.assign(spectator)
+
+        for room in self.rooms.values():
+            snapshot = room.visible(cutoff)
+            if not room.spectators or snapshot is None or snapshot is room.sent_snapshot:
+                continue
+            self.out_seq += 1
+            payloads = {}
+            frames = {}
+            for spectator in list(room.spectators):
+                keyframe = spectator.base_seq is None or spectator.base_seq != room.sent_seq
+                codec = spectator.codec
+                key = (keyframe, codec.codec_id, spectator.level)
+                if key not in frames:
+                    if key[:2] not in payloads:
+                        if keyframe:
+                            message = {'type': 'game_update', 'seq': self.out_seq, 'state': snapshot}
+                        else:
+                            message = {'type': 'game_delta', 'seq': self.out_seq, 'base': room.sent_seq,
+                                       **diff_snapshots(room.sent_snapshot, snapshot)}
+                        payloads[key[:2]] = codec.encode(message)
+                    frames[key] = build_frame([payloads[key[:2]]], spectator.level)
+                spectator.base_seq = self.out_seq if spectator.send(frames[key]) else None
+            room.sent_seq = self.out_seq
+            room.sent_snapshot = snapshot
+
+    def report(self):
+        sent = self.sent_bytes + sum(spectator.sent_bytes for spectator in self.spectators)
+        watched = sum(1 for room in self.rooms.values() if room.spectators)
+        return f"[Relay] penonton={len(self.spectators)} room={len(self.rooms)} (ditonton {watched}) keluar={sent}B"
+
+
+async def receive_message(framed, codec):
+    try:
+        return codec.decode(await framed.read_frame())
+    except (ValueError, ConnectionResetError, asyncio.IncompleteReadError):
+        return None
+
+
+def make_spectator_handler(relay, compress_level):
+    async def handle_spectator(reader, writer):
+        addr = writer.get_extra_info('peername')
+        spectator = None
+        try:
+            codec, level = await server_handshake_async(reader, writer, DEFAULT_CODEC_PREFERENCE, compress_level)
+            framed = AsyncFramedReader(reader, MAX_FRAME_BYTES)
+            message = await receive_message(framed, codec)
+            if message is None or message.get('type') != 'spectate':
+                writer.write(pack_frame(codec.encode({'type': 'error', 'message': 'Relay hanya untuk penonton'})))
+                return
+            spectator = Spectator(writer, codec, level, message.get('room'))
+            relay.add_spectator(spectator)
+            print(f"[Relay] Penonton {addr} bergabung ({len(relay.spectators)} penonton).")
+            while True:
+                message = await receive_message(framed, codec)
+                if message is None:
+                    break
+                if message.get('type') == 'spectate':
+                    spectator.wanted_room = message.get('room')
+                    relay.assign(spectator)
+        except (ProtocolError, ConnectionResetError) as e:
+            print(f"[Relay] Koneksi penonton {addr} ditutup: {e}")
+        finally:
+            if spectator is not None:
+                relay.remove_spectator(spectator)
+                print(f"[Relay] Penonton {addr} keluar ({len(relay.spectators)} penonton).")
+            writer.close()
+    return handle_spectator
+
+
+async def main(args):
+    feed = FeedClient(args.server, args.feed_port)
+    relay = Relay(feed, args.delay)
+    feed.start()
+    server = await asyncio.start_server(make_spectator_handler(relay, args.compress_level), HOST, args.port)
+    print(f"[Relay] Relay penonton berjalan di {HOST}:{args.port}, {args.rate} Hz, tunda {args.delay}s.")
+
+    loop = asyncio.get_running_loop()
+    scheduler = FixedStepScheduler(args.rate, 1, loop.time)
+    metrics = TickMetrics(scheduler.step)
+    last_report = time.monotonic(), time.process_time()
+    async with server:
+        while True:
+            if scheduler.due_steps():
+                tick_start = time.perf_counter()
+                relay.tick()
+                metrics.record_tick(tick_start)
+            now = time.monotonic()
+            if args.stats_interval > 0 and now - last_report[0] >= args.stats_interval:
+                cpu_time = time.process_time()
+                cpu_percent = (cpu_time - last_report[1]) / (now - last_report[0]) * 100
+                print(metrics.report(scheduler.skipped_steps, cpu_percent))
+                print(relay.report(), flush=True)
+                metrics.reset()
+                last_report = now, cpu_time
+            await asyncio.sleep(scheduler.sleep_time())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relay penonton: satu langganan feed server, banyak penonton.")
+    parser.add_argument('--server', default='127.0.0.1')
+    parser.add_argument('--feed-port', type=int, default=SPECTATOR_FEED_PORT)
+    parser.add_argument('--port', type=int, default=RELAY_PORT, help="Port untuk penonton.")
+    parser.add_argument('--rate', type=float, default=RELAY_RATE,
+                        help=f"Snapshot per detik ke penonton (maks {SERVER_TICK_RATE}, tick rate server).")
+    parser.add_argument('--delay', type=float, default=0.0, help="Tunda siaran (detik), mis. untuk turnamen.")
+    parser.add_argument('--compress-level', type=int, default=DEFAULT_COMPRESS_LEVEL, choices=range(10))
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL)
+    args = parser.parse_args()
+    args.rate = min(args.rate, SERVER_TICK_RATE)
+    asyncio.run(main(args))
@@ -0,0 +1,64 @@
+import collections
+import pygame
+
+TEXT_CACHE_SIZE = 256
+
+
+class TextCache:
+    # Surface hasil font.render disimpan per (font, teks, warna) dengan batas LRU,
+    # karena nama pemain dan label yang sama digambar ulang setiap frame.
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class DirtyRegions:
+    # Mode dirty rectangle: hanya area yang digambar pada frame ini dan frame sebelumnya
+    # yang dipulihkan dari background lalu dikirim ke layar. Frame penuh dipakai saat
+    # mode partial baru dimulai (mis. pindah dari lobi ke permainan).
+    def __init__(self, surface, background):
+        self.surface = surface
+        self.background = background
+        self.previous = []
+        self.current = []
+        self.last_partial = False
+        self.full = True
+
+    def begin(self, partial):
+        self.full = not (partial and self.last_partial)
+        self.last_partial = partial
+        if self.full:
+            self.surface.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous:
+                self.surface.blit(self.background, rect, rect)
+
+    def add(self, rect):
+        self.current.append(rect)
+        return rect
+
+    def finish(self):
+        if self.full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous, self.current = self.current, []
@@ -0,0 +1,179 @@
+import queue
+import struct
+import threading
+import zlib
+
+REPLAY_MAGIC = b'TAGR'
+REPLAY_VERSION = 1
+CHECK_INTERVAL = 30
+MAX_TICK_RUN = 0xFFFF
+
+REC_TICKS = 1
+REC_JOIN = 2
+REC_NAME = 3
+REC_LEAVE = 4
+REC_INPUT = 5
+REC_ITEM = 6
+REC_CHECK = 7
+
+_header = struct.Struct('<4sBQHI8s')
+_small = struct.Struct('<BH')
+_input = struct.Struct('<BHdd')
+_name = struct.Struct('<BHB')
+_check = struct.Struct('<BI')
+
+# Satu thread penulis dipakai bersama semua room; tick hanya menaruh potongan byte ke antrean.
+_write_queue = queue.SimpleQueue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+
+
+def _writer_loop():
+    while True:
+        writer, data = _write_queue.get()
+        try:
+            if writer.file is None:
+                writer.file = open(writer.path, 'wb')
+            if data is None:
+                writer.file.close()
+            else:
+                writer.file.write(data)
+        except (OSError, ValueError) as e:
+            print(f"[Replay] Gagal menulis {writer.path}: {e}")
+
+
+def _enqueue(writer, data):
+    global _writer_thread
+    if _writer_thread is None:
+        with _writer_lock:
+            if _writer_thread is None:
+                _writer_thread = threading.Thread(target=_writer_loop, daemon=True)
+                _writer_thread.start()
+    _write_queue.put((writer, data))
+
+
+def state_checksum(game_state):
+    # Ringkasan state untuk mendeteksi replay yang menyimpang dari match aslinya.
+    players = tuple((pid, round(float(p['pos'][0]), 3), round(float(p['pos'][1]), 3), p['score'], bool(p['is_it']),
+                     p['inventory'], bool(p['stunned'])) for pid, p in game_state['players'].items())
+    items = tuple((item['id'], item['type']) for item in game_state['items'])
+    return zlib.crc32(repr((players, items, game_state['game_started'])).encode())
+
+
+class ReplayWriter:
+    # Log biner satu room: seed, join/leave, dan input efektif per tick (hanya saat berubah).
+    # Tick tanpa perubahan digabung menjadi satu record berisi jumlah tick.
+    def __init__(self, path, seed, tick_rate, room_id, engine):
+        self.path = path
+        self.file = None
+        self.buffer = bytearray(_header.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, tick_rate, room_id,
+                                             engine.encode()[:8]))
+        self.pending_ticks = 0
+        self.tick_count = 0
+        self.moves = {}
+        self.item_requests = set()
+        self.closed = False
+
+    def _record(self, data):
+        if self.pending_ticks:
+            self.buffer += _small.pack(REC_TICKS, self.pending_ticks)
+            self.pending_ticks = 0
+        self.buffer += data
+
+    def join(self, player_id):
+        self.moves.pop(player_id, None)
+        self._record(_small.pack(REC_JOIN, player_id))
+
+    def name(self, player_id, username, avatar_hash):
+        encoded = username.encode('utf-8')[:255]
+        data = _name.pack(REC_NAME, player_id, len(encoded)) + encoded
+        data += b'\x01' + bytes.fromhex(avatar_hash) if avatar_hash else b'\x00'
+        self._record(data)
+
+    def leave(self, player_id):
+        self.moves.pop(player_id, None)
+        self.item_requests.discard(player_id)
+        self._record(_small.pack(REC_LEAVE, player_id))
+
+    def inputs(self, player_inputs, item_requests):
+        for pid, inputs in player_inputs.items():
+            move = (inputs.get('move_x', 0), inputs.get('move_y', 0))
+            if self.moves.get(pid, (0, 0)) != move:
+                self.moves[pid] = move
+                self._record(_input.pack(REC_INPUT, pid, *move))
+        for pid in sorted(item_requests - self.item_requests):
+            self._record(_small.pack(REC_ITEM, pid))
+
+    def tick(self, item_requests):
+        # Permintaan item yang masih tertunda setelah tick tidak perlu dicatat ulang.
+        self.item_requests = set(item_requests)
+        self.pending_ticks += 1
+        self.tick_count += 1
+        if self.pending_ticks == MAX_TICK_RUN:
+            self._record(b'')
+        return self.tick_count % CHECK_INTERVAL == 0
+
+    def check(self, checksum):
+        self._record(_check.pack(REC_CHECK, checksum))
+
+    def flush(self):
+        if self.buffer and not self.closed:
+            _enqueue(self, bytes(self.buffer))
+            self.buffer.clear()
+
+    def close(self):
+        if self.closed:
+            return
+        self._record(b'')
+        self.flush()
+        self.closed = True
+        _enqueue(self, None)
+
+
+def read_replay(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _header.size:
+        raise ValueError("File replay terlalu pendek.")
+    magic, version, seed, tick_rate, room_id, engine = _header.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError("Bukan file replay Tag Arena atau versinya tidak didukung.")
+    header = {'seed': seed, 'tick_rate': tick_rate, 'room_id': room_id,
+              'engine': engine.rstrip(b'\x00').decode()}
+    return header, _iter_records(data, _header.size)
+
+
+def _iter_records(data, offset):
+    # Rekaman yang terpotong (server mati mendadak) berhenti di record utuh terakhir.
+    try:
+        while offset < len(data):
+            kind = data[offset]
+            if kind in (REC_TICKS, REC_JOIN, REC_LEAVE, REC_ITEM):
+                _, value = _small.unpack_from(data, offset)
+                offset += _small.size
+                yield ({REC_TICKS: 'ticks', REC_JOIN: 'join', REC_LEAVE: 'leave', REC_ITEM: 'item'}[kind], value)
+            elif kind == REC_INPUT:
+                _, pid, move_x, move_y = _input.unpack_from(data, offset)
+                offset += _input.size
+                yield ('input', pid, move_x, move_y)
+            elif kind == REC_NAME:
+                _, pid, length = _name.unpack_from(data, offset)
+                offset += _name.size
+                username = data[offset:offset + length].decode('utf-8', 'replace')
+                offset += length
+                avatar_hash = None
+                if data[offset]:
+                    avatar_hash = data[offset + 1:offset + 33].hex()
+                    if len(avatar_hash) != 64:
+                        return
+                    offset += 32
+                offset += 1
+                yield ('name', pid, username, avatar_hash)
+            elif kind == REC_CHECK:
+                _, checksum = _check.unpack_from(data, offset)
+                offset += _check.size
+                yield ('check', checksum)
+            else:
+                raise ValueError(f"Record replay tidak dikenal: {kind}")
+    except (struct.error, IndexError):
+        return
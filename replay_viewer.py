@@ -0,0 +1,191 @@
+import argparse
+import contextlib
+import io
+import time
+import server
+from replay import read_replay, state_checksum
+
+
+class ReplayPlayer:
+    # Mensimulasikan ulang satu room dari rekamannya memakai kode Room yang sama dengan server.
+    def __init__(self, path, engine=None):
+        self.header, self.records = read_replay(path)
+        engine = engine or self.header['engine']
+        room_class = server.VectorRoom if engine == 'numpy' and server.PlayerArrays is not None else server.Room
+        self.room = room_class(self.header['room_id'], seed=self.header['seed'])
+        self.tick_delta = 1 / self.header['tick_rate']
+        self.pending_ticks = 0
+        self.ticks = 0
+        self.checks = 0
+        self.mismatches = []
+        self.results = []
+        self.avatar_hashes = {}
+        self.on_name = None
+        self.finished = False
+
+    def apply(self, record):
+        room = self.room
+        kind = record[0]
+        if kind == 'ticks':
+            self.pending_ticks += record[1]
+        elif kind == 'join':
+            player_id = room.register_player(None)
+            room.apply_commands()
+            if player_id != record[1]:
+                raise ValueError(f"Replay menyimpang: id pemain {player_id}, seharusnya {record[1]}.")
+        elif kind == 'name':
+            _, player_id, username, avatar_hash = record
+            room.static_player_data[player_id] = {'username': username, 'avatar_hash': None}
+            room.game_state['players'][player_id]['username'] = username
+            self.avatar_hashes[player_id] = avatar_hash
+            if self.on_name is not None:
+                self.on_name(player_id, avatar_hash)
+        elif kind == 'leave':
+            room.remove_player(record[1])
+            room.apply_commands()
+            self.avatar_hashes.pop(record[1], None)
+        elif kind == 'input':
+            _, player_id, move_x, move_y = record
+            room.apply_input(player_id, {'move_x': move_x, 'move_y': move_y})
+        elif kind == 'item':
+            room.item_requests.add(record[1])
+        elif kind == 'check':
+            room.flush_view()
+            self.checks += 1
+            if state_checksum(room.game_state) != record[1]:
+                self.mismatches.append(self.ticks)
+
+    def step(self):
+        # Menjalankan satu tick; False bila rekaman sudah habis.
+        while not self.pending_ticks:
+            record = next(self.records, None)
+            if record is None:
+                self.finished = True
+                return False
+            self.apply(record)
+        self.pending_ticks -= 1
+        self.ticks += 1
+        state = self.room.game_state
+        had_winner = state.get('winner')
+        self.room.tick(self.tick_delta)
+        if state.get('winner') and not had_winner:
+            self.room.flush_view()
+            scores = {p['username']: p['score'] for p in state['players'].values()}
+            self.results.append((self.room.game_state['sim_time'], state['winner'], scores))
+        return True
+
+    def snapshot(self):
+        self.room.flush_view()
+        return self.room.game_state
+
+
+def run_headless(player, until=None, verbose=False):
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        while (until is None or player.room.game_state['sim_time'] < until) and player.step():
+            pass
+    return time.perf_counter() - start
+
+
+def render(player, speed):
+    import pygame
+    import client
+    from render_cache import DirtyRegions
+
+    client.init_display()
+    client.load_assets()
+    pygame.display.set_caption("Tag Arena Replay")
+
+    def show_avatar(player_id, avatar_hash):
+        # Avatar diambil dari cache disk klien bila pernah dilihat; selain itu placeholder.
+        client.player_avatars[player_id] = client.assets['avatar_placeholder_circle']
+        data = client.avatar_disk_cache.get(avatar_hash) if avatar_hash else None
+        if data is not None:
+            client.avatar_versions[player_id] = avatar_hash
+            client.decode_avatar(player_id, avatar_hash, data)
+
+    player.on_name = show_avatar
+    for player_id, avatar_hash in player.avatar_hashes.items():
+        show_avatar(player_id, avatar_hash)
+
+    dirty = DirtyRegions(client.screen, client.assets['background'])
+    paused = False
+    stun_frame = 0
+    ticks_due = 0.0
+    last_frame_time = time.monotonic()
+    while True:
+        now = time.monotonic()
+        frame_time, last_frame_time = now - last_frame_time, now
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in (pygame.K_RIGHT, pygame.K_UP):
+                    speed = min(speed * 2, 64)
+                elif event.key in (pygame.K_LEFT, pygame.K_DOWN):
+                    speed = max(speed / 2, 0.25)
+
+        if not paused and not player.finished:
+            ticks_due += frame_time * speed / player.tick_delta
+            with contextlib.redirect_stdout(io.StringIO()):
+                while ticks_due >= 1 and player.step():
+                    ticks_due -= 1
+
+        state = player.snapshot()
+        playing = bool(state['game_started'])
+        dirty.begin(client.DIRTY_RECT_RENDERING and playing)
+        if playing:
+            client.draw_arena(state, stun_frame, dirty)
+            for rect in client.draw_hud(state):
+                dirty.add(rect)
+            stun_frame = (stun_frame + 0.2) % 3
+        elif state.get('winner'):
+            client.draw_text(f"Pemenang: {state['winner']}", client.FONT_BOLD, client.WHITE,
+                             (client.SCREEN_WIDTH // 2, 250))
+        else:
+            client.draw_text(f"Lobi: {len(state['players'])} pemain", client.FONT_BOLD, client.WHITE,
+                             (client.SCREEN_WIDTH // 2, 250))
+        status = "SELESAI" if player.finished else ("JEDA" if paused else f"x{speed:g}")
+        label = f"Replay t={player.room.game_state['sim_time']:.1f}s {status}"
+        dirty.add(client.draw_text(label, client.FONT_REGULAR, client.YELLOW, (110, 20)))
+        dirty.finish()
+        client.clock.tick(client.FPS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Putar ulang rekaman match Tag Arena.")
+    parser.add_argument('path')
+    parser.add_argument('--engine', choices=('dict', 'numpy'), help="Default: engine yang dipakai saat merekam.")
+    parser.add_argument('--render', action='store_true', help="Tampilkan di jendela pygame, bukan headless.")
+    parser.add_argument('--start', type=float, default=0, help="Maju cepat headless sampai detik simulasi ini.")
+    parser.add_argument('--speed', type=float, default=1, help="Kecepatan putar untuk --render.")
+    parser.add_argument('--verbose', action='store_true', help="Tampilkan log permainan (TAG!, pemenang).")
+    args = parser.parse_args()
+
+    player = ReplayPlayer(args.path, args.engine)
+    print(f"[Replay] Room {player.header['room_id']} seed={player.header['seed']} "
+          f"engine={player.header['engine']} {player.header['tick_rate']} tick/s")
+    if args.render:
+        run_headless(player, args.start, args.verbose)
+        render(player, args.speed)
+        return
+
+    wall = run_headless(player, verbose=args.verbose)
+    simulated = player.ticks * player.tick_delta
+    print(f"[Replay] {player.ticks} tick ({simulated:.1f}s permainan) dalam {wall:.2f}s, "
+          f"{simulated / wall if wall else float('inf'):.0f}x waktu nyata.")
+    for sim_time, winner, scores in player.results:
+        ranking = ', '.join(f"{name}={score}" for name, score in sorted(scores.items(), key=lambda s: -s[1]))
+        print(f"[Replay] t={sim_time:.1f}s pemenang {winner} ({ranking})")
+    if player.mismatches:
+        print(f"[Replay] PERINGATAN: {len(player.mismatches)} dari {player.checks} checksum tidak cocok, "
+              f"pertama di tick {player.mismatches[0]}.")
+    else:
+        print(f"[Replay] {player.checks} checksum cocok.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import collections
+from config import (ARENA_HEIGHT, ARENA_WIDTH, BANANA_ARM_TIME, GAME_DURATION, GAME_OVER_DURATION,
+                    ITEM_EFFECT_DURATION, ITEM_RADIUS, ITEM_SPAWN_INTERVAL, ITEM_TYPES, MAX_ITEMS, MAX_PLAYERS,
+                    PLAYER_RADIUS, PLAYER_SPEED, SPEED_BOOST_MULTIPLIER, TAG_IMMUNITY_DURATION, TAG_SCORE)
+
+# Semua angka yang memengaruhi aturan main dikumpulkan di sini supaya simulasi batch bisa
+# mencoba nilai lain tanpa mengubah config.
+RuleParams = collections.namedtuple('RuleParams', [
+    'arena_width', 'arena_height', 'player_radius', 'item_radius', 'player_speed', 'max_players',
+    'game_duration', 'game_over_duration', 'tag_immunity', 'tag_score', 'speed_boost_multiplier',
+    'speed_boost_duration', 'stun_duration', 'banana_arm_time', 'item_types', 'max_items', 'item_spawn_interval'])
+
+DEFAULT_PARAMS = RuleParams(
+    arena_width=ARENA_WIDTH, arena_height=ARENA_HEIGHT, player_radius=PLAYER_RADIUS, item_radius=ITEM_RADIUS,
+    player_speed=PLAYER_SPEED, max_players=MAX_PLAYERS, game_duration=GAME_DURATION,
+    game_over_duration=GAME_OVER_DURATION, tag_immunity=TAG_IMMUNITY_DURATION, tag_score=TAG_SCORE,
+    speed_boost_multiplier=SPEED_BOOST_MULTIPLIER, speed_boost_duration=ITEM_EFFECT_DURATION['speed_boost'],
+    stun_duration=ITEM_EFFECT_DURATION['stun'], banana_arm_time=BANANA_ARM_TIME, item_types=tuple(ITEM_TYPES),
+    max_items=MAX_ITEMS, item_spawn_interval=ITEM_SPAWN_INTERVAL)
+
+
+def distance(p1, p2):
+    return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
+
+
+def advance_player(player, move_x, move_y, tick_delta, params=DEFAULT_PARAMS):
+    # Aturan gerak satu tick untuk satu pemain; dipakai server dan prediksi klien.
+    if player['effect_timer'] > 0:
+        player['effect_timer'] -= tick_delta
+    else:
+        player['speed'] = params.player_speed
+        player['stunned'] = False
+
+    if player['immunity_timer'] > 0:
+        player['immunity_timer'] -= tick_delta
+
+    if player['stunned']:
+        return False
+
+    radius = params.player_radius
+    player['pos'][0] += move_x * player['speed']
+    player['pos'][1] += move_y * player['speed']
+    player['pos'][0] = max(radius, min(player['pos'][0], params.arena_width - radius))
+    player['pos'][1] = max(radius, min(player['pos'][1], params.arena_height - radius))
+    return True
+
+
+def apply_speed_boost(player, params=DEFAULT_PARAMS):
+    player['speed'] = params.player_speed * params.speed_boost_multiplier
+    player['effect_timer'] = params.speed_boost_duration
@@ -0,0 +1,108 @@
+import bisect
+import threading
+import time
+
+# Batas atas bucket histogram dalam mikrodetik; bucket terakhir menampung sisanya.
+HISTOGRAM_BUCKETS_US = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+class FixedStepScheduler:
+    def __init__(self, tick_rate, max_steps, clock=time.monotonic):
+        self.step = 1 / tick_rate
+        self.max_steps = max_steps
+        self.clock = clock
+        self.accumulator = 0.0
+        self.last_time = None
+        self.skipped_steps = 0
+
+    def due_steps(self):
+        now = self.clock()
+        if self.last_time is None:
+            self.last_time = now
+            return 1
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            # Tertinggal terlalu jauh: sisa langkah dibuang agar tidak terjadi spiral kejar-kejaran.
+            self.skipped_steps += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step
+        return steps
+
+    def sleep_time(self):
+        return max(0.0, self.step - self.accumulator - (self.clock() - self.last_time))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_US) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        us = seconds * 1e6
+        self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS_US, us)] += 1
+        self.total += us
+        self.count += 1
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, fraction):
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                # Batas atas bucket tidak pernah dilaporkan melebihi sampel terbesar yang benar-benar terlihat.
+                return min(HISTOGRAM_BUCKETS_US[i], self.max) if i < len(HISTOGRAM_BUCKETS_US) else self.max
+        return 0.0
+
+    def summary(self):
+        mean = self.total / self.count if self.count else 0.0
+        return f"n={self.count} rata2={mean:.0f}us p50<={self.percentile(0.5):.0f}us p99<={self.percentile(0.99):.0f}us maks={self.max:.0f}us"
+
+
+class TickMetrics:
+    def __init__(self, budget, name='tick'):
+        self.budget = budget
+        self.name = name
+        # Fase 'input_enqueue' dan 'lock_wait' dicatat dari thread I/O, bersamaan dengan report/reset di thread tick.
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.ticks = Histogram()
+        self.overruns = 0
+        self.total_overruns = 0
+
+    def record(self, phase, start):
+        now = time.perf_counter()
+        with self.lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.add(now - start)
+        return now
+
+    def record_tick(self, start):
+        duration = time.perf_counter() - start
+        self.ticks.add(duration)
+        if duration > self.budget:
+            self.overruns += 1
+            self.total_overruns += 1
+
+    def report(self, skipped_steps=0, cpu_percent=0.0):
+        lines = [f"[Stats] {self.name} {self.ticks.summary()} overrun={self.overruns} (total {self.total_overruns}) "
+                 f"langkah dibuang={skipped_steps} cpu={cpu_percent:.1f}%"]
+        with self.lock:
+            for phase, histogram in self.phases.items():
+                lines.append(f"[Stats]   {phase:<13} {histogram.summary()}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.phases = {}
+        self.ticks = Histogram()
+        self.overruns = 0
@@ -1,338 +1,1450 @@
 
+import argparse
+import asyncio
+import collections
+import contextlib
+import os
 import socket
 import threading
-import pickle
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import queue
 import random
+import sys
 import time
 import traceback
+from avatar_cache import BlobStore
+from config import MAX_PLAYERS, PORT, SERVER_TICK_RATE, SPECTATOR_FEED_PORT
+from netsim import LossShim
+from replay import ReplayWriter, state_checksum
+from protocol import (CODECS, DEFAULT_COMPRESS_LEVEL, AsyncFramedReader, FrameBatcher, FramedSocket, ProtocolError,
+                      pack_frame, pack_udp_hello, server_handshake, server_handshake_async, unpack_udp_hello)
+from rules import DEFAULT_PARAMS
+from scheduler import FixedStepScheduler, TickMetrics
+from sharedmem import RECORD_ROOM, InputTable, SharedRing, pack_room_batch, unpack_room_batch
+from simulation import (DictEngine, InputStream, NumpyEngine, PlayerArrays, TickInputs, add_player, new_state,
+                        remove_player, step)
+from snapshot import NOTHING_VISIBLE, InterestIndex, diff_snapshots, take_snapshot
 
 
 HOST = '0.0.0.0'
-PORT = 5555
-MAX_PLAYERS = 3
-SERVER_TICK_RATE = 30
-GAME_DURATION = 180  
-ARENA_WIDTH = 800
-ARENA_HEIGHT = 600
-PLAYER_RADIUS = 25
-ITEM_RADIUS = 15
-PLAYER_SPEED = 4
-TAG_IMMUNITY_DURATION = 3  
-
-ITEM_TYPES = ['speed_boost', 'banana_trap']
-MAX_ITEMS = 5
-ITEM_SPAWN_INTERVAL = 5
-ITEM_EFFECT_DURATION = {'speed_boost': 5, 'stun': 2}
-BANANA_ARM_TIME = 0.5
-game_state = {
-    'players': {},
-    'items': [],
-    'game_started': False,
-    'game_time': GAME_DURATION,
-    'winner': None,
-    'game_over_timer': 0
-}
-static_player_data = {}
-player_inputs = {}
-clients = {}
-lock = threading.Lock()
-last_item_spawn_time = time.time()
-last_score_update_time = time.time()
-game_start_time = 0
-
-
-def distance(p1, p2):
-    return ((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)**0.5
-def send_to_client(conn, data):
-    try:
-        payload = pickle.dumps(data)
-        message = f"{len(payload):<10}".encode() + payload
-        conn.sendall(message)
-    except (ConnectionResetError, BrokenPipeError):
-        pass
-def broadcast(data):
+SERVER_CODECS = ('binary', 'pickle')
+KEYFRAME_INTERVAL = SERVER_TICK_RATE * 2
+LISTEN_BACKLOG = 1024
+OUTBOUND_BUFFER_LIMIT = 64 * 1024
+SLOW_CLIENT_TIMEOUT = 5
+MAX_ROOMS = 500
+MAX_CATCHUP_STEPS = 5
+UDP_MAX_PAYLOAD = 1200
+AVATAR_STORE_BYTES = 32 * 1024 * 1024
+MAX_AVATAR_BYTES = 256 * 1024
+# Frame terbesar dari klien adalah unggahan avatar; sisanya pesan kecil.
+MAX_FRAME_BYTES = MAX_AVATAR_BYTES + 4096
+UDP_MAX_DATAGRAM = 65535
+STATS_INTERVAL = 30
+SNAPSHOT_HISTORY = KEYFRAME_INTERVAL
+INPUT_QUEUE_LIMIT = 64
+MIN_INTEREST_RADIUS = 200
+INTEREST_MARGIN = 100
+INTEREST_CELL_SIZE = 200
+SCOREBOARD_SIZE = 10
+# Relay yang antrean keluarnya melebihi ini diputus; delta feed tidak boleh dibuang sebagian.
+FEED_BACKLOG_LIMIT = 4 * 1024 * 1024
+
+
+@contextlib.contextmanager
+def timed_lock(lock):
+    # Waktu menunggu lock room dari thread I/O dicatat sebagai fase 'lock_wait'.
+    wait_start = time.perf_counter()
     with lock:
-        for pid, conn in list(clients.items()):
-            send_to_client(conn, data)
+        tick_metrics.record('lock_wait', wait_start)
+        yield
+
+
+def encode_frame(data, codec):
+    payload = codec.encode(data)
+    return pack_frame(payload)
+
+
+def send_to_client(conn, data, codec):
+    conn.send(codec.encode(data))
+
+
+class ThreadedConnection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.frames = collections.deque()
+        self.pending_bytes = 0
+        self.backlog_since = None
+        self.closing = False
+        self.closed = False
+        self.cond = threading.Condition()
+        self.output = FrameBatcher()
+        threading.Thread(target=self._drain, daemon=True).start()
+
+    def send(self, payload, droppable=False):
+        # Pesan hanya dikumpulkan; thread tick mengirimnya sebagai satu frame lewat flush().
+        with self.cond:
+            if not self.closing and not self.closed:
+                self.output.add(payload, droppable)
+
+    def flush(self, cache=None):
+        with self.cond:
+            frame, droppable = self.output.take(cache)
+            if frame is not None:
+                self.send_frame(frame, droppable)
+
+    def send_frame(self, frame, droppable=False):
+        with self.cond:
+            if self.closing or self.closed:
+                return
+            if self.backlog_since is not None and time.monotonic() - self.backlog_since > SLOW_CLIENT_TIMEOUT:
+                print(f"[Server] Klien {self.peer()} terlalu lambat, koneksi diputus.")
+                self._abort_locked()
+                return
+            if droppable and self.pending_bytes > OUTBOUND_BUFFER_LIMIT:
+                # Klien tertinggal: buang snapshot lama yang masih antre, kirim yang terbaru saja.
+                if self.backlog_since is None:
+                    self.backlog_since = time.monotonic()
+                kept = collections.deque(entry for entry in self.frames if not entry[1])
+                self.pending_bytes = sum(len(entry[0]) for entry in kept)
+                self.frames = kept
+            self.frames.append((frame, droppable))
+            self.pending_bytes += len(frame)
+            self.cond.notify()
+
+    def _drain(self):
+        while True:
+            with self.cond:
+                while not self.frames and not self.closing and not self.closed:
+                    self.cond.wait()
+                if self.closed or not self.frames:
+                    break
+                frame, _ = self.frames.popleft()
+                self.pending_bytes -= len(frame)
+            send_start = time.thread_time()
+            try:
+                self.sock.sendall(frame)
+            except OSError:
+                self.abort()
+                break
+            with self.cond:
+                self.output.record_send(time.thread_time() - send_start)
+                if self.pending_bytes <= OUTBOUND_BUFFER_LIMIT:
+                    self.backlog_since = None
+        self.sock.close()
+
+    def backlog(self):
+        return self.pending_bytes
+
+    def peer(self):
+        try:
+            return self.sock.getpeername()
+        except OSError:
+            return '?'
+
+    def _abort_locked(self):
+        self.closed = True
+        self.frames.clear()
+        self.pending_bytes = 0
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.cond.notify()
 
+    def abort(self):
+        with self.cond:
+            self._abort_locked()
 
-def receive_from_client(conn):
+    def close(self):
+        with self.cond:
+            self.flush()
+            self.closing = True
+            self.cond.notify()
+
+
+def receive_from_client(framed, codec):
     try:
-        header_size = 10
-        header_data = b''
-        while len(header_data) < header_size:
-            chunk = conn.recv(header_size - len(header_data))
-            if not chunk: return None
-            header_data += chunk
-
-        msglen = int(header_data.decode())
-
-        full_msg = b''
-        while len(full_msg) < msglen:
-            chunk = conn.recv(min(msglen - len(full_msg), 4096))
-            if not chunk: return None
-            full_msg += chunk
-
-        return pickle.loads(full_msg)
-    except (ValueError, pickle.UnpicklingError, ConnectionResetError, EOFError):
+        payload = framed.read_frame()
+        if payload is None: return None
+        return codec.decode(payload)
+    except (ValueError, ConnectionResetError, EOFError):
         return None
 
 
-def handle_client(conn, player_id):
-    global player_inputs
-    print(f"[Koneksi] Pemain {player_id} mencoba terhubung...")
+class RoomMembers:
+    # Sisi I/O sebuah room: keanggotaan, salam, avatar, dan pesan selain snapshot. Subclass
+    # menentukan ke mana join/nama/leave dan input pemain diteruskan ke simulasinya.
+    def __init__(self, room_id, params=DEFAULT_PARAMS):
+        self.room_id = room_id
+        self.params = params
+        # Data keanggotaan milik thread I/O, dijaga self.lock.
+        self.static_player_data = {}
+        self.udp_candidates = {}
+        self.udp_clients = {}
+        self.clients = {}
+        self.client_codecs = {}
+        self.client_radii = {}
+        self.input_slots = {}
+        self.next_player_id = 0
+        self.lock = threading.Lock()
 
-    try:
-        send_to_client(conn, {'type': 'your_id', 'id': player_id})
-        send_to_client(conn, {'type': 'all_players_data', 'data': static_player_data})
-        player_info = receive_from_client(conn)
-        if player_info is None:
+    def has_free_slot(self):
+        return len(self.clients) < self.params.max_players
+
+    def register_player(self, conn):
+        with timed_lock(self.lock):
+            # ID pemain dikirim sebagai u16, jadi dipakai ulang secara melingkar per room.
+            while self.next_player_id in self.clients:
+                self.next_player_id = (self.next_player_id + 1) % 0x10000
+            player_id = self.next_player_id
+            self.next_player_id = (self.next_player_id + 1) % 0x10000
+
+            self.clients[player_id] = conn
+            self.open_slot(player_id)
+        return player_id
+
+    def greet_player(self, conn, player_id, codec):
+        print(f"[Koneksi][Room {self.room_id}] Pemain {player_id} memakai codec '{codec.name}'.")
+        send_to_client(conn, {'type': 'your_id', 'id': player_id}, codec)
+        if udp_endpoint is not None:
+            send_to_client(conn, {'type': 'udp_offer', 'token': udp_endpoint.offer(self, player_id), 'port': PORT}, codec)
+        with timed_lock(self.lock):
+            send_to_client(conn, {'type': 'all_players_data', 'data': dict(self.static_player_data)}, codec)
+            self.client_codecs[player_id] = codec
+
+    def join_player(self, player_id, player_info):
+        if player_info is None or player_info.get('type', 'join') != 'join':
             raise ConnectionAbortedError("Gagal menerima info pemain awal.")
+        avatar_hash = player_info.get('avatar_hash')
+        if not isinstance(avatar_hash, str) or len(avatar_hash) != 64:
+            avatar_hash = None
+        else:
+            # Hash dari klien pickle bisa berisi apa saja; yang bukan hex akan menggagalkan codec biner
+            # semua pemain room ini dan rekaman replay. Bentuk hex kecil dipakai sebagai kunci store.
+            try:
+                avatar_hash = bytes.fromhex(avatar_hash).hex()
+            except ValueError:
+                avatar_hash = None
+            # fromhex melewati spasi, jadi panjangnya diperiksa lagi setelah dinormalkan.
+            if avatar_hash is not None and len(avatar_hash) != 64:
+                avatar_hash = None
+        radius = player_info.get('interest_radius') or interest_radius
+        if radius and interest_radius:
+            radius = min(radius, interest_radius)
+        player_info = {'username': player_info['username'], 'avatar_hash': avatar_hash}
+
+        with timed_lock(self.lock):
+            self.static_player_data[player_id] = player_info
+            if radius:
+                self.client_radii[player_id] = max(MIN_INTEREST_RADIUS, radius)
+            self.post_name(player_id, player_info)
+            if avatar_hash:
+                avatar_store.acquire(avatar_hash)
+                # Blob baru diminta dari pemiliknya hanya bila belum ada di store bersama.
+                if avatar_hash not in avatar_store:
+                    send_to_client(self.clients[player_id], {'type': 'avatar_request', 'hashes': [avatar_hash]},
+                                   self.client_codecs[player_id])
+
+        print(f"[Koneksi][Room {self.room_id}] Pemain {player_id} ({player_info['username']}) berhasil bergabung.")
+
+        self.broadcast({'type': 'new_player', 'id': player_id, 'data': player_info})
+
+    def send_avatars(self, player_id, hashes):
+        conn, codec = self.clients.get(player_id), self.client_codecs.get(player_id)
+        if conn is None or codec is None:
+            return
+        for avatar_hash in hashes:
+            data = avatar_store.get(avatar_hash)
+            if data is None and not avatar_store.wait(avatar_hash, (conn, codec)):
+                data = avatar_store.get(avatar_hash)
+            if data is not None:
+                send_to_client(conn, {'type': 'avatar_blob', 'hash': avatar_hash, 'data': data}, codec)
+
+    def receive_avatar(self, player_id, message):
+        avatar_hash = self.static_player_data.get(player_id, {}).get('avatar_hash')
+        data = message.get('data') or b''
+        if message.get('hash') != avatar_hash or len(data) > MAX_AVATAR_BYTES:
+            return
+        waiters = avatar_store.put(avatar_hash, data)
+        if waiters is None:
+            print(f"[Koneksi][Room {self.room_id}] Avatar pemain {player_id} tidak cocok dengan hash-nya.")
+            return
+        for conn, codec in waiters:
+            send_to_client(conn, {'type': 'avatar_blob', 'hash': avatar_hash, 'data': data}, codec)
+
+    def pong(self, player_id, message):
+        # Dibalas dan dikirim segera, tanpa menunggu flush tick, agar RTT klien tidak ikut mengukur batching.
+        conn, codec = self.clients.get(player_id), self.client_codecs.get(player_id)
+        if conn is None or codec is None:
+            return
+        send_to_client(conn, {'type': 'pong', 'time': message.get('time', 0.0)}, codec)
+        conn.flush()
+
+    def set_udp_mode(self, player_id, enabled):
+        with timed_lock(self.lock):
+            addr = self.udp_candidates.get(player_id)
+            if enabled and addr is not None:
+                self.udp_clients[player_id] = addr
+                print(f"[Koneksi][Room {self.room_id}] Pemain {player_id} menerima snapshot lewat UDP {addr}.")
+            else:
+                self.udp_clients.pop(player_id, None)
+
+    def remove_player(self, player_id):
+        print(f"[Koneksi][Room {self.room_id}] Pemain {player_id} terputus.")
+        with timed_lock(self.lock):
+            self.close_slot(player_id)
+            self.udp_candidates.pop(player_id, None)
+            self.udp_clients.pop(player_id, None)
+            if udp_endpoint is not None:
+                udp_endpoint.forget(self, player_id)
+            avatar_hash = self.static_player_data.get(player_id, {}).get('avatar_hash')
+            if avatar_hash:
+                avatar_store.release(avatar_hash)
+            if player_id in self.clients: del self.clients[player_id]
+            if player_id in self.client_codecs: del self.client_codecs[player_id]
+            self.client_radii.pop(player_id, None)
+            if player_id in self.static_player_data: del self.static_player_data[player_id]
+
+        self.broadcast({'type': 'player_left', 'id': player_id})
+
+    def broadcast(self, data):
+        payloads = {}
+        with timed_lock(self.lock):
+            recipients = [(conn, self.client_codecs[pid]) for pid, conn in self.clients.items()
+                          if pid in self.client_codecs]
+        for conn, codec in recipients:
+            if codec.codec_id not in payloads:
+                payloads[codec.codec_id] = codec.encode(data)
+            conn.send(payloads[codec.codec_id])
+
+    def flush_outputs(self):
+        # Semua pesan tick ini (snapshot, join/leave, avatar, salam) keluar sebagai satu frame per klien.
+        with self.lock:
+            conns = list(self.clients.values())
+        cache = {}
+        for conn in conns:
+            conn.flush(cache)
+
+
+class Room(RoomMembers):
+    engine_class = DictEngine
+
+    def __init__(self, room_id, seed=None, params=DEFAULT_PARAMS):
+        super().__init__(room_id, params)
+        # Semua keacakan dan waktu permainan berasal dari seed dan jam simulasi room,
+        # sehingga match bisa diputar ulang persis dari rekamannya.
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        # State simulasi hanya disentuh thread tick. Thread I/O menaruh join/leave di kotak surat
+        # dan input di antrean per pemain (deque: append/popleft aman tanpa lock), lalu membaca
+        # snapshot yang diterbitkan tiap akhir tick.
+        self.engine = self.engine_class(params)
+        self.game_state = new_state(params)
+        self.snapshot = take_snapshot(self.game_state)
+        self.commands = collections.deque()
+        self.input_queues = {}
+        self.player_inputs = {}
+        self.input_streams = {}
+        self.input_seqs = {}
+        self.input_acks = {}
+        self.item_requests = set()
+        self.tick_inputs = TickInputs(self.player_inputs, self.item_requests, self.input_seqs, self.input_acks)
+        self.client_acks = {}
+        self.keyframe_requests = set()
+        self.client_views = {}
+        self.client_visible = {}
+        self.snapshot_history = {}
+        self.snapshot_seq = 0
+        self.seen_overruns = tick_metrics.total_overruns
+        self.recorder = None
+        if replay_dir is not None:
+            path = os.path.join(replay_dir, f"room{room_id}-{time.strftime('%Y%m%d-%H%M%S')}.tagreplay")
+            self.recorder = ReplayWriter(path, self.seed, SERVER_TICK_RATE, room_id, self.engine.name)
+
+    def flush_view(self):
+        self.engine.flush(self.game_state)
+
+    def reload_view(self):
+        self.engine.reload(self.game_state, self.player_inputs)
+
+    def open_slot(self, player_id):
+        slot = self.input_slots[player_id] = collections.deque(maxlen=INPUT_QUEUE_LIMIT)
+        self.commands.append(('join', player_id, slot))
+
+    def post_name(self, player_id, player_info):
+        self.commands.append(('name', player_id, player_info['username'], player_info['avatar_hash']))
+
+    def close_slot(self, player_id):
+        self.commands.append(('leave', player_id))
+        self.input_slots.pop(player_id, None)
+
+    def store_inputs(self, player_id, inputs):
+        # Dipanggil dari thread I/O: hanya menaruh input di antrean pemain, tanpa lock room.
+        phase_start = time.perf_counter()
+        slot = self.input_slots.get(player_id)
+        if slot is not None:
+            slot.append(inputs)
+        tick_metrics.record('input_enqueue', phase_start)
+
+    def apply_commands(self):
+        # Join/leave diterapkan thread tick di awal tick, berurutan seperti datangnya.
+        game_state = self.game_state
+        while self.commands:
+            command = self.commands.popleft()
+            kind, player_id = command[0], command[1]
+            if kind == 'join':
+                self.flush_view()
+                add_player(game_state, player_id, self.rng, self.params)
+                self.player_inputs[player_id] = {}
+                self.input_streams[player_id] = InputStream()
+                self.input_queues[player_id] = command[2]
+                self.reload_view()
+                if self.recorder is not None:
+                    self.recorder.join(player_id)
+            elif kind == 'name':
+                if player_id in game_state['players']:
+                    game_state['players'][player_id]['username'] = command[2]
+                if self.recorder is not None:
+                    self.recorder.name(player_id, command[2], command[3])
+            elif kind == 'leave':
+                self.flush_view()
+                new_it_id = remove_player(game_state, player_id, self.rng)
+                if new_it_id is not None:
+                    print(f"[Game][Room {self.room_id}] {game_state['players'][new_it_id]['username']} sekarang 'It'.")
+                self.player_inputs.pop(player_id, None)
+                self.input_queues.pop(player_id, None)
+                self.input_streams.pop(player_id, None)
+                self.input_seqs.pop(player_id, None)
+                self.input_acks.pop(player_id, None)
+                self.item_requests.discard(player_id)
+                self.client_acks.pop(player_id, None)
+                self.keyframe_requests.discard(player_id)
+                self.client_views.pop(player_id, None)
+                self.client_visible.pop(player_id, None)
+                self.reload_view()
+                if self.recorder is not None:
+                    self.recorder.leave(player_id)
+
+    def drain_inputs(self):
+        for player_id, queue in self.input_queues.items():
+            while queue:
+                inputs = queue.popleft()
+                self.apply_input(player_id, inputs)
+                if inputs.get('ack') is not None:
+                    self.client_acks[player_id] = inputs['ack']
+                if inputs.get('keyframe'):
+                    self.keyframe_requests.add(player_id)
+
+    def apply_input(self, player_id, inputs):
+        # use_item adalah tekanan sekali (edge); ditampung sampai tick berikutnya agar
+        # tidak hilang tertimpa input lain dan tidak terpakai dua kali.
+        if inputs.get('use_item'):
+            self.item_requests.add(player_id)
+        seq = inputs.get('seq')
+        if seq:
+            # Arah gerak bernomor seq diterapkan per langkah klien oleh select_inputs.
+            stream = self.input_streams.get(player_id)
+            return stream is not None and stream.add(seq, inputs)
+        self.player_inputs[player_id] = inputs
+        self.engine.set_input(player_id, inputs)
+        return True
+
+    def select_inputs(self):
+        # Satu langkah klien per pemain per tick; seq-nya baru diakui bila gerak benar-benar disimulasikan.
+        for player_id, stream in self.input_streams.items():
+            if not stream.known_seq:
+                continue
+            seq, inputs = stream.next_input(self.input_acks.get(player_id, 0))
+            if seq is None:
+                self.input_seqs.pop(player_id, None)
+            else:
+                self.input_seqs[player_id] = seq
+            if self.player_inputs.get(player_id) is not inputs:
+                self.player_inputs[player_id] = inputs
+                self.engine.set_input(player_id, inputs)
+
+    def recipients(self):
+        # Salinan daftar penerima; pengiriman sendiri berlangsung di luar lock.
+        with self.lock:
+            return [(pid, conn, self.client_codecs[pid], self.udp_clients.get(pid), self.client_radii.get(pid))
+                    for pid, conn in self.clients.items() if pid in self.client_codecs]
+
+    def publish_snapshot(self):
+        # Snapshot yang diterbitkan tidak pernah diubah lagi; thread lain cukup membaca self.snapshot.
+        self.flush_view()
+        self.snapshot = take_snapshot(self.game_state)
+
+    def broadcast_snapshot(self, recipients):
+        self.snapshot_seq += 1
+        snapshot = self.snapshot
+        # Klien diberi tahu bila tick server sempat melewati anggarannya sejak snapshot sebelumnya.
+        overrun = tick_metrics.total_overruns != self.seen_overruns
+        self.seen_overruns = tick_metrics.total_overruns
+        self.snapshot_history[self.snapshot_seq] = snapshot
+        self.snapshot_history.pop(self.snapshot_seq - SNAPSHOT_HISTORY, None)
+
+        # Setiap varian (keyframe atau delta per baseline) dienkode sekali per codec,
+        # lalu payload yang sama dibagikan ke antrean keluar semua klien.
+        messages = {}
+        payloads = {}
+        index = None
+        for pid, conn, codec, addr, radius in recipients:
+            history = self.snapshot_history
+            if radius:
+                # Klien dengan radius minat mendapat snapshot sendiri beserta riwayat baseline-nya.
+                if index is None:
+                    index = InterestIndex(snapshot, INTEREST_CELL_SIZE, SCOREBOARD_SIZE)
+                view, self.client_visible[pid] = index.view(pid, radius, INTEREST_MARGIN,
+                                                            self.client_visible.get(pid, NOTHING_VISIBLE))
+                history = self.client_views.setdefault(pid, {})
+                history[self.snapshot_seq] = view
+                history.pop(self.snapshot_seq - SNAPSHOT_HISTORY, None)
+            base_seq = self.client_acks.get(pid)
+            keyframe_due = (self.snapshot_seq + pid) % KEYFRAME_INTERVAL == 0
+            if base_seq not in history or keyframe_due or pid in self.keyframe_requests:
+                self.keyframe_requests.discard(pid)
+                base_seq = None
+            if radius:
+                if base_seq is None:
+                    message = {'type': 'game_update', 'seq': self.snapshot_seq, 'state': view, 'overrun': overrun}
+                else:
+                    message = {'type': 'game_delta', 'seq': self.snapshot_seq, 'base': base_seq, 'overrun': overrun,
+                               **diff_snapshots(history[base_seq], view)}
+                payload = codec.encode(message)
+            else:
+                if base_seq not in messages:
+                    if base_seq is None:
+                        messages[None] = {'type': 'game_update', 'seq': self.snapshot_seq, 'state': snapshot,
+                                          'overrun': overrun}
+                    else:
+                        messages[base_seq] = {'type': 'game_delta', 'seq': self.snapshot_seq, 'base': base_seq,
+                                              'overrun': overrun,
+                                              **diff_snapshots(self.snapshot_history[base_seq], snapshot)}
+                key = (base_seq, codec.codec_id)
+                if key not in payloads:
+                    payloads[key] = codec.encode(messages[base_seq])
+                payload = payloads[key]
+            self.send_snapshot(conn, codec, addr, payload, self.input_acks.get(pid, 0))
+
+    def send_snapshot(self, conn, codec, addr, payload, ack):
+        # Payload dibagi semua penerima; hanya ack input milik penerima yang dipasang per salinan.
+        payload = codec.with_input_ack(payload, ack)
+        # Snapshot yang muat satu datagram dikirim lewat UDP; sisanya tetap lewat TCP.
+        if addr is not None and len(payload) <= UDP_MAX_PAYLOAD:
+            udp_endpoint.sendto(payload, addr)
+        else:
+            conn.send(payload, droppable=True)
+
+    def run_tick(self, tick_delta):
+        # Fase 'input' adalah porsi tick untuk join/leave dan input; antrean dari thread I/O
+        # dicatat terpisah sebagai 'input_enqueue'.
+        phase_start = time.perf_counter()
+        self.apply_commands()
+        self.drain_inputs()
+        self.select_inputs()
+        if self.recorder is not None:
+            self.recorder.inputs(self.player_inputs, self.item_requests)
+        tick_metrics.record('input', phase_start)
+        broadcast = self.tick(tick_delta)
+        phase_start = time.perf_counter()
+        self.publish_snapshot()
+        if broadcast:
+            recipients = self.recipients()
+            if recipients:
+                self.broadcast_snapshot(recipients)
+            spectator_feed.publish(self)
+        phase_start = tick_metrics.record('broadcast', phase_start)
+        self.flush_outputs()
+        tick_metrics.record('flush', phase_start)
+        if self.recorder is not None:
+            self.record_tick()
+
+    def record_tick(self):
+        if self.recorder.tick(self.item_requests):
+            # Checksum berkala agar pemutar replay bisa mendeteksi simulasi yang menyimpang.
+            self.recorder.check(state_checksum(self.game_state))
+        self.recorder.flush()
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def players_near(self, pos, radius):
+        return self.engine.players_near(self.game_state, pos, radius)
+
+    def tick(self, tick_delta):
+        # Aturan main ada di simulation.step; room hanya memberi input dan mencatat kejadian.
+        broadcast, events = step(self.game_state, self.tick_inputs, tick_delta, self.rng, self.engine, tick_metrics)
+        players = self.game_state['players']
+        for event in events:
+            if event[0] == 'start':
+                print(f"[Game][Room {self.room_id}] Game dimulai! {players[event[1]]['username']} adalah 'It'.")
+            elif event[0] == 'tag':
+                print(f"[Game][Room {self.room_id}] TAG! {players[event[1]]['username']} menyentuh {players[event[2]]['username']}.")
+            elif event[0] == 'finish':
+                print(f"[Game][Room {self.room_id}] Game Selesai! Pemenangnya adalah {event[1]}")
+            elif event[0] == 'reset':
+                print(f"[Game][Room {self.room_id}] Game direset, kembali ke lobi.")
+        return broadcast
+
+
+class VectorRoom(Room):
+    engine_class = NumpyEngine
+
+
+class RingConnection:
+    # Di proses worker, 'koneksi' pemain hanya mencatat payload untuk batch ring room-nya.
+    def __init__(self, outgoing, player_id):
+        self.outgoing = outgoing
+        self.player_id = player_id
+
+    def send_snapshot(self, payload, ack):
+        self.outgoing.append((self.player_id, payload, ack))
+
+
+class WorkerRoom(Room):
+    # Room di proses worker: input dibaca dari tabel bersama, dan semua keluaran satu tick ditulis
+    # ke ring sebagai satu batch yang lalu dikirim ke klien oleh proses I/O.
+    def __init__(self, room_id, ring, table):
+        super().__init__(room_id)
+        self.ring = ring
+        self.table = table
+        self.outgoing = []
+
+    def open_player(self, player_id, row):
+        self.clients[player_id] = RingConnection(self.outgoing, player_id)
+        # Slot input: [baris tabel, versi, use_count, keyframe_count] yang terakhir diterapkan.
+        self.commands.append(('join', player_id, [row, 0, 0, 0]))
+
+    def name_player(self, player_id, username, avatar_hash, codec_id, radius):
+        self.client_codecs[player_id] = CODECS[codec_id]
+        if radius:
+            self.client_radii[player_id] = radius
+        self.commands.append(('name', player_id, username, avatar_hash))
+
+    def close_player(self, player_id):
+        self.clients.pop(player_id, None)
+        self.client_codecs.pop(player_id, None)
+        self.client_radii.pop(player_id, None)
+        self.commands.append(('leave', player_id))
+
+    def drain_inputs(self):
+        for player_id, slot in self.input_queues.items():
+            fields = self.table.read(slot[0])
+            if fields is None or fields[0] == slot[1]:
+                continue
+            version, move_x, move_y, seq, ack, uses, keyframes = fields
+            inputs = {'type': 'input', 'move_x': move_x, 'move_y': move_y, 'use_item': uses != slot[2],
+                      'keyframe': keyframes != slot[3], 'ack': ack or None, 'seq': seq}
+            slot[1:] = version, uses, keyframes
+            self.apply_input(player_id, inputs)
+            if ack:
+                self.client_acks[player_id] = ack
+            if inputs['keyframe']:
+                self.keyframe_requests.add(player_id)
+
+    def send_snapshot(self, conn, codec, addr, payload, ack):
+        # Ack dipasang proses I/O saat membagikan batch, jadi payload bersama tetap ditulis sekali ke ring.
+        conn.send_snapshot(payload, ack)
+
+    def flush_outputs(self):
+        # Payload yang sama untuk banyak pemain ditulis ke ring sekali saja.
+        indexes = {}
+        payloads = []
+        sends = []
+        for player_id, payload, ack in self.outgoing:
+            index = indexes.get(id(payload))
+            if index is None:
+                index = indexes[id(payload)] = len(payloads)
+                payloads.append(payload)
+            sends.append((player_id, index, ack))
+        self.outgoing.clear()
+        self.ring.write(RECORD_ROOM, self.room_id, pack_room_batch(self.snapshot['game_started'], payloads, sends))
+
+
+class RoomManager:
+    def __init__(self, max_rooms=MAX_ROOMS, room_class=Room):
+        self.max_rooms = max_rooms
+        self.room_class = room_class
+        self.rooms = {}
+        self.room_ids = itertools.count()
+        self.lock = threading.Lock()
+
+    def assign(self, conn):
+        with self.lock:
+            open_rooms = [room for room in self.rooms.values() if room.has_free_slot()]
+            if open_rooms:
+                # Isi lobi yang paling hampir penuh dulu supaya match cepat dimulai.
+                room = min(open_rooms, key=lambda r: (r.snapshot['game_started'], -len(r.clients), r.room_id))
+            elif len(self.rooms) < self.max_rooms:
+                room = self.room_class(next(self.room_ids))
+                self.rooms[room.room_id] = room
+                print(f"[Server] Room {room.room_id} dibuat ({len(self.rooms)} room aktif).")
+            else:
+                return None, None
+            return room, room.register_player(conn)
+
+    def reap(self):
+        with self.lock:
+            for room_id, room in list(self.rooms.items()):
+                if not room.clients:
+                    del self.rooms[room_id]
+                    room.close()
+                    spectator_feed.close_room(room_id)
+                    print(f"[Server] Room {room_id} ditutup ({len(self.rooms)} room aktif).")
+            return list(self.rooms.values())
+
+    def tick_all(self, tick_delta):
+        tick_rooms(self.reap(), tick_delta)
+        spectator_feed.flush()
+
+
+def tick_rooms(rooms, tick_delta):
+    for room in rooms:
+        try:
+            room.run_tick(tick_delta)
+        except Exception:
+            print(f"!!--- ERROR FATAL DI GAME LOOP SERVER (Room {room.room_id}) ---!!")
+            traceback.print_exc()
+            print(f"!!---------------------------------------!!")
+
+
+class SpectatorFeed:
+    # Aliran snapshot semua room untuk proses relay penonton (relay.py). Tiap tick, setiap room
+    # dienkode sekali per codec sebagai delta dari tick sebelumnya; relay yang baru berlangganan
+    # mendapat keyframe dulu. Kerja tick bergantung pada jumlah relay, bukan jumlah penonton.
+    def __init__(self):
+        self.subscribers = {}
+        self.published = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, conn, codec):
+        with self.lock:
+            self.subscribers[conn] = (codec, set())
+
+    def unsubscribe(self, conn):
+        with self.lock:
+            self.subscribers.pop(conn, None)
+
+    def targets(self):
+        with self.lock:
+            return list(self.subscribers.items())
+
+    def publish(self, room):
+        subscribers = self.targets()
+        if not subscribers:
+            self.published.pop(room.room_id, None)
+            return
+        previous = self.published.get(room.room_id)
+        seq = previous[0] + 1 if previous else 1
+        snapshot = room.snapshot
+        self.published[room.room_id] = (seq, snapshot)
+        payloads = {}
+        for conn, (codec, synced) in subscribers:
+            if conn.backlog() > FEED_BACKLOG_LIMIT:
+                print("[Relay] Relay terlalu lambat, langganan diputus.")
+                self.unsubscribe(conn)
+                conn.abort()
+                continue
+            keyframe = room.room_id not in synced
+            key = (keyframe, codec.codec_id)
+            if key not in payloads:
+                if keyframe:
+                    message = {'type': 'room_update', 'room': room.room_id, 'seq': seq, 'state': snapshot}
+                else:
+                    message = {'type': 'room_delta', 'room': room.room_id, 'seq': seq, 'base': previous[0],
+                               **diff_snapshots(previous[1], snapshot)}
+                payloads[key] = codec.encode(message)
+            synced.add(room.room_id)
+            conn.send(payloads[key])
+
+    def close_room(self, room_id):
+        self.published.pop(room_id, None)
+        for conn, (codec, synced) in self.targets():
+            if room_id in synced:
+                synced.discard(room_id)
+                send_to_client(conn, {'type': 'room_closed', 'room': room_id}, codec)
+
+    def flush(self):
+        cache = {}
+        for conn, _ in self.targets():
+            conn.flush(cache)
+
+
+class UdpEndpoint:
+    def __init__(self, sendto):
+        self.sendto = sendto
+        self.tokens = {}
+        self.addrs = {}
+        self.lock = threading.Lock()
+
+    def offer(self, room, player_id):
+        with self.lock:
+            token = random.getrandbits(32)
+            while token in self.tokens:
+                token = random.getrandbits(32)
+            self.tokens[token] = (room, player_id)
+        return token
+
+    def forget(self, room, player_id):
+        with self.lock:
+            for table in (self.tokens, self.addrs):
+                for key, entry in list(table.items()):
+                    if entry == (room, player_id):
+                        del table[key]
+
+    def handle_datagram(self, data, addr):
+        token = unpack_udp_hello(data)
+        if token is not None:
+            with self.lock:
+                entry = self.tokens.get(token)
+                if entry is None:
+                    return
+                self.addrs[addr] = entry
+            room, player_id = entry
+            with timed_lock(room.lock):
+                room.udp_candidates[player_id] = addr
+            self.sendto(pack_udp_hello(token), addr)
+            return
+
+        entry = self.addrs.get(addr)
+        if entry is None:
+            return
+        room, player_id = entry
+        codec = room.client_codecs.get(player_id)
+        if codec is None:
+            return
+        try:
+            inputs = codec.decode(data)
+        except ProtocolError:
+            return
+        if inputs.get('type') == 'input':
+            room.store_inputs(player_id, inputs)
+
+
+class UdpProtocol(asyncio.DatagramProtocol):
+    def datagram_received(self, data, addr):
+        udp_endpoint.handle_datagram(data, addr)
+
+
+class RoomProxy(RoomMembers):
+    # Wakil di proses I/O untuk room yang disimulasikan proses worker. Join/nama/leave diteruskan
+    # lewat antrean perintah worker, input ditulis ke tabel bersama, dan batch snapshot yang sudah
+    # dienkode worker dibagikan ke koneksi pemain oleh deliver().
+    def __init__(self, room_id, worker):
+        super().__init__(room_id)
+        self.worker = worker
+        self.snapshot = {'game_started': False}
+        worker.open_room(self)
+
+    def open_slot(self, player_id):
+        self.input_slots[player_id] = self.worker.open_player(self.room_id, player_id)
+
+    def post_name(self, player_id, player_info):
+        self.worker.commands.put(('name', self.room_id, player_id, player_info['username'], player_info['avatar_hash'],
+                                  self.client_codecs[player_id].codec_id, self.client_radii.get(player_id)))
+
+    def close_slot(self, player_id):
+        row = self.input_slots.pop(player_id, None)
+        if row is not None:
+            self.worker.close_player(self.room_id, player_id, row)
+
+    def store_inputs(self, player_id, inputs):
+        phase_start = time.perf_counter()
+        row = self.input_slots.get(player_id)
+        if row is not None:
+            self.worker.write_input(row, inputs)
+        tick_metrics.record('input_enqueue', phase_start)
 
-        with lock:
-            static_player_data[player_id] = player_info
-            game_state['players'][player_id]['username'] = player_info['username']
+    def deliver(self, game_started, payloads, sends):
+        self.snapshot = {'game_started': game_started}
+        with self.lock:
+            clients = dict(self.clients)
+            codecs = dict(self.client_codecs)
+            udp_clients = dict(self.udp_clients)
+        for player_id, index, ack in sends:
+            conn = clients.get(player_id)
+            if conn is None or player_id not in codecs:
+                continue
+            payload = codecs[player_id].with_input_ack(payloads[index], ack)
+            addr = udp_clients.get(player_id)
+            if addr is not None and len(payload) <= UDP_MAX_PAYLOAD:
+                udp_endpoint.sendto(payload, addr)
+            else:
+                conn.send(payload, droppable=True)
+        phase_start = time.perf_counter()
+        self.flush_outputs()
+        tick_metrics.record('flush', phase_start)
 
-        print(f"[Koneksi] Pemain {player_id} ({player_info['username']}) berhasil bergabung.")
+    def close(self):
+        self.worker.close_room(self.room_id)
 
-        broadcast({'type': 'new_player', 'id': player_id, 'data': player_info})
 
+class RoomWorker:
+    # Satu proses simulasi beserta salurannya: antrean perintah untuk join/leave yang jarang, tabel
+    # input dan ring keluaran di shared memory untuk data tiap tick, dan pipa 'wake' yang hanya
+    # memberi tahu proses I/O bahwa ring berisi batch baru. Tidak ada snapshot yang di-pickle.
+    def __init__(self, index, context, options):
+        self.index = index
+        self.alive = True
+        self.ring = SharedRing()
+        self.table = InputTable(rows=MAX_ROOMS * MAX_PLAYERS)
+        self.commands = context.Queue()
+        self.wake, wake_writer = context.Pipe(duplex=False)
+        # Baris yang dilepas dipakai ulang paling akhir, jauh setelah worker memproses leave-nya.
+        self.free_rows = collections.deque(range(self.table.rows))
+        self.input_lock = threading.Lock()
+        self.rooms = {}
+        self.process = context.Process(target=worker_main, name=f"room-worker-{index}", daemon=True,
+                                       args=(index, self.commands, wake_writer, self.ring.name, self.table.name,
+                                             options))
+        self.process.start()
+        wake_writer.close()
+
+    def open_room(self, room):
+        self.rooms[room.room_id] = room
+        self.commands.put(('open', room.room_id))
+
+    def close_room(self, room_id):
+        self.rooms.pop(room_id, None)
+        self.commands.put(('close', room_id))
+
+    def open_player(self, room_id, player_id):
+        with self.input_lock:
+            row = self.free_rows.popleft()
+            self.table.reset(row)
+        self.commands.put(('join', room_id, player_id, row))
+        return row
+
+    def close_player(self, room_id, player_id, row):
+        self.commands.put(('leave', room_id, player_id))
+        with self.input_lock:
+            self.free_rows.append(row)
+
+    def write_input(self, row, inputs):
+        # Baris satu pemain bisa ditulis thread TCP dan UDP-nya bersamaan.
+        with self.input_lock:
+            self.table.write(row, inputs)
+
+    def deliver(self):
+        # Mengembalikan False bila proses worker sudah berhenti.
+        try:
+            while self.wake.poll():
+                self.wake.recv_bytes()
+        except (EOFError, OSError):
+            return False
+        self.ring.consume(self.deliver_room)
+        return True
+
+    def deliver_room(self, kind, room_id, view):
+        room = self.rooms.get(room_id)
+        if kind == RECORD_ROOM and room is not None:
+            room.deliver(*unpack_room_batch(view))
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join(1)
+        self.ring.close(unlink=True)
+        self.table.close(unlink=True)
+
+
+class WorkerPool:
+    # Room baru dibagi ke worker dengan room paling sedikit; proses ini hanya menerima koneksi,
+    # membaca input, dan mengirim keluaran worker ke klien.
+    def __init__(self, count, options):
+        context = multiprocessing.get_context('spawn')
+        self.workers = [RoomWorker(index, context, options) for index in range(count)]
+        self.loop = None
+        self.last_report = time.monotonic(), time.process_time()
+
+    def create_room(self, room_id):
+        worker = min(self.workers, key=lambda w: (not w.alive, len(w.rooms), w.index))
+        return RoomProxy(room_id, worker)
+
+    def deliver(self, workers):
+        tick_start = time.perf_counter()
+        for worker in workers:
+            if worker.alive and not worker.deliver():
+                worker.alive = False
+                if self.loop is not None:
+                    self.loop.remove_reader(worker.wake.fileno())
+                print(f"[Server] Worker {worker.index} berhenti; room-nya tidak lagi disimulasikan.")
+        manager.reap()
+        tick_metrics.record_tick(tick_start)
+        self.last_report = log_stats(self.last_report)
+
+    def run(self):
+        # Mode threaded: satu thread menunggu pipa wake semua worker.
         while True:
-            inputs = receive_from_client(conn)
+            wakes = {worker.wake: worker for worker in self.workers if worker.alive}
+            ready = multiprocessing.connection.wait(list(wakes), 1 / SERVER_TICK_RATE)
+            self.deliver([wakes[wake] for wake in ready])
+
+    def attach(self, loop):
+        # Mode async: pipa wake didaftarkan ke event loop, keluaran dibagikan dari thread loop.
+        self.loop = loop
+        for worker in self.workers:
+            loop.add_reader(worker.wake.fileno(), self.deliver, [worker])
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+manager = RoomManager()
+spectator_feed = SpectatorFeed()
+tick_metrics = TickMetrics(1 / SERVER_TICK_RATE)
+avatar_store = BlobStore(AVATAR_STORE_BYTES)
+udp_endpoint = None
+udp_shim = None
+replay_dir = None
+interest_radius = None
+compress_level = DEFAULT_COMPRESS_LEVEL
+spectator_port = None
+worker_pool = None
+
+
+def handle_control_message(room, player_id, message):
+    msg_type = message.get('type')
+    if msg_type == 'udp_mode':
+        room.set_udp_mode(player_id, message.get('enabled'))
+    elif msg_type == 'avatar_request':
+        room.send_avatars(player_id, message.get('hashes', ()))
+    elif msg_type == 'avatar_blob':
+        room.receive_avatar(player_id, message)
+    elif msg_type == 'ping':
+        room.pong(player_id, message)
+    else:
+        room.store_inputs(player_id, message)
+
+
+def make_udp_endpoint(sendto, schedule=None):
+    if udp_shim is not None:
+        loss, latency, jitter = udp_shim
+        sendto = LossShim(sendto, loss, latency, jitter, schedule).sendto
+    return UdpEndpoint(sendto)
+
+
+def udp_listener(sock):
+    while True:
+        try:
+            data, addr = sock.recvfrom(UDP_MAX_DATAGRAM)
+        except OSError:
+            continue
+        udp_endpoint.handle_datagram(data, addr)
+
+
+def handle_client(conn, room, player_id):
+    print(f"[Koneksi][Room {room.room_id}] Pemain {player_id} mencoba terhubung...")
+
+    try:
+        try:
+            codec, conn.output.level = server_handshake(conn.sock, SERVER_CODECS, compress_level)
+        except ProtocolError as e:
+            raise ConnectionAbortedError(f"Negosiasi protokol gagal: {e}")
+        room.greet_player(conn, player_id, codec)
+        framed = FramedSocket(conn.sock, MAX_FRAME_BYTES)
+        room.join_player(player_id, receive_from_client(framed, codec))
+
+        while True:
+            inputs = receive_from_client(framed, codec)
             if inputs is None:
                 break  
-            with lock:
-                player_inputs[player_id] = inputs
+            handle_control_message(room, player_id, inputs)
+
+    except (ConnectionAbortedError, ConnectionResetError) as e:
+        print(f"[Error] Koneksi dengan pemain {player_id} ditutup: {e}")
+    finally:
+        room.remove_player(player_id)
+        conn.close()
+        print(f"[Stats] keluaran room {room.room_id} pemain {player_id}: {conn.output.summary()}")
+
+
+def expect_spectate(message):
+    if message is None or message.get('type') != 'spectate':
+        raise ConnectionAbortedError("Port feed hanya untuk relay penonton.")
+
+
+def handle_relay(conn, addr):
+    try:
+        try:
+            codec, conn.output.level = server_handshake(conn.sock, SERVER_CODECS, compress_level)
+        except ProtocolError as e:
+            raise ConnectionAbortedError(f"Negosiasi protokol gagal: {e}")
+        framed = FramedSocket(conn.sock, MAX_FRAME_BYTES)
+        expect_spectate(receive_from_client(framed, codec))
+        print(f"[Relay] Relay {addr} berlangganan snapshot semua room.")
+        spectator_feed.subscribe(conn, codec)
+        while receive_from_client(framed, codec) is not None:
+            pass
+    except (ConnectionAbortedError, ConnectionResetError) as e:
+        print(f"[Relay] Koneksi relay {addr} ditutup: {e}")
+    finally:
+        spectator_feed.unsubscribe(conn)
+        conn.close()
+        print(f"[Relay] Relay {addr} berhenti berlangganan.")
+
+
+def feed_listener(sock):
+    while True:
+        relay_sock, addr = sock.accept()
+        threading.Thread(target=handle_relay, args=(ThreadedConnection(relay_sock), addr), daemon=True).start()
+
+
+class AsyncConnection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.backlog_since = None
+        self.output = FrameBatcher()
+
+    def send(self, payload, droppable=False):
+        if not self.writer.transport.is_closing():
+            self.output.add(payload, droppable)
+
+    def flush(self, cache=None):
+        frame, droppable = self.output.take(cache)
+        if frame is not None:
+            self.send_frame(frame, droppable)
+
+    def send_frame(self, frame, droppable=False):
+        transport = self.writer.transport
+        if transport.is_closing():
+            return
+        if droppable and transport.get_write_buffer_size() > OUTBOUND_BUFFER_LIMIT:
+            # Buffer transport adalah antrean keluar klien; snapshot dilewati sampai terkuras.
+            if self.backlog_since is None:
+                self.backlog_since = time.monotonic()
+            elif time.monotonic() - self.backlog_since > SLOW_CLIENT_TIMEOUT:
+                print(f"[Server] Klien {self.writer.get_extra_info('peername')} terlalu lambat, koneksi diputus.")
+                transport.abort()
+            return
+        if droppable:
+            self.backlog_since = None
+        send_start = time.thread_time()
+        self.writer.write(frame)
+        self.output.record_send(time.thread_time() - send_start)
+
+    def backlog(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def abort(self):
+        self.writer.transport.abort()
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+async def receive_from_client_async(framed, codec):
+    try:
+        return codec.decode(await framed.read_frame())
+    except (ValueError, ConnectionResetError, asyncio.IncompleteReadError):
+        return None
+
+
+async def handle_client_async(reader, writer):
+    conn = AsyncConnection(writer)
+    room, player_id = manager.assign(conn)
+    if room is None:
+        print(f"[Server] Menolak koneksi dari {writer.get_extra_info('peername')}, server penuh.")
+        try:
+            codec, _ = await server_handshake_async(reader, writer, SERVER_CODECS)
+            send_to_client(conn, {'type': 'error', 'message': 'Server penuh'}, codec)
+            conn.flush()
+            await writer.drain()
+        except (ProtocolError, OSError):
+            pass
+        finally:
+            conn.close()
+        return
+
+    print(f"[Koneksi][Room {room.room_id}] Pemain {player_id} mencoba terhubung...")
+
+    try:
+        try:
+            codec, conn.output.level = await server_handshake_async(reader, writer, SERVER_CODECS, compress_level)
+        except ProtocolError as e:
+            raise ConnectionAbortedError(f"Negosiasi protokol gagal: {e}")
+        room.greet_player(conn, player_id, codec)
+        framed = AsyncFramedReader(reader, MAX_FRAME_BYTES)
+        room.join_player(player_id, await receive_from_client_async(framed, codec))
+
+        while True:
+            inputs = await receive_from_client_async(framed, codec)
+            if inputs is None:
+                break
+            handle_control_message(room, player_id, inputs)
 
     except (ConnectionAbortedError, ConnectionResetError) as e:
         print(f"[Error] Koneksi dengan pemain {player_id} ditutup: {e}")
     finally:
-        print(f"[Koneksi] Pemain {player_id} terputus.")
-        with lock:
-            if player_id in game_state['players']:
-                is_it_player = game_state['players'][player_id].get('is_it', False)
-                del game_state['players'][player_id]
-                if is_it_player and game_state['players']:
-                    remaining = list(game_state['players'].keys())
-                    if remaining:
-                        new_it_id = random.choice(remaining)
-                        game_state['players'][new_it_id]['is_it'] = True
-                        print(f"[Game] {game_state['players'][new_it_id]['username']} sekarang 'It'.")
-
-            if player_id in player_inputs: del player_inputs[player_id]
-            if player_id in clients: del clients[player_id]
-            if player_id in static_player_data: del static_player_data[player_id]
-
-        broadcast({'type': 'player_left', 'id': player_id})
+        room.remove_player(player_id)
+        conn.close()
+        print(f"[Stats] keluaran room {room.room_id} pemain {player_id}: {conn.output.summary()}")
+
+
+async def handle_relay_async(reader, writer):
+    conn = AsyncConnection(writer)
+    addr = writer.get_extra_info('peername')
+    try:
+        try:
+            codec, conn.output.level = await server_handshake_async(reader, writer, SERVER_CODECS, compress_level)
+        except ProtocolError as e:
+            raise ConnectionAbortedError(f"Negosiasi protokol gagal: {e}")
+        framed = AsyncFramedReader(reader, MAX_FRAME_BYTES)
+        expect_spectate(await receive_from_client_async(framed, codec))
+        print(f"[Relay] Relay {addr} berlangganan snapshot semua room.")
+        spectator_feed.subscribe(conn, codec)
+        while await receive_from_client_async(framed, codec) is not None:
+            pass
+    except (ConnectionAbortedError, ConnectionResetError) as e:
+        print(f"[Relay] Koneksi relay {addr} ditutup: {e}")
+    finally:
+        spectator_feed.unsubscribe(conn)
         conn.close()
+        print(f"[Relay] Relay {addr} berhenti berlangganan.")
 
 
-def reset_game():
-    global game_start_time, last_item_spawn_time, last_score_update_time
-    game_state['game_started'] = False
-    game_state['items'] = []
-    game_state['winner'] = None
-    game_state['game_time'] = GAME_DURATION
+def run_due_ticks(scheduler):
+    for _ in range(scheduler.due_steps()):
+        tick_start = time.perf_counter()
+        manager.tick_all(scheduler.step)
+        tick_metrics.record_tick(tick_start)
 
-    for pid, player in game_state['players'].items():
-        player['pos'] = [random.randint(50, 750), random.randint(50, 550)]
-        player['is_it'] = False
-        player['inventory'] = None
-        player['speed'] = PLAYER_SPEED
-        player['effect_timer'] = 0
-        player['stunned'] = False
-        player['score'] = 0
-        player['immunity_timer'] = 0 
 
-    game_start_time = 0
-    last_item_spawn_time = time.time()
-    last_score_update_time = time.time()
-    print("[Game] Game direset, kembali ke lobi.")
+def log_stats(last_report, skipped_steps=0):
+    now = time.monotonic()
+    if STATS_INTERVAL <= 0 or now - last_report[0] < STATS_INTERVAL:
+        return last_report
+    cpu_time = time.process_time()
+    cpu_percent = (cpu_time - last_report[1]) / (now - last_report[0]) * 100
+    print(tick_metrics.report(skipped_steps, cpu_percent), flush=True)
+    tick_metrics.reset()
+    return now, cpu_time
 
 
 def game_logic_loop():
-    global game_state, last_item_spawn_time, last_score_update_time, game_start_time
+    scheduler = FixedStepScheduler(SERVER_TICK_RATE, MAX_CATCHUP_STEPS)
+    last_report = time.monotonic(), time.process_time()
+    while True:
+        run_due_ticks(scheduler)
+        last_report = log_stats(last_report, scheduler.skipped_steps)
+        time.sleep(scheduler.sleep_time())
+
 
+async def game_logic_loop_async():
+    scheduler = FixedStepScheduler(SERVER_TICK_RATE, MAX_CATCHUP_STEPS, asyncio.get_running_loop().time)
+    last_report = time.monotonic(), time.process_time()
+    while True:
+        run_due_ticks(scheduler)
+        last_report = log_stats(last_report, scheduler.skipped_steps)
+        await asyncio.sleep(scheduler.sleep_time())
+
+
+def apply_worker_commands(commands, rooms, ring, table):
+    # Perintah dari proses I/O diterapkan di awal tick, berurutan seperti datangnya.
     while True:
         try:
-            start_time = time.time()
-            tick_delta = 1 / SERVER_TICK_RATE
-
-            with lock:
-                if game_state.get('game_over_timer', 0) > 0:
-                    game_state['game_over_timer'] -= tick_delta
-                    if game_state['game_over_timer'] <= 0:
-                        reset_game()
-                        continue
-
-                if not game_state['game_started'] and len(game_state['players']) == MAX_PLAYERS and not game_state.get('winner'):
-                    game_state['game_started'] = True
-                    game_start_time = time.time()
-                    last_score_update_time = game_start_time
-                    it_player_id = random.choice(list(game_state['players'].keys()))
-                    game_state['players'][it_player_id]['is_it'] = True
-                    game_state['players'][it_player_id]['immunity_timer'] = TAG_IMMUNITY_DURATION
-                    print(f"[Game] Game dimulai! {game_state['players'][it_player_id]['username']} adalah 'It'.")
-
-                if game_state['game_started']:
-                    elapsed_time = time.time() - game_start_time
-                    game_state['game_time'] = max(0, GAME_DURATION - elapsed_time)
-
-                    if game_state['game_time'] <= 0:
-                        game_state['game_started'] = False
-                        winner = None
-                        highest_score = -1
-                        for pdata in game_state['players'].values():
-                            if not pdata.get('is_it', False) and pdata['score'] > highest_score:
-                                highest_score = pdata['score']
-                                winner = pdata['username']
-                        if not winner:
-                            sorted_players = sorted(game_state['players'].values(), key=lambda p: p['score'], reverse=True)
-                            if sorted_players:
-                                winner = sorted_players[0]['username']
-                        game_state['winner'] = winner
-                        game_state['game_over_timer'] = 10
-                        print(f"[Game] Game Selesai! Pemenangnya adalah {winner}")
-                        continue
-
-                    if time.time() - last_score_update_time > 1:
-                        for pid, player in game_state['players'].items():
-                            if not player.get('is_it', False):
-                                player['score'] += 1
-                        last_score_update_time = time.time()
-
-                    it_player_data = None
-                    it_player_id = None
-
-                    players_copy = list(game_state['players'].items())
-                    for pid, player in players_copy:
-                        if pid not in game_state['players']: continue
-
-                        if player.get('is_it', False):
-                            it_player_data = player
-                            it_player_id = pid
-
-                        if player['effect_timer'] > 0:
-                            player['effect_timer'] -= tick_delta
-                        else:
-                            player['speed'] = PLAYER_SPEED
-                            player['stunned'] = False
-
-                        if player['immunity_timer'] > 0:
-                            player['immunity_timer'] -= tick_delta
-
-                        if player['stunned']: continue
-
-                        inputs = player_inputs.get(pid, {})
-                        move_x, move_y = inputs.get('move_x', 0), inputs.get('move_y', 0)
-
-                        player['pos'][0] += move_x * player['speed']
-                        player['pos'][1] += move_y * player['speed']
-                        player['pos'][0] = max(PLAYER_RADIUS, min(player['pos'][0], ARENA_WIDTH - PLAYER_RADIUS))
-                        player['pos'][1] = max(PLAYER_RADIUS, min(player['pos'][1], ARENA_HEIGHT - PLAYER_RADIUS))
-
-                        if inputs.get('use_item') and player['inventory']:
-                            item_type = player['inventory']
-                            player['inventory'] = None
-
-                            if item_type == 'speed_boost':
-                                player['speed'] = PLAYER_SPEED * 1.8
-                                player['effect_timer'] = ITEM_EFFECT_DURATION['speed_boost']
-                            elif item_type == 'banana_trap':
-                                game_state['items'].append({
-                                    'type': 'banana_peel', 'pos': list(player['pos']),
-                                    'id': time.time(), 'spawn_time': time.time()
-                                })
-
-                    if it_player_data and it_player_id in game_state['players'] and not it_player_data.get('stunned', False):
-                        for pid_other, pdata_other in game_state['players'].items():
-                            if pid_other != it_player_id and pdata_other.get('immunity_timer', 0) <= 0:
-                                if distance(it_player_data['pos'], pdata_other['pos']) < PLAYER_RADIUS * 2:
-                                    print(f"[Game] TAG! {it_player_data['username']} menyentuh {pdata_other['username']}.")
-                                    game_state['players'][it_player_id]['is_it'] = False
-                                    game_state['players'][pid_other]['is_it'] = True
-
-                                    game_state['players'][it_player_id]['immunity_timer'] = TAG_IMMUNITY_DURATION
-                                    game_state['players'][pid_other]['immunity_timer'] = TAG_IMMUNITY_DURATION
-
-                                    game_state['players'][it_player_id]['score'] += 5
-                                    break
-
-                    items_to_remove = []
-                    for item in list(game_state['items']):
-                        for pid, pdata in list(game_state['players'].items()):
-                            if distance(pdata['pos'], item['pos']) < PLAYER_RADIUS + ITEM_RADIUS:
-                                if item['type'] in ITEM_TYPES and not pdata['inventory']:
-                                    pdata['inventory'] = item['type']
-                                    items_to_remove.append(item)
-                                    break
-                                elif item['type'] == 'banana_peel' and time.time() - item.get('spawn_time', 0) > BANANA_ARM_TIME:
-                                    if not pdata.get('is_it', False):
-                                        pdata['stunned'] = True
-                                        pdata['effect_timer'] = ITEM_EFFECT_DURATION['stun']
-                                        items_to_remove.append(item)
-                                        break
-
-                    game_state['items'] = [item for item in game_state['items'] if item not in items_to_remove]
-
-                    if time.time() - last_item_spawn_time > ITEM_SPAWN_INTERVAL and len(game_state['items']) < MAX_ITEMS:
-                        item_type = random.choice(ITEM_TYPES)
-                        pos = [random.randint(ITEM_RADIUS, ARENA_WIDTH - ITEM_RADIUS), random.randint(ITEM_RADIUS, ARENA_HEIGHT - ITEM_RADIUS)]
-                        game_state['items'].append({'type': item_type, 'pos': pos, 'id': time.time()})
-                        last_item_spawn_time = time.time()
-            
-            if clients:
-                broadcast({'type': 'game_update', 'state': game_state})
-
-
-            elapsed_time = time.time() - start_time
-            sleep_time = (1 / SERVER_TICK_RATE) - elapsed_time
-            if sleep_time > 0: time.sleep(sleep_time)
+            command = commands.get_nowait()
+        except queue.Empty:
+            return
+        kind, room_id = command[0], command[1]
+        if kind == 'open':
+            rooms[room_id] = WorkerRoom(room_id, ring, table)
+            continue
+        room = rooms.get(room_id)
+        if room is None:
+            continue
+        if kind == 'join':
+            room.open_player(*command[2:])
+        elif kind == 'name':
+            room.name_player(*command[2:])
+        elif kind == 'leave':
+            room.close_player(command[2])
+        elif kind == 'close':
+            del rooms[room_id]
+            room.close()
 
-        except Exception:
-            print(f"!!--- ERROR FATAL DI GAME LOOP SERVER ---!!")
-            traceback.print_exc()
-            print(f"!!---------------------------------------!!")
 
+def worker_main(index, commands, wake, ring_name, table_name, options):
+    global replay_dir, STATS_INTERVAL
+    # Proses hasil spawn tidak mewarisi '-u'; log worker tetap harus keluar per baris.
+    sys.stdout.reconfigure(line_buffering=True)
+    replay_dir, STATS_INTERVAL, engine = options
+    if engine == 'numpy':
+        WorkerRoom.engine_class = NumpyEngine
+    ring = SharedRing(ring_name)
+    table = InputTable(table_name)
+    rooms = {}
+    parent = multiprocessing.parent_process()
+    scheduler = FixedStepScheduler(SERVER_TICK_RATE, MAX_CATCHUP_STEPS)
+    last_report = time.monotonic(), time.process_time()
+    print(f"[Worker {index}] Proses simulasi berjalan (pid {os.getpid()}).")
+    try:
+        # Worker ikut berhenti bila proses I/O mati tanpa sempat menghentikannya.
+        while parent.is_alive():
+            steps = scheduler.due_steps()
+            for _ in range(steps):
+                tick_start = time.perf_counter()
+                apply_worker_commands(commands, rooms, ring, table)
+                tick_rooms(list(rooms.values()), scheduler.step)
+                tick_metrics.record_tick(tick_start)
+            if steps:
+                wake.send_bytes(b'\x01')
+            report = log_stats(last_report, scheduler.skipped_steps)
+            if report is not last_report and ring.dropped:
+                print(f"[Worker {index}] Ring keluaran penuh, total {ring.dropped} batch room dibuang.")
+            last_report = report
+            time.sleep(scheduler.sleep_time())
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        for room in rooms.values():
+            room.close()
+        ring.close()
+        table.close()
 
-def main():
+
+def reject_client(conn, addr, message):
+    try:
+        codec, _ = server_handshake(conn, SERVER_CODECS)
+        conn.sendall(encode_frame({'type': 'error', 'message': message}, codec))
+    except (ProtocolError, OSError):
+        pass
+    finally:
+        conn.close()
+
+
+def main(use_udp=False):
+    global udp_endpoint
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     server.bind((HOST, PORT))
-    server.listen(MAX_PLAYERS)
-    print(f"[Server] Server berjalan di {HOST}:{PORT}, menunggu {MAX_PLAYERS} pemain...")
+    server.listen(LISTEN_BACKLOG)
+    print(f"[Server] Server berjalan di {HOST}:{PORT}, maks {MAX_ROOMS} room x {MAX_PLAYERS} pemain...")
 
-    logic_thread = threading.Thread(target=game_logic_loop, daemon=True)
-    logic_thread.start()
+    if use_udp:
+        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_sock.bind((HOST, PORT))
+        udp_endpoint = make_udp_endpoint(udp_sock.sendto)
+        threading.Thread(target=udp_listener, args=(udp_sock,), daemon=True).start()
+        print(f"[Server] Kanal snapshot UDP aktif di port {PORT}.")
+
+    if spectator_port:
+        feed_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        feed_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        feed_sock.bind((HOST, spectator_port))
+        feed_sock.listen()
+        threading.Thread(target=feed_listener, args=(feed_sock,), daemon=True).start()
+        print(f"[Server] Feed penonton untuk relay di port {spectator_port}.")
+
+    if worker_pool is not None:
+        threading.Thread(target=worker_pool.run, daemon=True).start()
+        print(f"[Server] Simulasi room di {len(worker_pool.workers)} proses worker.")
+    else:
+        logic_thread = threading.Thread(target=game_logic_loop, daemon=True)
+        logic_thread.start()
 
-    player_id_counter = 0
     while True:
-        conn, addr = server.accept()
+        sock, addr = server.accept()
 
-        if len(clients) >= MAX_PLAYERS:
+        conn = ThreadedConnection(sock)
+        room, player_id = manager.assign(conn)
+        if room is None:
             print(f"[Server] Menolak koneksi dari {addr}, server penuh.")
-            try:
-                send_to_client(conn, {'type': 'error', 'message': 'Server penuh'})
-            except:
-                pass
-            conn.close()
+            conn.abort()
+            threading.Thread(target=reject_client, args=(sock, addr, 'Server penuh'), daemon=True).start()
             continue
 
-        with lock:
-            clients[player_id_counter] = conn
-            start_pos = [random.randint(50, 750), random.randint(50, 550)]
-            game_state['players'][player_id_counter] = {
-                'pos': start_pos, 'username': '...',
-                'is_it': False, 'inventory': None, 'speed': PLAYER_SPEED,
-                'effect_timer': 0, 'stunned': False, 'score': 0,
-                'immunity_timer': 0
-            }
-            player_inputs[player_id_counter] = {}
-
-        thread = threading.Thread(target=handle_client, args=(conn, player_id_counter))
+        thread = threading.Thread(target=handle_client, args=(conn, room, player_id))
         thread.start()
-        player_id_counter += 1
+
+
+async def main_async(use_udp=False):
+    global udp_endpoint
+    server = await asyncio.start_server(handle_client_async, HOST, PORT, backlog=LISTEN_BACKLOG)
+    print(f"[Server] Server (mode async) berjalan di {HOST}:{PORT}, maks {MAX_ROOMS} room x {MAX_PLAYERS} pemain...")
+
+    if use_udp:
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(UdpProtocol, local_addr=(HOST, PORT))
+        udp_endpoint = make_udp_endpoint(transport.sendto, loop.call_later)
+        print(f"[Server] Kanal snapshot UDP aktif di port {PORT}.")
+    tasks = [server.serve_forever()]
+    if worker_pool is not None:
+        worker_pool.attach(asyncio.get_running_loop())
+        print(f"[Server] Simulasi room di {len(worker_pool.workers)} proses worker.")
+    else:
+        tasks.append(asyncio.create_task(game_logic_loop_async()))
+    if spectator_port:
+        feed_server = await asyncio.start_server(handle_relay_async, HOST, spectator_port)
+        tasks.append(feed_server.serve_forever())
+        print(f"[Server] Feed penonton untuk relay di port {spectator_port}.")
+    async with server:
+        await asyncio.gather(*tasks)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Server Tag Arena.")
+    parser.add_argument('--mode', choices=('threaded', 'async'), default='threaded',
+                        help="'async' melayani semua koneksi dari satu event loop tanpa thread per klien.")
+    parser.add_argument('--engine', choices=('dict', 'numpy'), default='dict',
+                        help="'numpy' menjalankan fisika pemain sebagai array (untuk lobi besar).")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--udp', action='store_true',
+                        help="Tawarkan kanal UDP untuk snapshot dan input; klien yang UDP-nya terblokir tetap di TCP.")
+    parser.add_argument('--udp-loss', type=float, default=0.0, help="Simulasi: peluang datagram keluar dibuang.")
+    parser.add_argument('--udp-latency', type=float, default=0.0, help="Simulasi: tunda datagram keluar (detik).")
+    parser.add_argument('--udp-jitter', type=float, default=0.0, help="Simulasi: jitter tambahan maksimum (detik).")
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                        help="Jeda (detik) antar log histogram fase tick; 0 mematikan log.")
+    parser.add_argument('--record', metavar='DIR',
+                        help="Rekam setiap room sebagai file replay biner di folder ini.")
+    parser.add_argument('--interest-radius', type=float,
+                        help="Kirim ke tiap klien hanya entitas dalam radius ini (piksel) dari pemainnya, "
+                             "plus papan skor dan 'It'; juga batas atas radius yang diminta klien.")
+    parser.add_argument('--compress-level', type=int, default=DEFAULT_COMPRESS_LEVEL, choices=range(10),
+                        help="Level zlib maksimum untuk frame keluar yang besar; klien boleh meminta lebih rendah, "
+                             "0 mematikan kompresi.")
+    parser.add_argument('--spectator-port', type=int, nargs='?', const=SPECTATOR_FEED_PORT,
+                        help="Buka feed snapshot semua room untuk relay penonton (relay.py) di port ini "
+                             f"(bawaan {SPECTATOR_FEED_PORT}); penonton tidak memakai slot pemain.")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Simulasikan room di N proses worker; snapshot kembali lewat shared memory. "
+                             "0 (bawaan) menjalankan semua room di proses ini.")
+    args = parser.parse_args()
+    if args.workers > 0 and args.spectator_port:
+        # Proxy di proses ini hanya menerima payload yang sudah dikodekan, bukan snapshot penuh untuk feed.
+        parser.error("--spectator-port belum bisa dipakai bersama --workers")
+    STATS_INTERVAL = args.stats_interval
+    spectator_port = args.spectator_port
+    compress_level = args.compress_level
+    interest_radius = args.interest_radius
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+        replay_dir = args.record
+    PORT = args.port
+    if args.udp_loss or args.udp_latency or args.udp_jitter:
+        udp_shim = (args.udp_loss, args.udp_latency, args.udp_jitter)
+    if args.engine == 'numpy':
+        if PlayerArrays is None:
+            print("[Server] NumPy tidak terpasang, memakai engine dict.")
+        else:
+            manager.room_class = VectorRoom
+    if args.workers > 0:
+        engine = 'numpy' if manager.room_class is VectorRoom else 'dict'
+        worker_pool = WorkerPool(args.workers, (replay_dir, STATS_INTERVAL, engine))
+        manager.room_class = worker_pool.create_room
+        # Histogram 'tick' datang dari worker; proses ini melaporkan putaran pembagian keluaran.
+        tick_metrics.name = 'io'
+    try:
+        if args.mode == 'async':
+            asyncio.run(main_async(args.udp))
+        else:
+            main(args.udp)
+    finally:
+        if worker_pool is not None:
+            worker_pool.stop()
@@ -0,0 +1,170 @@
+import struct
+from multiprocessing import shared_memory
+
+RING_BYTES = 4 * 1024 * 1024
+INPUT_ROWS = 4096
+SEQLOCK_RETRIES = 8
+
+RECORD_PAD = 0
+RECORD_ROOM = 1
+
+# Kepala ring: kapasitas, posisi tulis, posisi baca (penghitung byte yang terus naik).
+_ring_head = struct.Struct('<QQQ')
+_position = struct.Struct('<Q')
+_record_head = struct.Struct('<IBI')
+_batch_head = struct.Struct('<BHH')
+_payload_length = struct.Struct('<I')
+_send = struct.Struct('<HHI')
+_version = struct.Struct('<I')
+# Arah gerak disimpan sebagai double agar sama persis dengan nilai yang didekode codec.
+_input_fields = struct.Struct('<ddIIII')
+_input_row_size = _version.size + _input_fields.size
+
+
+class SharedRing:
+    # Ring buffer satu penulis (worker) satu pembaca (proses I/O) di shared memory. Record tidak
+    # pernah terbelah di ujung buffer: sisa ruang diisi record PAD dan penulisan mulai lagi dari awal.
+    # Posisi tulis baru disimpan setelah isi record selesai ditulis, dan posisi baca setelah
+    # isinya disalin, jadi kedua pihak tidak pernah menyentuh byte yang sama bersamaan.
+    def __init__(self, name=None, size=RING_BYTES):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_ring_head.size + size)
+            _ring_head.pack_into(self.shm.buf, 0, size, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.capacity = _ring_head.unpack_from(self.buf, 0)[0]
+        self.data = self.buf[_ring_head.size:_ring_head.size + self.capacity]
+        self.dropped = 0
+
+    def write(self, kind, key, body):
+        # Mengembalikan False (dan menghitung record yang dibuang) bila pembaca tertinggal.
+        needed = _record_head.size + len(body)
+        _, write_pos, read_pos = _ring_head.unpack_from(self.buf, 0)
+        offset = write_pos % self.capacity
+        tail = self.capacity - offset
+        skip = tail if tail < needed else 0
+        if write_pos + skip + needed - read_pos > self.capacity:
+            self.dropped += 1
+            return False
+        if skip:
+            if tail >= _record_head.size:
+                _record_head.pack_into(self.data, offset, 0, RECORD_PAD, 0)
+            offset = 0
+        _record_head.pack_into(self.data, offset, len(body), kind, key)
+        start = offset + _record_head.size
+        self.data[start:start + len(body)] = body
+        _position.pack_into(self.buf, _position.size, write_pos + skip + needed)
+        return True
+
+    def consume(self, handler):
+        # handler(kind, key, view) dipanggil untuk tiap record lengkap. view menunjuk langsung ke
+        # shared memory dan hanya sah selama panggilan; posisi baca dimajukan setelah semuanya selesai.
+        _, write_pos, read_pos = _ring_head.unpack_from(self.buf, 0)
+        while read_pos < write_pos:
+            offset = read_pos % self.capacity
+            tail = self.capacity - offset
+            if tail < _record_head.size:
+                read_pos += tail
+                continue
+            length, kind, key = _record_head.unpack_from(self.data, offset)
+            if kind == RECORD_PAD:
+                read_pos += tail
+                continue
+            start = offset + _record_head.size
+            handler(kind, key, self.data[start:start + length])
+            read_pos += _record_head.size + length
+        _position.pack_into(self.buf, 2 * _position.size, read_pos)
+
+    def close(self, unlink=False):
+        self.data.release()
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def pack_room_batch(game_started, payloads, sends):
+    # Keluaran satu room untuk satu tick: status lobi, payload unik, lalu (pemain, indeks payload, ack input).
+    parts = [_batch_head.pack(game_started, len(payloads), len(sends))]
+    for payload in payloads:
+        parts.append(_payload_length.pack(len(payload)))
+        parts.append(payload)
+    parts.extend(_send.pack(*send) for send in sends)
+    return b''.join(parts)
+
+
+def unpack_room_batch(view):
+    game_started, payload_count, send_count = _batch_head.unpack_from(view, 0)
+    offset = _batch_head.size
+    payloads = []
+    for _ in range(payload_count):
+        length = _payload_length.unpack_from(view, offset)[0]
+        offset += _payload_length.size
+        payloads.append(bytes(view[offset:offset + length]))
+        offset += length
+    sends = list(_send.iter_unpack(view[offset:offset + send_count * _send.size]))
+    return bool(game_started), payloads, sends
+
+
+class InputTable:
+    # Satu baris per pemain berisi input terakhirnya; proses I/O menulis, worker membaca tiap tick.
+    # Baris dijaga seqlock: versi ganjil berarti sedang ditulis, dan pembaca mengulang bila versi
+    # berubah selama membaca. use_item dan permintaan keyframe adalah penghitung, sehingga tekanan
+    # sekali tidak hilang meskipun tertimpa input lain sebelum tick berikutnya.
+    def __init__(self, name=None, rows=INPUT_ROWS):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=rows * _input_row_size)
+            self.shm.buf[:rows * _input_row_size] = bytes(rows * _input_row_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.rows = len(self.buf) // _input_row_size
+
+    def reset(self, row):
+        offset = row * _input_row_size
+        version = _version.unpack_from(self.buf, offset)[0]
+        _version.pack_into(self.buf, offset, version + 1)
+        _input_fields.pack_into(self.buf, offset + _version.size, 0.0, 0.0, 0, 0, 0, 0)
+        _version.pack_into(self.buf, offset, version + 2)
+
+    def write(self, row, inputs):
+        # Hanya satu penulis per baris pada satu waktu (dijaga lock di proses I/O).
+        offset = row * _input_row_size
+        version = _version.unpack_from(self.buf, offset)[0]
+        move_x, move_y, seq, ack, uses, keyframes = _input_fields.unpack_from(self.buf, offset + _version.size)
+        new_seq = inputs.get('seq') or 0
+        # Arah gerak yang lebih tua dari yang sudah tersimpan (UDP tertukar) diabaikan, seperti apply_input.
+        if not new_seq or new_seq > seq:
+            move_x, move_y = inputs.get('move_x', 0), inputs.get('move_y', 0)
+            seq = new_seq or seq
+        if inputs.get('ack') is not None:
+            ack = inputs['ack']
+        if inputs.get('use_item'):
+            uses = (uses + 1) & 0xFFFFFFFF
+        if inputs.get('keyframe'):
+            keyframes = (keyframes + 1) & 0xFFFFFFFF
+        _version.pack_into(self.buf, offset, version + 1)
+        _input_fields.pack_into(self.buf, offset + _version.size, move_x, move_y, seq, ack, uses, keyframes)
+        _version.pack_into(self.buf, offset, version + 2)
+
+    def read(self, row):
+        # (versi, move_x, move_y, seq, ack, use_count, keyframe_count), atau None bila baris terus
+        # berubah selama dibaca; tick berikutnya mencoba lagi.
+        offset = row * _input_row_size
+        for _ in range(SEQLOCK_RETRIES):
+            version = _version.unpack_from(self.buf, offset)[0]
+            if version & 1:
+                continue
+            fields = _input_fields.unpack_from(self.buf, offset + _version.size)
+            if _version.unpack_from(self.buf, offset)[0] == version:
+                return (version, *fields)
+        return None
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
@@ -0,0 +1,418 @@
+import collections
+import time
+from rules import DEFAULT_PARAMS, advance_player, apply_speed_boost
+from spatial import SpatialGrid
+try:
+    from numpy_engine import INVENTORY_CODES, INVENTORY_NAMES, PlayerArrays
+except ImportError:
+    PlayerArrays = None
+
+# Input satu tick: arah gerak per pemain (dict input terakhir), pemain yang menekan use_item,
+# seq langkah klien yang disimulasikan tick ini, dan seq terakhir yang sudah diakui per pemain.
+# step() mengonsumsi use_item dan seqs.
+TickInputs = collections.namedtuple('TickInputs', ['moves', 'use_item', 'seqs', 'acks'])
+# Klien mengirim input hanya saat arah berubah plus heartbeat tiap ~6 tick; selama itu arah
+# terakhir dianggap berlanjut, tetapi tidak lebih dari INPUT_HOLD_LIMIT langkah tanpa kabar.
+INPUT_HOLD_LIMIT = 10
+# Antrean langkah yang tertinggal lebih jauh dari ini (pemain baru, jam klien lebih cepat) dilompati.
+INPUT_BACKLOG_LIMIT = 3
+IDLE_INPUT = {}
+
+
+def new_state(params=DEFAULT_PARAMS):
+    return {
+        'players': {},
+        'items': [],
+        'game_started': False,
+        'game_time': params.game_duration,
+        'winner': None,
+        'game_over_timer': 0,
+        # Jam simulasi dan penanda waktu match; tidak ikut dikirim ke klien.
+        'sim_time': 0.0,
+        'game_start_time': 0,
+        'last_item_spawn_time': 0.0,
+        'last_score_update_time': 0.0,
+        'next_item_id': 1,
+    }
+
+
+def new_item_id(state):
+    item_id = state['next_item_id']
+    state['next_item_id'] += 1
+    return item_id
+
+
+def random_start_pos(rng, params):
+    return [rng.randint(50, params.arena_width - 50), rng.randint(50, params.arena_height - 50)]
+
+
+def add_player(state, player_id, rng, params=DEFAULT_PARAMS):
+    player = {
+        'pos': random_start_pos(rng, params), 'username': '...',
+        'is_it': False, 'inventory': None, 'speed': params.player_speed,
+        'effect_timer': 0, 'stunned': False, 'score': 0,
+        'immunity_timer': 0
+    }
+    state['players'][player_id] = player
+    return player
+
+
+def remove_player(state, player_id, rng):
+    # Mengembalikan id pemain yang menjadi 'It' pengganti, bila ada.
+    players = state['players']
+    player = players.pop(player_id, None)
+    if player is None or not player.get('is_it', False) or not players:
+        return None
+    new_it_id = rng.choice(list(players.keys()))
+    players[new_it_id]['is_it'] = True
+    return new_it_id
+
+
+def reset_match(state, rng, params=DEFAULT_PARAMS):
+    state['game_started'] = False
+    state['items'] = []
+    state['winner'] = None
+    state['game_time'] = params.game_duration
+
+    for player in state['players'].values():
+        player['pos'] = random_start_pos(rng, params)
+        player['is_it'] = False
+        player['inventory'] = None
+        player['speed'] = params.player_speed
+        player['effect_timer'] = 0
+        player['stunned'] = False
+        player['score'] = 0
+        player['immunity_timer'] = 0
+
+    state['game_start_time'] = 0
+    state['last_item_spawn_time'] = state['sim_time']
+    state['last_score_update_time'] = state['sim_time']
+
+
+def start_match(state, rng, params=DEFAULT_PARAMS):
+    state['game_started'] = True
+    state['game_start_time'] = state['sim_time']
+    state['last_score_update_time'] = state['game_start_time']
+    it_player_id = rng.choice(list(state['players'].keys()))
+    state['players'][it_player_id]['is_it'] = True
+    state['players'][it_player_id]['immunity_timer'] = params.tag_immunity
+    return it_player_id
+
+
+def finish_match(state, params=DEFAULT_PARAMS):
+    state['game_started'] = False
+    winner = None
+    highest_score = -1
+    for pdata in state['players'].values():
+        if not pdata.get('is_it', False) and pdata['score'] > highest_score:
+            highest_score = pdata['score']
+            winner = pdata['username']
+    if not winner:
+        sorted_players = sorted(state['players'].values(), key=lambda p: p['score'], reverse=True)
+        if sorted_players:
+            winner = sorted_players[0]['username']
+    state['winner'] = winner
+    state['game_over_timer'] = params.game_over_duration
+    return winner
+
+
+class InputStream:
+    # Input gerak satu pemain, diurutkan menurut seq langkah klien (satu seq per tick klien).
+    # Server menyimulasikan paling banyak satu langkah klien per tick. Langkah di luar seq yang
+    # sudah diterima hanya ditebak dengan arah terakhir sebanyak tick yang berlalu sejak input
+    # terbaru tiba, jadi tidak pernah mendahului langkah yang sudah dibuat klien.
+    def __init__(self):
+        self.pending = collections.deque()
+        self.move = IDLE_INPUT
+        self.known_seq = 0
+        self.age = 0
+
+    def add(self, seq, inputs):
+        # Input UDP yang terlambat atau terduplikasi diabaikan.
+        if seq <= self.known_seq:
+            return False
+        self.known_seq = seq
+        self.age = 0
+        self.pending.append((seq, inputs))
+        return True
+
+    def next_input(self, acked):
+        # (seq, input) untuk langkah berikutnya, atau (None, IDLE_INPUT) bila server harus
+        # menunggu kabar dari klien.
+        self.age += 1
+        target = acked + 1
+        if self.known_seq - target >= INPUT_BACKLOG_LIMIT:
+            target = self.known_seq
+        while self.pending and self.pending[0][0] <= target:
+            self.move = self.pending.popleft()[1]
+        if target - self.known_seq > min(self.age, INPUT_HOLD_LIMIT):
+            return None, IDLE_INPUT
+        return target, self.move
+
+
+def ack_input_seqs(inputs):
+    # Seq hanya diakui bila langkahnya memang disimulasikan; ack dikirim per penerima bersama snapshot.
+    inputs.acks.update(inputs.seqs)
+    inputs.seqs.clear()
+
+
+def drop_banana(state, pos):
+    state['items'].append({
+        'type': 'banana_peel', 'pos': list(pos),
+        'id': new_item_id(state), 'spawn_time': state['sim_time']
+    })
+
+
+def spawn_items(state, rng, params=DEFAULT_PARAMS):
+    if state['sim_time'] - state['last_item_spawn_time'] > params.item_spawn_interval and len(state['items']) < params.max_items:
+        item_type = rng.choice(params.item_types)
+        pos = [rng.randint(params.item_radius, params.arena_width - params.item_radius),
+               rng.randint(params.item_radius, params.arena_height - params.item_radius)]
+        state['items'].append({'type': item_type, 'pos': pos, 'id': new_item_id(state)})
+        state['last_item_spawn_time'] = state['sim_time']
+
+
+def step(state, inputs, dt, rng, engine, metrics=None):
+    # Satu tick aturan main tanpa I/O dan tanpa membaca jam dinding. Mengembalikan
+    # (perlu_snapshot, events); events dipakai pemanggil untuk log. metrics opsional,
+    # hanya untuk mengukur durasi fase di server. Mulai/selesai/reset match dan poin berkala dicatat
+    # sebagai fase 'match', sehingga jumlah fase mendekati durasi tick.
+    params = engine.params
+    events = []
+    phase_start = time.perf_counter() if metrics is not None else None
+    state['sim_time'] += dt
+    if state.get('game_over_timer', 0) > 0:
+        state['game_over_timer'] -= dt
+        if state['game_over_timer'] <= 0:
+            reset_match(state, rng, params)
+            inputs.use_item.clear()
+            engine.reload(state, inputs.moves)
+            events.append(('reset',))
+            if metrics is not None:
+                metrics.record('match', phase_start)
+            return False, events
+
+    if not state['game_started'] and len(state['players']) == params.max_players and not state.get('winner'):
+        engine.flush(state)
+        events.append(('start', start_match(state, rng, params)))
+        engine.reload(state, inputs.moves)
+
+    if state['game_started']:
+        elapsed_time = state['sim_time'] - state['game_start_time']
+        state['game_time'] = max(0, params.game_duration - elapsed_time)
+
+        if state['game_time'] <= 0:
+            engine.flush(state)
+            events.append(('finish', finish_match(state, params)))
+            if metrics is not None:
+                metrics.record('match', phase_start)
+            return False, events
+
+        if state['sim_time'] - state['last_score_update_time'] > 1:
+            engine.award_points(state)
+            state['last_score_update_time'] = state['sim_time']
+
+        phase_start = metrics.record('match', phase_start) if metrics is not None else None
+        ack_input_seqs(inputs)
+        it_player_id = engine.move_players(state, inputs, dt)
+        inputs.use_item.clear()
+        phase_start = metrics.record('movement', phase_start) if metrics is not None else None
+        tagged = engine.check_tag(state, it_player_id)
+        if tagged is not None:
+            events.append(('tag', it_player_id, tagged))
+        phase_start = metrics.record('tag', phase_start) if metrics is not None else None
+        engine.check_items(state)
+        phase_start = metrics.record('items', phase_start) if metrics is not None else None
+        spawn_items(state, rng, params)
+        if metrics is not None:
+            metrics.record('spawn', phase_start)
+    elif metrics is not None:
+        metrics.record('match', phase_start)
+    return True, events
+
+
+class DictEngine:
+    name = 'dict'
+
+    def __init__(self, params=DEFAULT_PARAMS):
+        self.params = params
+        self.grid = SpatialGrid(params.player_radius * 2)
+
+    def flush(self, state):
+        pass
+
+    def reload(self, state, moves):
+        self.grid = SpatialGrid(self.params.player_radius * 2)
+        for pid, player in state['players'].items():
+            self.grid.insert(pid, player['pos'])
+
+    def set_input(self, player_id, inputs):
+        pass
+
+    def players_near(self, state, pos, radius):
+        # Kandidat dari sel tetangga diurutkan sesuai urutan dict pemain agar hasilnya
+        # sama persis dengan pengecekan satu per satu.
+        players = state['players']
+        radius_sq = radius * radius
+        found = []
+        for pid in self.grid.nearby(pos, radius):
+            pdata = players.get(pid)
+            if pdata is None:
+                continue
+            dx = pdata['pos'][0] - pos[0]
+            dy = pdata['pos'][1] - pos[1]
+            if dx * dx + dy * dy < radius_sq:
+                found.append(pid)
+        if len(found) > 1:
+            order = {pid: i for i, pid in enumerate(players)}
+            found.sort(key=order.__getitem__)
+        return found
+
+    def award_points(self, state):
+        for player in state['players'].values():
+            if not player.get('is_it', False):
+                player['score'] += 1
+
+    def move_players(self, state, inputs, dt):
+        it_player_id = None
+
+        players = state['players']
+        for pid, player in list(players.items()):
+            if pid not in players: continue
+
+            if player.get('is_it', False):
+                it_player_id = pid
+
+            move = inputs.moves.get(pid, {})
+            if not advance_player(player, move.get('move_x', 0), move.get('move_y', 0), dt, self.params): continue
+            self.grid.move(pid, player['pos'])
+
+            if pid in inputs.use_item and player['inventory']:
+                item_type = player['inventory']
+                player['inventory'] = None
+
+                if item_type == 'speed_boost':
+                    apply_speed_boost(player, self.params)
+                elif item_type == 'banana_trap':
+                    drop_banana(state, player['pos'])
+        return it_player_id
+
+    def check_tag(self, state, it_player_id):
+        # Mengembalikan id pemain yang baru tertangkap, atau None.
+        players = state['players']
+        it_player_data = players.get(it_player_id)
+        if not it_player_data or it_player_data.get('stunned', False):
+            return None
+        for pid_other in self.players_near(state, it_player_data['pos'], self.params.player_radius * 2):
+            pdata_other = players[pid_other]
+            if pid_other != it_player_id and pdata_other.get('immunity_timer', 0) <= 0:
+                players[it_player_id]['is_it'] = False
+                players[pid_other]['is_it'] = True
+
+                players[it_player_id]['immunity_timer'] = self.params.tag_immunity
+                players[pid_other]['immunity_timer'] = self.params.tag_immunity
+
+                players[it_player_id]['score'] += self.params.tag_score
+                return pid_other
+        return None
+
+    def check_items(self, state):
+        params = self.params
+        players = state['players']
+        removed_ids = set()
+        for item in state['items']:
+            for pid in self.players_near(state, item['pos'], params.player_radius + params.item_radius):
+                pdata = players[pid]
+                if item['type'] in params.item_types and not pdata['inventory']:
+                    pdata['inventory'] = item['type']
+                    removed_ids.add(item['id'])
+                    break
+                elif item['type'] == 'banana_peel' and state['sim_time'] - item.get('spawn_time', 0) > params.banana_arm_time:
+                    if not pdata.get('is_it', False):
+                        pdata['stunned'] = True
+                        pdata['effect_timer'] = params.stun_duration
+                        removed_ids.add(item['id'])
+                        break
+
+        if removed_ids:
+            state['items'] = [item for item in state['items'] if item['id'] not in removed_ids]
+
+
+class NumpyEngine:
+    # Fisika pemain sebagai array NumPy. Selama tick, array adalah sumber kebenaran;
+    # flush() menyalinnya kembali ke dict pemain (untuk snapshot), reload() sebaliknya.
+    name = 'numpy'
+
+    def __init__(self, params=DEFAULT_PARAMS):
+        self.params = params
+        self.arrays = PlayerArrays()
+
+    def flush(self, state):
+        self.arrays.store(state['players'])
+
+    def reload(self, state, moves):
+        self.arrays.load(state['players'], moves)
+
+    def set_input(self, player_id, inputs):
+        self.arrays.set_input(player_id, inputs)
+
+    def players_near(self, state, pos, radius):
+        return [self.arrays.ids[i] for i in self.arrays.within(pos, radius)]
+
+    def award_points(self, state):
+        self.arrays.score[~self.arrays.is_it] += 1
+
+    def move_players(self, state, inputs, dt):
+        params = self.params
+        arrays = self.arrays
+        it_index = arrays.it_index()
+        arrays.set_item_requests(inputs.use_item)
+        for i in arrays.step(dt, params.player_speed, params.player_radius, params.arena_width, params.arena_height):
+            item_type = INVENTORY_NAMES[arrays.inventory[i]]
+            arrays.inventory[i] = 0
+
+            if item_type == 'speed_boost':
+                arrays.speed[i] = params.player_speed * params.speed_boost_multiplier
+                arrays.effect_timer[i] = params.speed_boost_duration
+            elif item_type == 'banana_trap':
+                drop_banana(state, arrays.pos[i].tolist())
+        return arrays.ids[it_index] if it_index is not None else None
+
+    def check_tag(self, state, it_player_id):
+        arrays = self.arrays
+        it_index = arrays.index.get(it_player_id)
+        if it_index is None or arrays.stunned[it_index]:
+            return None
+        target = arrays.tag_target(it_index, self.params.player_radius * 2)
+        if target is None:
+            return None
+        arrays.is_it[it_index] = False
+        arrays.is_it[target] = True
+
+        arrays.immunity_timer[it_index] = self.params.tag_immunity
+        arrays.immunity_timer[target] = self.params.tag_immunity
+
+        arrays.score[it_index] += self.params.tag_score
+        return arrays.ids[target]
+
+    def check_items(self, state):
+        params = self.params
+        arrays = self.arrays
+        items = state['items']
+        hits = arrays.item_hits([item['pos'] for item in items], params.player_radius + params.item_radius)
+        removed_ids = set()
+        for item, candidates in zip(items, hits):
+            for i in candidates:
+                if item['type'] in params.item_types and not arrays.inventory[i]:
+                    arrays.inventory[i] = INVENTORY_CODES[item['type']]
+                    removed_ids.add(item['id'])
+                    break
+                elif item['type'] == 'banana_peel' and state['sim_time'] - item.get('spawn_time', 0) > params.banana_arm_time:
+                    if not arrays.is_it[i]:
+                        arrays.stunned[i] = True
+                        arrays.effect_timer[i] = params.stun_duration
+                        removed_ids.add(item['id'])
+                        break
+
+        if removed_ids:
+            state['items'] = [item for item in items if item['id'] not in removed_ids]
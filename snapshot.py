@@ -0,0 +1,100 @@
+import heapq
+from spatial import SpatialGrid
+
+GLOBAL_FIELDS = ('game_started', 'game_time', 'winner', 'game_over_timer', 'scoreboard')
+NOTHING_VISIBLE = (frozenset(), frozenset())
+
+
+def take_snapshot(state):
+    snapshot = {key: state.get(key) for key in GLOBAL_FIELDS}
+    snapshot['players'] = {pid: {**pdata, 'pos': list(pdata['pos'])} if 'pos' in pdata else dict(pdata)
+                           for pid, pdata in state.get('players', {}).items()}
+    snapshot['items'] = [dict(item) for item in state.get('items', [])]
+    return snapshot
+
+
+def diff_snapshots(base, current):
+    delta = {'globals': {key: current[key] for key in GLOBAL_FIELDS if current[key] != base[key]}}
+
+    players = {}
+    for pid, pdata in current['players'].items():
+        old = base['players'].get(pid)
+        if old is None:
+            players[pid] = pdata
+            continue
+        changed = {key: value for key, value in pdata.items() if old.get(key) != value}
+        if changed:
+            players[pid] = changed
+    delta['players'] = players
+    delta['removed_players'] = [pid for pid in base['players'] if pid not in current['players']]
+
+    base_ids = {item['id'] for item in base['items']}
+    current_ids = {item['id'] for item in current['items']}
+    delta['items_added'] = [item for item in current['items'] if item['id'] not in base_ids]
+    delta['items_removed'] = [item['id'] for item in base['items'] if item['id'] not in current_ids]
+    return delta
+
+
+def apply_delta(base, delta):
+    snapshot = {key: base.get(key) for key in GLOBAL_FIELDS}
+    snapshot.update(delta.get('globals', {}))
+
+    players = {pid: pdata for pid, pdata in base['players'].items() if pid not in delta.get('removed_players', ())}
+    for pid, changed in delta.get('players', {}).items():
+        players[pid] = {**players[pid], **changed} if pid in players else dict(changed)
+    snapshot['players'] = players
+
+    removed_ids = set(delta.get('items_removed', ()))
+    snapshot['items'] = [item for item in base['items'] if item['id'] not in removed_ids] + list(delta.get('items_added', ()))
+    return snapshot
+
+
+def _select_near(grid, entities, center, radius, margin, seen, keep):
+    # Histeresis: entitas baru masuk saat jaraknya < radius, tetapi yang sudah terlihat
+    # baru dilepas setelah melewati radius + margin, supaya tidak berkedip di tepi.
+    inner = radius * radius
+    outer = (radius + margin) * (radius + margin)
+    for key in grid.nearby(center, radius + margin):
+        pos = entities[key]['pos']
+        dx = pos[0] - center[0]
+        dy = pos[1] - center[1]
+        dist_sq = dx * dx + dy * dy
+        if dist_sq < inner or (dist_sq < outer and key in seen):
+            keep.add(key)
+
+
+class InterestIndex:
+    # Indeks spasial atas satu snapshot yang dipakai bersama untuk memotong snapshot per klien.
+    # Data global (timer, pemenang, papan skor N teratas, pemain 'It') selalu ikut.
+    def __init__(self, snapshot, cell_size, scoreboard_size):
+        self.snapshot = snapshot
+        players = snapshot['players']
+        self.player_grid = SpatialGrid(cell_size)
+        for pid, pdata in players.items():
+            self.player_grid.insert(pid, pdata['pos'])
+        self.items = {item['id']: item for item in snapshot['items']}
+        self.item_grid = SpatialGrid(cell_size)
+        for item_id, item in self.items.items():
+            self.item_grid.insert(item_id, item['pos'])
+        self.it_ids = [pid for pid, pdata in players.items() if pdata.get('is_it')]
+        top = heapq.nlargest(scoreboard_size, players.items(), key=lambda entry: entry[1].get('score', 0))
+        self.scoreboard = [(pid, pdata.get('score', 0), pdata.get('username', '')) for pid, pdata in top]
+
+    def view(self, viewer_id, radius, margin, visible=NOTHING_VISIBLE):
+        # Mengembalikan (snapshot terpotong, entitas yang terlihat); yang kedua diberikan lagi
+        # sebagai visible pada tick berikutnya.
+        players = self.snapshot['players']
+        seen_players, seen_items = visible
+        keep_players = set(self.it_ids)
+        keep_items = set()
+        me = players.get(viewer_id)
+        if me is not None:
+            keep_players.add(viewer_id)
+            _select_near(self.player_grid, players, me['pos'], radius, margin, seen_players, keep_players)
+            _select_near(self.item_grid, self.items, me['pos'], radius, margin, seen_items, keep_items)
+
+        view = {key: self.snapshot[key] for key in GLOBAL_FIELDS}
+        view['scoreboard'] = self.scoreboard
+        view['players'] = {pid: players[pid] for pid in sorted(keep_players)}
+        view['items'] = [self.items[item_id] for item_id in sorted(keep_items)]
+        return view, (keep_players, keep_items)
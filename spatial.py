@@ -0,0 +1,56 @@
+import math
+
+
+class SpatialGrid:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.key_cells = {}
+
+    def _cell(self, pos):
+        return (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+
+    def insert(self, key, pos):
+        cell = self._cell(pos)
+        self.key_cells[key] = cell
+        self.cells.setdefault(cell, set()).add(key)
+
+    def move(self, key, pos):
+        cell = self._cell(pos)
+        old_cell = self.key_cells.get(key)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._discard(key, old_cell)
+        self.key_cells[key] = cell
+        self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        old_cell = self.key_cells.pop(key, None)
+        if old_cell is not None:
+            self._discard(key, old_cell)
+
+    def _discard(self, key, cell):
+        bucket = self.cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.key_cells.clear()
+
+    def nearby(self, pos, radius):
+        cx, cy = self._cell(pos)
+        span = max(1, math.ceil(radius / self.cell_size))
+        found = []
+        cells = self.cells
+        for x in range(cx - span, cx + span + 1):
+            for y in range(cy - span, cy + span + 1):
+                bucket = cells.get((x, y))
+                if bucket:
+                    found.extend(bucket)
+        return found
+
+    def __len__(self):
+        return len(self.key_cells)